@@ -1,71 +1,213 @@
-from engine.config import get_configuration
-from engine.enigne import Engine
-
+import time
 
-def create_tf_session(session_wrapper):
-    if session_wrapper is not None:
-        import tensorflow
-        config = tensorflow.ConfigProto()
-        config.gpu_options.allow_growth = True
-        session_wrapper.session = tensorflow.Session(config=config)
+from engine import metrics
+from engine.concurrent import ConcurrentEngine
+from engine.config import get_configuration
+from engine.distributed import Coordinator, DistributedEngine, object_identities, parse_address, run_worker
+from engine.enigne import Engine, MatchupResultCache
+from engine.epoch_budget import games_in_run
+from engine.memory import MemoryProfiler
 
 
 def prepare_tf_session(session_wrapper):
-    if session_wrapper is not None:
+    if session_wrapper is not None and session_wrapper.session is not None:
         import tensorflow
         session_wrapper.session.run(tensorflow.global_variables_initializer())
 
 
 def close_tf_session(session_wrapper):
-    if session_wrapper is not None:
+    if session_wrapper is not None and session_wrapper.session is not None:
         session_wrapper.session.close()
 
 
-def main():
-    config = get_configuration()
+def report_run_statistics(config, game, phase):
+    statistics = game.get_run_statistics()
+    if statistics is not None and config.on_run_statistics:
+        config.on_run_statistics(phase, statistics)
 
-    try:
-        create_tf_session(config.tf_session_wrapper)
 
+def report_test_games(config, test_runs):
+    if config.early_stopping is not None and test_runs > 0:
+        print("Test games played: {} of {}{}".format(config.early_stopping.games, test_runs,
+                                                     ", results settled" if config.early_stopping.stopped else ""))
+
+
+def record_run(config, engine, phase, results, start):
+    """ Registers games of a run and its wall time in the epoch budget, the rate counts only games that were played
+    (not reused from the test result cache)
+    """
+    if config.epoch_budget is not None:
+        games = games_in_run(*results)
+        cache = engine.test_result_cache if phase == "test" else None
+        played = games - cache.reused_in_run if cache is not None else games
+        config.epoch_budget.record(phase, games, time.perf_counter() - start, played)
+
+
+def start_metrics_exporters(config):
+    if config.metrics_port is None and config.metrics_file is None:
+        return []
+
+    registry = metrics.enable()
+    exporters = []
+    if config.metrics_port is not None:
+        exporters.append(metrics.HTTPExporter(registry, config.metrics_port))
+    if config.metrics_file is not None:
+        exporters.append(metrics.FileExporter(registry, config.metrics_file, config.metrics_interval))
+
+    return exporters
+
+
+def run(config):
+    """ Runs the tournament described by configuration
+
+    returns: results of the last test run - results by players and results by pools
+    """
+    # must be started before objects are created, so that they can get their metrics
+    exporters = start_metrics_exporters(config)
+    epochs_metric = metrics.counter("epochs_total", "Finished epochs")
+    epoch_time_metric = metrics.gauge("epoch_duration_seconds", "Wall time of the last finished epoch")
+    epoch_train_runs_metric = metrics.gauge("epoch_train_runs", "Train runs of the last finished epoch")
+    epoch_test_runs_metric = metrics.gauge("epoch_test_runs", "Test runs of the last finished epoch")
+
+    # objects (and so tensorflow graphs) are created only for run phases that will be executed
+    uses_train = config.epochs > 0 and config.train_runs > 0
+    uses_test = config.test_runs > 0
+
+    # started before objects are created, so that their allocations are traced too
+    profiler = None
+    if config.memory_profile > 0:
+        profiler = MemoryProfiler(config.memory_profile)
+        profiler.start()
+
+    coordinator = None
+    try:
         game = config.game.create()
 
-        train_players = [pl.create() for pl in config.train_players]
-        train_pools = [pl.create() for pl in config.train_pools]
-        test_players = [pl.create() for pl in config.test_players]
-        test_pools = [pl.create() for pl in config.test_pools]
+        train_players = [pl.create() for pl in config.train_players] if uses_train else []
+        train_pools = [pl.create() for pl in config.train_pools] if uses_train else []
+        test_players = [pl.create() for pl in config.test_players] if uses_test else []
+        test_pools = [pl.create() for pl in config.test_pools] if uses_test else []
 
         prepare_tf_session(config.tf_session_wrapper)
 
         if config.on_start:
             config.on_start(config, game, train_players, train_pools, test_players, test_pools)
 
-        engine = Engine(game)
-        engine.set_testing_players(test_players, test_pools)
-        engine.set_training_players(train_players, train_pools)
-
-        engine.test(config.test_runs,
-                    config.on_test_run_finished,
-                    config.on_test_game_finished,
-                    config.on_test_step)
+        if config.coordinator_address:
+            coordinator = Coordinator(parse_address(config.coordinator_address), config.authkey)
+            identities = object_identities(train_players, train_pools, test_players, test_pools)
+            engine = DistributedEngine(game, coordinator, identities, config.train_window)
+        elif config.concurrent_games > 1:
+            engine = ConcurrentEngine([game] + [config.game.create() for _ in range(config.concurrent_games - 1)])
+        else:
+            engine = Engine(game)
+        if uses_test:
+            engine.set_testing_players(test_players, test_pools)
+            if config.cache_test_results:
+                engine.test_result_cache = MatchupResultCache()
+            engine.test_early_stopping = config.early_stopping
+        if uses_train:
+            engine.set_training_players(train_players, train_pools)
+
+        run_start = time.perf_counter()
+        test_results = engine.test(config.test_runs,
+                                   config.on_test_run_finished,
+                                   config.on_test_game_finished,
+                                   config.on_test_step)
+        record_run(config, engine, "test", test_results, run_start)
+        report_run_statistics(config, game, "test")
+        report_test_games(config, config.test_runs)
+
+        if profiler is not None:
+            profiler.mark()
 
         for i in range(config.epochs):
+            epoch_start = time.perf_counter()
             if config.on_epoch_started:
                 config.on_epoch_started(i)
 
-            engine.train(config.train_runs,
-                         config.on_train_run_finished,
-                         config.on_train_game_finished,
-                         config.on_train_step)
-
-            engine.test(config.test_runs,
-                        config.on_test_run_finished,
-                        config.on_test_game_finished,
-                        config.on_test_step)
+            if config.epoch_budget is not None:
+                train_runs = config.epoch_budget.runs("train")
+                test_runs = config.epoch_budget.runs("test")
+            else:
+                train_runs = config.train_runs
+                test_runs = config.test_runs
+
+            run_start = time.perf_counter()
+            train_results = engine.train(train_runs,
+                                         config.on_train_run_finished,
+                                         config.on_train_game_finished,
+                                         config.on_train_step)
+            record_run(config, engine, "train", train_results, run_start)
+            report_run_statistics(config, game, "train")
+
+            run_start = time.perf_counter()
+            test_results = engine.test(test_runs,
+                                       config.on_test_run_finished,
+                                       config.on_test_game_finished,
+                                       config.on_test_step)
+            record_run(config, engine, "test", test_results, run_start)
+            report_run_statistics(config, game, "test")
+            report_test_games(config, test_runs)
+
+            epochs_metric.inc()
+            epoch_time_metric.set(time.perf_counter() - epoch_start)
+
+            if config.epoch_budget is not None:
+                epoch_runs = config.epoch_budget.finish_epoch(i)
+                epoch_train_runs_metric.set(epoch_runs.train_runs)
+                epoch_test_runs_metric.set(epoch_runs.test_runs)
+                if config.on_epoch_runs:
+                    config.on_epoch_runs(epoch_runs)
+
+            if profiler is not None and config.on_memory_report:
+                config.on_memory_report(profiler.report(i))
 
         if config.on_finished:
             config.on_finished()
     finally:
+        if coordinator is not None:
+            coordinator.close()
+        if config.event_dispatcher is not None:
+            config.event_dispatcher.close()
+        for exporter in exporters:
+            exporter.close()
         close_tf_session(config.tf_session_wrapper)
+        if profiler is not None:
+            profiler.stop()
+
+    return test_results
+
+
+def work(config):
+    """ Plays games for the coordinator, using objects created from the same configuration as coordinator's
+    """
+    try:
+        game = config.game.create()
+
+        identities = object_identities([pl.create() for pl in config.train_players],
+                                       [pl.create() for pl in config.train_pools],
+                                       [pl.create() for pl in config.test_players],
+                                       [pl.create() for pl in config.test_pools])
+
+        prepare_tf_session(config.tf_session_wrapper)
+
+        run_worker(game, identities, parse_address(config.worker_address), config.authkey,
+                   config.on_train_step, config.on_test_step,
+                   config.on_train_game_finished, config.on_test_game_finished)
+    finally:
+        if config.event_dispatcher is not None:
+            config.event_dispatcher.close()
+        close_tf_session(config.tf_session_wrapper)
+
+
+def main():
+    config = get_configuration()
+
+    if config.worker_address:
+        work(config)
+    else:
+        run(config)
 
 
 if __name__ == "__main__":
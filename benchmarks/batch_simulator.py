@@ -0,0 +1,93 @@
+""" Measures throughput of the batched draughts simulator with random moves,
+and checks that it agrees with DraughtsLogic on sampled games
+
+Usage: python benchmarks/batch_simulator.py [--batch N] [--seconds S] [--check-games N]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.games.draughts import LOGIC_INSTANCE, DraughtsView  # noqa: E402
+from engine.games.numpy.draughts import DraughtsBatch, board_from_view  # noqa: E402
+
+
+def measure(batch_size, seconds, generator):
+    batch = DraughtsBatch(batch_size)
+    positions = 0
+    games = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        positions += np.count_nonzero(~batch.is_terminal)
+        batch.random_step(generator)
+        games += np.count_nonzero(batch.is_terminal)
+        batch.reset(batch.is_terminal)
+    return positions, games, time.perf_counter() - start
+
+
+def check(games_number, generator):
+    """ Plays random games with both simulators, comparing positions, moves and results after every ply
+
+    returns: number of compared positions
+    """
+    batch = DraughtsBatch(games_number)
+    views = []
+    for _ in range(games_number):
+        view = DraughtsView()
+        view.begin("white", "black")
+        views.append(view)
+
+    positions = 0
+    while not batch.is_terminal.all():
+        moves = batch.moves
+        choices = (generator.random(games_number) * moves.counts).astype(np.int64)
+        for game, view in enumerate(views):
+            if view.is_terminal != batch.is_terminal[game]:
+                raise AssertionError("Game {} ended differently after {} plies".format(game, batch.plies[game]))
+            if view.is_terminal:
+                continue
+            positions += 1
+
+            if not np.array_equal(board_from_view(view), batch.boards[game]):
+                raise AssertionError("Game {} has different positions after {} plies".format(game, batch.plies[game]))
+            batch_moves = [moves.get_draughts_move(game, i) for i in range(moves.counts[game])]
+            logic_moves = LOGIC_INSTANCE.list_moves(view)
+            if sorted(batch_moves) != sorted(logic_moves):
+                raise AssertionError("Game {} has different moves after {} plies".format(game, batch.plies[game]))
+
+            views[game] = LOGIC_INSTANCE.apply_move(view, batch_moves[choices[game]])
+        batch.step(choices)
+
+    for game, view in enumerate(views):
+        winner = 0 if view.winner is None else 1 if view.winner == "white" else -1
+        if not view.is_terminal or winner != batch.winner[game]:
+            raise AssertionError("Game {} has different result".format(game))
+
+    return positions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched draughts simulator benchmark")
+    parser.add_argument("--batch", default=4096, type=int, help="Number of games played at once")
+    parser.add_argument("--seconds", default=10., type=float, help="Duration of the measurement")
+    parser.add_argument("--check-games", dest="check_games", default=100, type=int,
+                        help="Number of games compared with DraughtsLogic, 0 to skip the check")
+    parser.add_argument("--seed", default=0, type=int)
+    args = parser.parse_args()
+
+    generator = np.random.default_rng(args.seed)
+
+    if args.check_games > 0:
+        positions = check(args.check_games, generator)
+        print("Agrees with DraughtsLogic on {} games, {} positions".format(args.check_games, positions))
+
+    positions, games, elapsed = measure(args.batch, args.seconds, generator)
+    print("{} positions/minute, {} games/minute".format(int(positions * 60 / elapsed), int(games * 60 / elapsed)))
+
+
+if __name__ == "__main__":
+    main()
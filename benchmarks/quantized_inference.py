@@ -0,0 +1,96 @@
+""" Compares the draughts CNN evaluated in NumPy with weights stored in float32, float16 and int8 precision -
+memory of stored weights and of weights in use (with float32 kernels converted for evaluation), max error
+of evaluations and agreement of chosen moves on a position suite against the tensorflow DraughtsCNNPlayer
+(against the NumPy float32 network when tensorflow is not available), and positions evaluated per second,
+about the same for all precisions as evaluation is done in float32
+
+Weights are random (initialized like tensorflow does) unless saved weights of a trained player are given.
+
+Usage: python benchmarks/quantized_inference.py [--weights FILE] [--positions N] [--batch N] [--seconds S]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.games.numpy.draughts_network import PRECISIONS, DraughtsNetwork, load_weights  # noqa: E402
+from engine.games.tensorflow.draughts import (DraughtsCNNPlayer, QuantizedDraughtsCNNPlayer,  # noqa: E402
+                                              encode_position_keys, move_agreement, position_key, position_suite)
+
+# kernel shapes of DraughtsCNNPlayer layers
+KERNEL_SHAPES = [(2, 2, 4, 6), (3, 3, 6, 8), (2, 2, 8, 10), (3, 3, 10, 10), (2, 2, 10, 12), (3, 3, 12, 12),
+                 (4, 4, 12, 12), (300, 1)]
+
+
+def random_weights(generator):
+    weights = []
+    for shape in KERNEL_SHAPES:
+        fan_in = int(np.prod(shape[:-1]))
+        fan_out = int(np.prod(shape[:-2])) * shape[-1] if len(shape) > 2 else shape[-1]
+        limit = np.sqrt(6. / (fan_in + fan_out))
+        weights.append(generator.uniform(-limit, limit, shape).astype(np.float32))
+        weights.append(generator.uniform(-0.1, 0.1, shape[-1]).astype(np.float32))
+    return weights
+
+
+def tensorflow_reference(weights):
+    """ returns: DraughtsCNNPlayer with given weights in its own session, None if tensorflow is not available
+    """
+    try:
+        import tensorflow as tf
+    except ImportError:
+        return None
+
+    player = DraughtsCNNPlayer()
+    player.session = tf.Session()
+    player.session.run(tf.global_variables_initializer())
+    player.set_weights(weights, 0)
+    return player
+
+
+def measure(network, encoded, seconds):
+    positions = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        network.evaluate(encoded)
+        positions += len(encoded) // 2
+    return positions / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantized draughts CNN inference benchmark")
+    parser.add_argument("--weights", default=None, help="Weights saved by draughts_network.save_weights")
+    parser.add_argument("--positions", default=500, type=int, help="Number of positions of the suite")
+    parser.add_argument("--batch", default=256, type=int, help="Number of positions evaluated together")
+    parser.add_argument("--seconds", default=3., type=float, help="Duration of each throughput measurement")
+    parser.add_argument("--seed", default=0, type=int)
+    args = parser.parse_args()
+
+    weights = load_weights(args.weights) if args.weights else random_weights(np.random.default_rng(args.seed))
+    views = position_suite(args.positions, args.seed)
+    encoded = encode_position_keys([position_key(view, view.pov) for view in views[:args.batch]])
+
+    reference = tensorflow_reference(weights)
+    if reference is not None:
+        print("Reference: tensorflow DraughtsCNNPlayer")
+        expected = reference.session.run(reference.output, {reference.board_input: encoded})
+    else:
+        print("Reference: NumPy float32 network (tensorflow is not available)")
+        reference = QuantizedDraughtsCNNPlayer(weights, "float32")
+        expected = reference.network.evaluate(encoded)
+
+    for precision in PRECISIONS:
+        network = DraughtsNetwork(weights, precision)
+        player = QuantizedDraughtsCNNPlayer(weights, precision)
+        error = np.abs(network.evaluate(encoded) - expected).max()
+        print("{:8} stored {:6} B  in use {:6} B  {:9.0f} positions/s  max error {:.2e}  same moves {:.1%}".format(
+            precision, network.nbytes, network.nbytes_in_use, measure(network, encoded, args.seconds), error,
+            move_agreement(reference, player, views)))
+
+
+if __name__ == "__main__":
+    main()
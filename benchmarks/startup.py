@@ -0,0 +1,56 @@
+""" Measures startup time of the tournament in fresh interpreters
+
+Usage: python benchmarks/startup.py [--repeats N]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIGURATION_SNIPPET = """
+import argparse
+from engine.config import Configuration, _load_config
+args = argparse.Namespace(epochs={epochs}, test_runs={test_runs}, train_runs={train_runs})
+Configuration(args, _load_config({path!r}))
+"""
+
+SCENARIOS = [
+    ("import engine.config", [sys.executable, "-c", "import engine.config"]),
+    ("ai_tournament.py --help", [sys.executable, "ai_tournament.py", "--help"]),
+    ("parse sample/draughts.yaml", [sys.executable, "-c", CONFIGURATION_SNIPPET.format(
+        epochs=1, test_runs=1, train_runs=1, path="sample/draughts.yaml")]),
+    ("parse sample/draughts_1_plus_1.yaml", [sys.executable, "-c", CONFIGURATION_SNIPPET.format(
+        epochs=1, test_runs=1, train_runs=1, path="sample/draughts_1_plus_1.yaml")]),
+    ("run sample/draughts.yaml, no runs", [
+        sys.executable, "ai_tournament.py", "--config", "sample/draughts.yaml", "--epochs", "0", "--test-runs", "0"]),
+    ("run sample/draughts_minmax.yaml, no runs", [
+        sys.executable, "ai_tournament.py", "--config", "sample/draughts_minmax.yaml", "--epochs", "0",
+        "--test-runs", "0"]),
+]
+
+
+def measure(command, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time benchmark")
+    parser.add_argument("--repeats", default=5, type=int, help="Number of measurements per scenario")
+    args = parser.parse_args()
+
+    for name, command in SCENARIOS:
+        times = measure(command, args.repeats)
+        print("{:45}median {:.3f}s\tmin {:.3f}s".format(name, statistics.median(times), min(times)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+""" Measures throughput of the whole stack in fixed-seed scenarios, stores results in JSON
+and flags regressions against a baseline (benchmarks/baseline.json by default)
+
+Scenarios, each measured in games/s and plies/s:
+    engine overhead - Engine with a stub game and players, which do no work
+    draughts minmax depth N - Draughts games between MinMaxDraughtsPlayer players of depth N
+    draughts cnn - the test run of sample/draughts.yaml (DraughtsCNNPlayer pool against MinMax),
+                   skipped when tensorflow is not available
+
+Usage: python benchmarks/throughput.py [--repeats N] [--scenario NAME]... [--output FILE]
+                                       [--baseline FILE] [--tolerance T] [--save-baseline]
+
+Exits with status 1 if any scenario is slower (in plies/s) than its baseline by more than the tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from engine.enigne import Engine  # noqa: E402
+from engine.game import Game, ConstPlayersNGameInfo  # noqa: E402
+from engine.player import Player  # noqa: E402
+
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+SEED = 0
+
+
+class StubGame(Game):
+    """ Game of two players alternately making moves that change nothing, finished after plies plies
+    """
+
+    def __init__(self, plies=100):
+        super(StubGame, self).__init__()
+        self.plies = plies
+        self._ply = 0
+
+    def _prepare_new_game(self):
+        self._ply = 0
+
+    def get_game_info(self):
+        return ConstPlayersNGameInfo(2)
+
+    def get_player_view(self, player):
+        return self._ply
+
+    def get_current_players(self):
+        return [self._players[self._ply % 2]]
+
+    def set_players_moves(self, moves):
+        self._ply += 1
+
+    def is_game_over(self):
+        return self._ply >= self.plies
+
+    def get_game_result(self, player):
+        return 0, 0, 0
+
+
+class StubPlayer(Player):
+    def get_next_move(self):
+        return None
+
+
+def play(game, players, games):
+    """ returns: numbers of games and plies played by the engine
+    """
+    engine = Engine(game)
+    engine.set_testing_players(players)
+
+    plies = [0]
+
+    def count_ply(game, players):
+        plies[0] += 1
+
+    engine.test(games, on_round_complete=count_ply)
+    return games, plies[0]
+
+
+def engine_overhead():
+    return play(StubGame(), [StubPlayer(), StubPlayer()], 2000)
+
+
+def draughts_minmax(depth, games):
+    def scenario():
+        from engine.games.draughts import Draughts, MinMaxDraughtsPlayer
+
+        return play(Draughts(), [MinMaxDraughtsPlayer(depth), MinMaxDraughtsPlayer(depth)], games)
+
+    return scenario
+
+
+def draughts_cnn():
+    """ returns: numbers of games and plies of the test run of sample/draughts.yaml, or None without tensorflow
+    """
+    try:
+        import tensorflow  # noqa: F401
+    except ImportError:
+        return None
+
+    from ai_tournament import prepare_tf_session, close_tf_session
+    from engine.config import get_configuration
+
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    config = get_configuration(["--config", os.path.join("sample", "draughts.yaml"), "--epochs", "0"])
+    try:
+        game = config.game.create()
+        players = [player.create() for player in config.test_players]
+        pools = [pool.create() for pool in config.test_pools]
+        prepare_tf_session(config.tf_session_wrapper)
+
+        engine = Engine(game)
+        engine.set_testing_players(players, pools)
+
+        plies = [0]
+
+        def count_ply(game, players):
+            plies[0] += 1
+
+        engine.test(1, on_round_complete=count_ply)
+        return 1, plies[0]
+    finally:
+        close_tf_session(config.tf_session_wrapper)
+        os.chdir(cwd)
+
+
+SCENARIOS = [
+    ("engine overhead", engine_overhead),
+    ("draughts minmax depth 1", draughts_minmax(1, 10)),
+    ("draughts minmax depth 2", draughts_minmax(2, 4)),
+    ("draughts minmax depth 3", draughts_minmax(3, 2)),
+    ("draughts cnn", draughts_cnn),
+]
+
+
+def measure(scenario, repeats):
+    """ returns: games/s and plies/s of the fastest of repeated runs of the scenario, None if it was skipped
+    """
+    best = None
+    for _ in range(repeats):
+        random.seed(SEED)
+        np.random.seed(SEED)
+
+        start = time.perf_counter()
+        played = scenario()
+        elapsed = time.perf_counter() - start
+        if played is None:
+            return None
+
+        games, plies = played
+        if best is None or plies / elapsed > best[1]:
+            best = games / elapsed, plies / elapsed
+    return best
+
+
+def compare(results, baseline, tolerance):
+    """ returns: names of scenarios slower than in the baseline by more than the tolerance
+    """
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        rates = "{:30}{:10.2f} games/s{:12.1f} plies/s".format(
+            name, result["games_per_second"], result["plies_per_second"])
+        if expected is None:
+            print(rates)
+            continue
+
+        change = result["plies_per_second"] / expected["plies_per_second"] - 1
+        regressed = change < -tolerance
+        if regressed:
+            regressions.append(name)
+        print("{}  {:+7.1%} vs baseline{}".format(rates, change, "  REGRESSION" if regressed else ""))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end throughput benchmark")
+    parser.add_argument("--repeats", default=3, type=int, help="Number of measurements per scenario, best is taken")
+    parser.add_argument("--scenario", dest="scenarios", action="append", choices=[name for name, _ in SCENARIOS],
+                        help="Scenario to run, all by default")
+    parser.add_argument("--output", default=None, help="File to write results to, in JSON")
+    parser.add_argument("--baseline", default=BASELINE, help="File with baseline results")
+    parser.add_argument("--tolerance", default=0.2, type=float,
+                        help="Slowdown against the baseline reported as regression, 0.2 for 20%%")
+    parser.add_argument("--save-baseline", dest="save_baseline", action="store_true",
+                        help="Write results to the baseline file instead of comparing them")
+    args = parser.parse_args()
+
+    results = {}
+    for name, scenario in SCENARIOS:
+        if args.scenarios and name not in args.scenarios:
+            continue
+        rates = measure(scenario, args.repeats)
+        if rates is None:
+            print("{:30}skipped".format(name))
+            continue
+        results[name] = {"games_per_second": round(rates[0], 3), "plies_per_second": round(rates[1], 1)}
+
+    report = {"python": platform.python_version(), "machine": platform.machine(), "results": results}
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(report, file, indent=2)
+        compare(results, {}, args.tolerance)
+        return
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+    if compare(results, baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
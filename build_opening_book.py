@@ -0,0 +1,19 @@
+import argparse
+
+from engine.games.draughts import build_draughts_opening_book
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AITournament - builds draughts opening book.")
+    parser.add_argument("--output", dest="output_path", default="draughts.book", help="Opening book file")
+    parser.add_argument("--plies", dest="plies", default=4, type=int,
+                        help="Number of plies from the beginning of the game covered by the book")
+    parser.add_argument("--depth", dest="depth", default=4, type=int, help="Depth of MinMax search of the best moves")
+    args = parser.parse_args()
+
+    positions = build_draughts_opening_book(args.output_path, args.plies, args.depth)
+    print("Written {} positions to {}".format(positions, args.output_path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+import argparse
+
+from engine.games.draughts_tablebase import generate, write
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AITournament - generates draughts endgame tablebase.")
+    parser.add_argument("--output", dest="output_path", default="draughts.tb", help="Tablebase file")
+    parser.add_argument("--pieces", dest="pieces", default=3, type=int,
+                        help="Max number of pieces on the board in solved positions")
+    args = parser.parse_args()
+
+    tables = generate(args.pieces)
+    write(tables, args.pieces, args.output_path)
+    print("Written {} positions to {}".format(sum(len(table) for table in tables.values()), args.output_path))
+
+
+if __name__ == "__main__":
+    main()
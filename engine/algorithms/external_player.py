@@ -0,0 +1,205 @@
+""" Players whose moves are chosen by external engines - subprocesses talking a line-based protocol:
+for every move the player writes a line with the position and the engine answers with a line with its move
+
+Engine processes are started when their pool is created (warm) and are reused across moves and games by all players
+with the same command (see open_engine_pool). Requests are served by an asyncio event loop running in a background
+thread, so any number of games - in threads or in coroutines of any event loop, like games of ConcurrentEngine
+(engine.concurrent) - can wait for engines concurrently.
+"""
+import asyncio
+import atexit
+import shlex
+import threading
+
+import engine.metrics
+import engine.player
+
+DEFAULT_TIMEOUT = 10.
+
+_open_pools = {}
+
+
+class EnginePool:
+    """ Processes of an external engine, each serving one request at a time
+
+    An engine that does not answer in time, exits or answers with an empty line is killed and replaced
+    with a new process, as its state is not known.
+    """
+
+    def __init__(self, command, size=1):
+        """
+        args:
+            command - command line of the engine, as a string or a list of arguments
+            size - number of engine processes
+        """
+        self.command = shlex.split(command) if isinstance(command, str) else list(command)
+        self.size = 0
+
+        self._processes = []
+        self._idle = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+
+        self._requests_metric = engine.metrics.counter("external_engine_requests_total",
+                                                       "Requests answered by external engines")
+        self._restarts_metric = engine.metrics.counter("external_engine_restarts_total",
+                                                       "External engine processes replaced after failures")
+
+        self.grow(size)
+
+    def grow(self, size):
+        """ Starts new engine processes, so that there are at least size of them
+        """
+        asyncio.run_coroutine_threadsafe(self._grow(size), self._loop).result()
+
+    async def _grow(self, size):
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+        while self.size < size:
+            self._idle.put_nowait(await self._start_process())
+            self.size += 1
+
+    async def _start_process(self):
+        process = await asyncio.create_subprocess_exec(*self.command, stdin=asyncio.subprocess.PIPE,
+                                                       stdout=asyncio.subprocess.PIPE)
+        self._processes.append(process)
+        return process
+
+    async def _stop_process(self, process):
+        self._processes.remove(process)
+        if process.returncode is None:
+            process.kill()
+        await process.wait()
+
+    async def _request(self, line, timeout):
+        process = await self._idle.get()
+        try:
+            process.stdin.write(line.encode() + b"\n")
+            await process.stdin.drain()
+            answer = await asyncio.wait_for(process.stdout.readline(), timeout)
+            if not answer.strip():
+                raise RuntimeError("Engine {} exited or gave an empty answer".format(" ".join(self.command)))
+        except (asyncio.TimeoutError, asyncio.CancelledError, RuntimeError, OSError) as error:
+            await self._stop_process(process)
+            self._idle.put_nowait(await self._start_process())
+            self._restarts_metric.inc()
+            if isinstance(error, asyncio.CancelledError):
+                raise
+            if isinstance(error, asyncio.TimeoutError):
+                raise TimeoutError("Engine {} did not answer in {} s".format(" ".join(self.command), timeout))
+            raise RuntimeError("Engine {} failed: {}".format(" ".join(self.command), error)) from error
+
+        self._idle.put_nowait(process)
+        self._requests_metric.inc()
+        return answer.decode().strip()
+
+    def request(self, line, timeout=DEFAULT_TIMEOUT):
+        """ Sends a line to an idle engine (waiting for one if all are busy) and waits for its answer
+
+        args:
+            line - request, without the line end
+            timeout - seconds the engine has to answer in, None for no limit
+
+        returns: the answer line, without the line end
+        raises: TimeoutError if the engine did not answer in time, RuntimeError if it failed
+        """
+        return asyncio.run_coroutine_threadsafe(self._request(line, timeout), self._loop).result()
+
+    async def request_async(self, line, timeout=DEFAULT_TIMEOUT):
+        """ Like request, awaited in any event loop
+        """
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._request(line, timeout), self._loop))
+
+    def close(self):
+        async def stop_all():
+            for process in list(self._processes):
+                await self._stop_process(process)
+
+        if self._loop.is_running():
+            asyncio.run_coroutine_threadsafe(stop_all(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+        self._loop.close()
+
+
+def open_engine_pool(command, size=1):
+    """ Returns EnginePool for a command, shared by all its users - with as many processes as the largest size
+    requested
+    """
+    key = command if isinstance(command, str) else tuple(command)
+    if key not in _open_pools:
+        _open_pools[key] = EnginePool(command, size)
+    else:
+        _open_pools[key].grow(size)
+    return _open_pools[key]
+
+
+@atexit.register
+def close_engine_pools():
+    for pool in _open_pools.values():
+        pool.close()
+    _open_pools.clear()
+
+
+class ExternalPlayer(engine.player.Player):
+    """ Player asking an external engine for its moves
+
+    Subclasses define encode_view, decode_move and fallback_move for their game.
+    """
+
+    def __init__(self, command, pool_size=1, timeout=DEFAULT_TIMEOUT, fallback=True):
+        """
+        args:
+            command - command line of the engine, as a string or a list of arguments
+            pool_size - number of engine processes, shared by players with the same command
+            timeout - seconds the engine has to give a move in, None for no limit
+            fallback - if True, fallback_move is played when the engine fails to give a legal move in time,
+                       otherwise the error is raised
+        """
+        super(ExternalPlayer, self).__init__()
+        self.pool = open_engine_pool(command, pool_size)
+        self.timeout = timeout
+        self.fallback = fallback
+
+        self._failures_metric = engine.metrics.counter("external_engine_failures_total",
+                                                       "Moves external engines failed to give in time or correctly")
+
+    def encode_view(self, view):
+        """ returns: request line of the view, without the line end
+        """
+        raise NotImplementedError
+
+    def decode_move(self, view, answer):
+        """ returns: move of the view given in the answer line of the engine
+        raises: ValueError if the move is not legal
+        """
+        raise NotImplementedError
+
+    def fallback_move(self, view):
+        """ returns: move played when the engine fails
+        """
+        raise NotImplementedError
+
+    def get_next_move(self):
+        try:
+            return self.decode_move(self.view, self.pool.request(self.encode_view(self.view), self.timeout))
+        except (TimeoutError, RuntimeError, ValueError):
+            self._failures_metric.inc()
+            if not self.fallback:
+                raise
+            return self.fallback_move(self.view)
+
+    async def get_next_move_async(self):
+        """ Like get_next_move, awaited in any event loop - the move is given for the view set before the call,
+        so the player can take part in other games while it waits
+        """
+        view = self.view
+        try:
+            answer = await self.pool.request_async(self.encode_view(view), self.timeout)
+            return self.decode_move(view, answer)
+        except (TimeoutError, RuntimeError, ValueError):
+            self._failures_metric.inc()
+            if not self.fallback:
+                raise
+            return self.fallback_move(view)
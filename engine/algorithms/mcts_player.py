@@ -0,0 +1,276 @@
+import math
+import random
+import time
+
+import engine.metrics
+import engine.player
+
+
+def _sign(value):
+    return (value > 0) - (value < 0)
+
+
+def default_terminal_value(game_logic):
+    """ returns: function giving value of terminal views as sign of game logic's evaluation
+    """
+    def terminal_value(view, viewpoint_player):
+        return _sign(game_logic.evaluate_view(view, viewpoint_player))
+
+    return terminal_value
+
+
+class RolloutEvaluator:
+    """ Evaluates views by playing random moves, of all views together, until the end of the game
+    or for at most max_plies plies, when the sign of game logic's evaluation is taken
+    """
+
+    def __init__(self, game_logic, max_plies=20, terminal_value=None):
+        self._game_logic = game_logic
+        self.max_plies = max_plies
+        self._terminal_value = terminal_value or default_terminal_value(game_logic)
+
+    def evaluate_views(self, views, viewpoint_player):
+        """ returns: list of values of views in [-1, 1], from the point of view of given player
+        """
+        values = [None] * len(views)
+        playing = list(range(len(views)))
+        views = list(views)
+
+        for _ in range(self.max_plies):
+            playing = [i for i in playing if not self._game_logic.is_view_terminal(views[i])]
+            if not playing:
+                break
+
+            moves_lists = self._game_logic.list_moves_batch([views[i] for i in playing])
+            new_views = self._game_logic.apply_moves([views[i] for i in playing],
+                                                     [random.choice(moves) for moves in moves_lists])
+            for i, view in zip(playing, new_views):
+                views[i] = view
+
+        for i, view in enumerate(views):
+            if self._game_logic.is_view_terminal(view):
+                values[i] = self._terminal_value(view, viewpoint_player)
+            else:
+                values[i] = _sign(self._game_logic.evaluate_view(view, viewpoint_player))
+
+        return values
+
+
+class _Node:
+    __slots__ = ("view", "parent", "move", "children", "visits", "total_value")
+
+    def __init__(self, view, parent=None, move=None):
+        self.view = view
+        self.parent = parent
+        self.move = move
+        self.children = None
+        self.visits = 0.
+        # from the point of view of the player that made the move leading to the node
+        self.total_value = 0.
+
+
+class MonteCarloTreeSearch:
+    """ Monte Carlo Tree Search with UCT selection
+
+    Leaves are collected in batches and evaluated together - every selected leaf gets virtual loss,
+    so that next selections of the batch go to other leaves. Subtree of the position reached
+    by the actually played moves is kept for the next search.
+    """
+
+    def __init__(self, game_logic, evaluator, playouts=200, time_budget=None, batch_size=8, exploration=1.4,
+                 virtual_loss=1., terminal_value=None):
+        """
+        args:
+            game_logic - an object that implements FiniteTurnGameLogic interface, hash_view is used for tree reuse
+            evaluator - object with evaluate_views(views, viewpoint_player) method, returning values in [-1, 1]
+            playouts - max number of evaluated leaves per search
+            time_budget - max time of a search in seconds, None for no limit
+            batch_size - number of leaves evaluated together
+            exploration - UCT exploration constant
+            virtual_loss - visits counted as losses for each selection of a leaf waiting for evaluation
+            terminal_value - function returning value of terminal view for given player, in [-1, 1]
+        """
+        if playouts is None and time_budget is None:
+            raise ValueError("Playouts or time budget must be given")
+
+        self._game_logic = game_logic
+        self.evaluator = evaluator
+        self.playouts = playouts
+        self.time_budget = time_budget
+        self.batch_size = batch_size
+        self.exploration = exploration
+        self.virtual_loss = virtual_loss
+        self._terminal_value = terminal_value or default_terminal_value(game_logic)
+
+        self._root = None
+        self.reused_visits = 0
+        self._playouts_metric = engine.metrics.counter("search_nodes_total", "Positions visited by search players")
+
+    def reset(self):
+        self._root = None
+
+    def search(self, view, player):
+        """ returns: the most visited move of the position, for given player to move
+        """
+        self._player = player
+        root = self._find_root(view)
+        root.parent = None
+        self._root = root
+        self.reused_visits = root.visits
+
+        start = time.perf_counter()
+        done = 0
+        while self.playouts is None or done < self.playouts:
+            batch = self.batch_size if self.playouts is None else min(self.batch_size, self.playouts - done)
+            evaluated = self._run_batch(root, batch)
+            done += evaluated
+            self._playouts_metric.inc(evaluated)
+
+            if evaluated == 0 or \
+                    self.time_budget is not None and time.perf_counter() - start >= self.time_budget:
+                break
+
+        if root.children is None:
+            self._expand([root])
+        if not root.children:
+            return None
+
+        best_visits = max(child.visits for child in root.children)
+        best = random.choice([child for child in root.children if child.visits == best_visits])
+        self._root = best
+        return best.move
+
+    def _find_root(self, view):
+        """ returns: node of the view from the kept subtree (moves of the player and of the others since
+        the last search), or a new node
+        """
+        try:
+            view_hash = self._game_logic.hash_view(view)
+        except NotImplementedError:
+            return _Node(view)
+
+        nodes = [self._root] if self._root is not None else []
+        for _ in range(3):
+            for node in nodes:
+                if self._game_logic.hash_view(node.view) == view_hash:
+                    node.view = view
+                    return node
+            nodes = [child for node in nodes if node.children is not None for child in node.children]
+
+        return _Node(view)
+
+    def _run_batch(self, root, size):
+        """ Selects up to size leaves, evaluates and expands them and backs their values up
+
+        returns: number of evaluated leaves
+        """
+        leaves = []
+        for _ in range(size):
+            leaf = self._select(root)
+            if leaf in leaves:
+                self._revert_virtual_loss(leaf)
+                break
+            leaves.append(leaf)
+
+        terminal = [leaf for leaf in leaves if self._game_logic.is_view_terminal(leaf.view)]
+        evaluated = [leaf for leaf in leaves if not self._game_logic.is_view_terminal(leaf.view)]
+
+        values = {}
+        for leaf in terminal:
+            values[leaf] = self._terminal_value(leaf.view, self._player)
+        if evaluated:
+            for leaf, value in zip(evaluated, self.evaluator.evaluate_views([leaf.view for leaf in evaluated],
+                                                                            self._player)):
+                values[leaf] = value
+
+        self._expand(evaluated)
+
+        for leaf in leaves:
+            self._revert_virtual_loss(leaf)
+            self._backup(leaf, values[leaf])
+
+        return len(leaves)
+
+    def _select(self, root):
+        node = root
+        while True:
+            node.visits += self.virtual_loss
+            node.total_value -= self.virtual_loss
+
+            if node.children is None or not node.children:
+                return node
+
+            log_visits = math.log(max(node.visits, 1.))
+            best_score = None
+            best_children = []
+            for child in node.children:
+                if child.visits == 0:
+                    score = math.inf
+                else:
+                    score = child.total_value / child.visits + \
+                        self.exploration * math.sqrt(log_visits / child.visits)
+
+                if best_score is None or score > best_score:
+                    best_score = score
+                    best_children = [child]
+                elif score == best_score:
+                    best_children.append(child)
+
+            node = random.choice(best_children)
+
+    def _revert_virtual_loss(self, leaf):
+        node = leaf
+        while node is not None:
+            node.visits -= self.virtual_loss
+            node.total_value += self.virtual_loss
+            node = node.parent
+
+    def _backup(self, leaf, value):
+        """ args:
+            value - value of the leaf from the point of view of the searching player
+        """
+        node = leaf
+        while node is not None:
+            node.visits += 1
+            if node.parent is not None:
+                mover = self._game_logic.get_current_player(node.parent.view)
+                node.total_value += value if mover == self._player else -value
+            node = node.parent
+
+    def _expand(self, nodes):
+        nodes = [node for node in nodes if node.children is None]
+        moves_lists = self._game_logic.list_moves_batch([node.view for node in nodes])
+
+        parents = [node.view for node, moves in zip(nodes, moves_lists) for _ in moves]
+        moves = [move for moves in moves_lists for move in moves]
+        children = iter(self._game_logic.apply_moves(parents, moves))
+
+        for node, node_moves in zip(nodes, moves_lists):
+            node.children = [_Node(next(children), node, move) for move in node_moves]
+
+
+class MCTSPlayer(engine.player.Player):
+    """ Player selecting moves with Monte Carlo Tree Search
+    """
+
+    def __init__(self, game_logic, evaluator=None, playouts=200, time_budget=None, batch_size=8, exploration=1.4,
+                 virtual_loss=1., rollout_plies=20, terminal_value=None):
+        """
+        args:
+            game_logic - an object that implements FiniteTurnGameLogic interface
+            evaluator - object with evaluate_views(views, viewpoint_player) method returning values in [-1, 1],
+                        random rollouts of up to rollout_plies plies by default
+            for other args see MonteCarloTreeSearch
+        """
+        super(MCTSPlayer, self).__init__()
+
+        if evaluator is None:
+            evaluator = RolloutEvaluator(game_logic, rollout_plies, terminal_value)
+        self.search = MonteCarloTreeSearch(game_logic, evaluator, playouts, time_budget, batch_size, exploration,
+                                           virtual_loss, terminal_value)
+
+    def prepare_new_game(self):
+        self.search.reset()
+
+    def get_next_move(self):
+        return self.search.search(self.view, self)
@@ -1,7 +1,30 @@
 import random
 
+import engine.metrics
 import engine.player
 import engine.player_pool
+from engine.algorithms.mcts_player import default_terminal_value
+from engine.algorithms.opening_book import open_book
+
+EXPANSION_BATCH_SIZE = 1024
+RETAINED_NODES = 200000
+
+
+def _sign(value):
+    return (value > 0) - (value < 0)
+
+
+class _Node:
+    __slots__ = ("view", "moves", "children", "exact_value", "value")
+
+    def __init__(self, view):
+        self.view = view
+        self.moves = None
+        self.children = None
+        # value of a solved (tablebase or terminal) view, which is not searched further
+        self.exact_value = None
+        # evaluation of the view by the game logic, computed when the view is a leaf of a search
+        self.value = None
 
 
 class MinMaxPlayer(engine.player.Player):
@@ -10,7 +33,8 @@ class MinMaxPlayer(engine.player.Player):
     where all other players pick worst possible moves for this one.
     """
 
-    def __init__(self, game_logic, depth):
+    def __init__(self, game_logic, depth, opening_book=None, tablebase=None, retain_tree=False,
+                 max_retained_nodes=RETAINED_NODES, evaluator=None, viewpoint_player=None, terminal_value=None):
         """ Creates instance of player
         that makes moves according to the MinMax algorithm
 
@@ -18,45 +42,286 @@ class MinMaxPlayer(engine.player.Player):
             game_logic - an object that implements FiniteTurnGameLogic interface
             depth - integer > 0, depth of analysis - 1 means that only next move will be evaluated,
                     2 that also next player's move will be etc
+            opening_book - OpeningBook or path to it, positions found in the book are not searched
+            tablebase - object with evaluate_view(view, viewpoint_player) method, returning exact evaluation
+                        of solved positions (which are not searched further) or None for other positions
+            retain_tree - if True, the searched tree is kept between moves - the subtree of the position reached
+                          by the played moves (found with hash_view) becomes the root of the next search,
+                          so that only its frontier is expanded
+            max_retained_nodes - max number of nodes kept between moves, deepest levels of the subtree are dropped
+                                 to fit in it
+            evaluator - object with evaluate_views(views, viewpoint_player) method, which evaluates leaves
+                        of the search (views at the full depth that are not terminal) instead of game logic -
+                        the searched tree is built level by level and all its leaves are evaluated in one call;
+                        its values should be lower than wins and higher than losses of terminal_value
+            viewpoint_player - player whose moves are searched for, if not this one (when the search is used
+                               by another player)
+            terminal_value - function returning value of terminal view for given player on the scale
+                             of the evaluator, e.g. 1 for wins, -1 for losses and 0 for draws - used with evaluator
+                             instead of game logic's evaluation (by default its sign), solved positions of tablebase
+                             are valued by the sign of their evaluation as well
         """
         super(MinMaxPlayer, self).__init__()
 
         self._game_logic = game_logic
         self.depth = depth
+        self.opening_book = open_book(opening_book)
+        self.tablebase = tablebase
+        self.retain_tree = retain_tree
+        self.max_retained_nodes = max_retained_nodes
+        self.evaluator = evaluator
+        self.viewpoint_player = self if viewpoint_player is None else viewpoint_player
+        self._terminal_value = terminal_value or default_terminal_value(game_logic)
+
+        self._root = None
+        self._nodes = 0
+        self._nodes_metric = engine.metrics.counter("search_nodes_total", "Positions visited by search players")
+
+    def prepare_new_game(self):
+        self._root = None
 
     def get_next_move(self):
         """ Returns next move based on MinMax algorithm.
         If multiple moves are equally good, returns
         """
-        best_value = None
-        best_moves = None
+        if self.opening_book is not None:
+            move = self.opening_book.probe(self._game_logic, self.view)
+            if move is not None:
+                self._root = None
+                return move
 
-        for move in self._game_logic.list_moves(self.view):
-            value = self._evaluate(move, self.view, 1)
+        move = random.choice(self.get_best_moves())
+        if self.retain_tree:
+            self._retain(move)
+        return move
 
+    def get_best_moves(self):
+        """ Returns all moves that are equally good according to the MinMax algorithm
+        """
+        self._nodes = 0
+
+        if self.retain_tree or self.evaluator is not None:
+            moves, values = self._search_tree()
+            if not self.retain_tree:
+                self._root = None
+        else:
+            moves = self._game_logic.list_moves(self.view)
+            values = self._evaluate_views(self._game_logic.apply_moves([self.view] * len(moves), moves), 1)
+
+        best_value = None
+        best_moves = None
+        for move, value in zip(moves, values):
             if best_value is None or best_value < value:
                 best_value = value
                 best_moves = [move]
             elif best_value == value:
                 best_moves.append(move)
 
-        return random.choice(best_moves)
+        self._nodes_metric.inc(self._nodes)
+
+        return best_moves
 
-    def _evaluate(self, move, view, current_depth):
-        new_view = self._game_logic.apply_move(view, move)
+    def _evaluate_views(self, views, current_depth):
+        """ Evaluates views at the same depth together, so that their successors are listed and created
+        with batched game logic calls (of up to EXPANSION_BATCH_SIZE successors each)
+        """
+        values = [None] * len(views)
+        expanded = []
+        for i, view in enumerate(views):
+            self._nodes += 1
 
-        if current_depth == self.depth or self._game_logic.is_view_terminal(new_view):
-            return self._game_logic.evaluate_view(new_view, self)
+            if self.tablebase is not None:
+                values[i] = self.tablebase.evaluate_view(view, self.viewpoint_player)
+                if values[i] is not None:
+                    continue
 
-        current_player = self._game_logic.get_current_player(new_view)
+            if current_depth == self.depth or self._game_logic.is_view_terminal(view):
+                values[i] = self._game_logic.evaluate_view(view, self.viewpoint_player)
+            else:
+                expanded.append(i)
 
-        best_value = None
-        for move in self._game_logic.list_moves(new_view):
-            value = self._evaluate(move, new_view, current_depth + 1)
+        moves_lists = self._game_logic.list_moves_batch([views[i] for i in expanded])
+
+        chunk_start = 0
+        while chunk_start < len(expanded):
+            chunk_end = chunk_start
+            successors = 0
+            while chunk_end < len(expanded) and \
+                    (chunk_end == chunk_start or successors + len(moves_lists[chunk_end]) <= EXPANSION_BATCH_SIZE):
+                successors += len(moves_lists[chunk_end])
+                chunk_end += 1
+
+            parents = []
+            moves = []
+            for j in range(chunk_start, chunk_end):
+                parents += [views[expanded[j]]] * len(moves_lists[j])
+                moves += moves_lists[j]
+            successor_values = self._evaluate_views(self._game_logic.apply_moves(parents, moves), current_depth + 1)
+
+            offset = 0
+            for j in range(chunk_start, chunk_end):
+                current_player = self._game_logic.get_current_player(views[expanded[j]])
+
+                best_value = None
+                for value in successor_values[offset:offset + len(moves_lists[j])]:
+                    if best_value is None or \
+                            current_player == self.viewpoint_player and value > best_value or \
+                            current_player != self.viewpoint_player and value < best_value:
+                        best_value = value
+
+                values[expanded[j]] = best_value
+                offset += len(moves_lists[j])
+
+            chunk_start = chunk_end
+
+        return values
+
+    def _search_tree(self):
+        """ Searches the retained tree, expanding its nodes that are not deep enough
+
+        returns: moves of the root and their values
+        """
+        root = self._find_root()
+        self._root = root
 
+        frontier = []
+        self._collect_frontier(root, 0, frontier)
+        while frontier:
+            frontier = self._expand(frontier)
+        if self.evaluator is not None:
+            self._evaluate_leaves(root)
+
+        return root.moves, [self._tree_value(child, 1) for child in root.children]
+
+    def _find_root(self):
+        """ returns: node of the current view from the retained tree (which starts after the last move
+        of this player), or a new node
+        """
+        try:
+            view_hash = self._game_logic.hash_view(self.view)
+        except NotImplementedError:
+            return _Node(self.view)
+
+        nodes = [self._root] if self._root is not None else []
+        for _ in range(3):
+            for node in nodes:
+                if self._game_logic.hash_view(node.view) == view_hash:
+                    node.view = self.view
+                    return node
+            nodes = [child for node in nodes if node.children is not None for child in node.children]
+
+        return _Node(self.view)
+
+    def _collect_frontier(self, node, current_depth, frontier):
+        """ Appends (node, depth) pairs of not expanded nodes of the tree that have to be expanded
+        """
+        if current_depth == self.depth or current_depth > 0 and node.exact_value is not None:
+            return
+        if node.children is None:
+            frontier.append((node, current_depth))
+            return
+        for child in node.children:
+            self._collect_frontier(child, current_depth + 1, frontier)
+
+    def _expand(self, frontier):
+        """ Lists moves of nodes and creates their children, in batched game logic calls
+        (of up to EXPANSION_BATCH_SIZE successors each)
+
+        returns: children that have to be expanded next, with their depths
+        """
+        nodes = [node for node, _ in frontier]
+        for node, moves in zip(nodes, self._game_logic.list_moves_batch([node.view for node in nodes])):
+            node.moves = moves
+            node.children = []
+
+        next_frontier = []
+        chunk_start = 0
+        while chunk_start < len(frontier):
+            chunk_end = chunk_start
+            successors = 0
+            while chunk_end < len(frontier) and \
+                    (chunk_end == chunk_start or successors + len(nodes[chunk_end].moves) <= EXPANSION_BATCH_SIZE):
+                successors += len(nodes[chunk_end].moves)
+                chunk_end += 1
+
+            parents = []
+            moves = []
+            for node in nodes[chunk_start:chunk_end]:
+                parents += [node.view] * len(node.moves)
+                moves += node.moves
+            children = iter(self._game_logic.apply_moves(parents, moves))
+
+            for node, current_depth in frontier[chunk_start:chunk_end]:
+                for _ in node.moves:
+                    child = self._new_node(next(children))
+                    node.children.append(child)
+                    if current_depth + 1 < self.depth and child.exact_value is None:
+                        next_frontier.append((child, current_depth + 1))
+
+            chunk_start = chunk_end
+
+        return next_frontier
+
+    def _new_node(self, view):
+        self._nodes += 1
+        node = _Node(view)
+        if self.tablebase is not None:
+            node.exact_value = self.tablebase.evaluate_view(view, self.viewpoint_player)
+            if node.exact_value is not None and self.evaluator is not None:
+                node.exact_value = _sign(node.exact_value)
+        if node.exact_value is None and self._game_logic.is_view_terminal(view):
+            if self.evaluator is not None:
+                node.exact_value = self._terminal_value(view, self.viewpoint_player)
+            else:
+                node.exact_value = self._game_logic.evaluate_view(view, self.viewpoint_player)
+        return node
+
+    def _evaluate_leaves(self, root):
+        """ Evaluates leaves of the tree that were not evaluated yet with the evaluator, in one call
+        """
+        level = [root]
+        for _ in range(self.depth):
+            level = [child for node in level if node.exact_value is None and node.children is not None
+                     for child in node.children]
+
+        leaves = [node for node in level if node.exact_value is None and node.value is None]
+        if leaves:
+            values = self.evaluator.evaluate_views([node.view for node in leaves], self.viewpoint_player)
+            for node, value in zip(leaves, values):
+                node.value = value
+
+    def _tree_value(self, node, current_depth):
+        if node.exact_value is not None:
+            return node.exact_value
+
+        if current_depth == self.depth:
+            if node.value is None:
+                node.value = self._game_logic.evaluate_view(node.view, self.viewpoint_player)
+            return node.value
+
+        current_player = self._game_logic.get_current_player(node.view)
+        best_value = None
+        for child in node.children:
+            value = self._tree_value(child, current_depth + 1)
             if best_value is None or \
-                    current_player == self and value > best_value or \
-                    current_player != self and value < best_value:
+                    current_player == self.viewpoint_player and value > best_value or \
+                    current_player != self.viewpoint_player and value < best_value:
                 best_value = value
-
         return best_value
+
+    def _retain(self, move):
+        """ Keeps subtree of the chosen move, without its deepest levels that do not fit in max_retained_nodes
+        """
+        self._root = self._root.children[self._root.moves.index(move)]
+
+        level = [self._root]
+        retained = 0
+        while level:
+            retained += len(level)
+            children = [child for node in level if node.children is not None for child in node.children]
+            if retained + len(children) > self.max_retained_nodes:
+                for node in level:
+                    node.moves = None
+                    node.children = None
+                break
+            level = children
@@ -0,0 +1,106 @@
+""" Opening book - best moves for positions near the beginning of the game, searched offline
+
+Book is a file with a header followed by records sorted by position hash, each record being:
+    position hash (as returned by FiniteTurnGameLogic.hash_view) - uint64
+    index of the best move in list returned by FiniteTurnGameLogic.list_moves - uint16
+    depth of the search that selected the move - uint16
+The file is memory-mapped and searched with binary search, so it is never loaded as a whole.
+"""
+import mmap
+import struct
+
+MAGIC = b"AIOB"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQ")  # magic, version, reserved, records count
+RECORD = struct.Struct("<QHH")
+
+_open_books = {}
+
+
+class OpeningBook:
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, self.size = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError("{} is not an opening book".format(path))
+        if version != VERSION:
+            raise ValueError("Unsupported opening book version: {}".format(version))
+
+    def _find(self, position_hash):
+        low = 0
+        high = self.size
+        while low < high:
+            middle = (low + high) // 2
+            record_hash, move_index, depth = RECORD.unpack_from(self._map, HEADER.size + middle * RECORD.size)
+            if record_hash < position_hash:
+                low = middle + 1
+            elif record_hash > position_hash:
+                high = middle
+            else:
+                return move_index
+
+        return None
+
+    def probe(self, game_logic, view):
+        """ returns: best move for the view, or None if the position is not in the book
+        """
+        move_index = self._find(game_logic.hash_view(view))
+        if move_index is None:
+            return None
+
+        moves = game_logic.list_moves(view)
+        return moves[move_index] if move_index < len(moves) else None
+
+    def close(self):
+        self._map.close()
+
+
+def open_book(book):
+    """ Returns OpeningBook for a path, shared by all users of the path; OpeningBook and None are returned as they are
+    """
+    if book is None or isinstance(book, OpeningBook):
+        return book
+
+    if book not in _open_books:
+        _open_books[book] = OpeningBook(book)
+    return _open_books[book]
+
+
+def build_opening_book(game_logic, root_view, plies, select_move, path, depth=0):
+    """ Searches all positions reachable from root_view in less than given number of plies and writes the book
+
+    args:
+        game_logic - an object that implements FiniteTurnGameLogic interface, including hash_view
+        root_view - view of the beginning of the game
+        plies - number of plies from the beginning of the game covered by the book
+        select_move - function returning best move for a view
+        path - path of the book file to be written
+        depth - depth of search done by select_move, stored for information
+
+    returns: number of positions in the book
+    """
+    best_moves = {}
+    positions = [root_view]
+
+    for ply in range(plies):
+        next_positions = []
+        for view in positions:
+            position_hash = game_logic.hash_view(view)
+            if position_hash in best_moves or game_logic.is_view_terminal(view):
+                continue
+
+            moves = game_logic.list_moves(view)
+            best_moves[position_hash] = moves.index(select_move(view))
+
+            if ply + 1 < plies:
+                next_positions.extend(game_logic.apply_move(view, move) for move in moves)
+        positions = next_positions
+
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, 0, len(best_moves)))
+        for position_hash in sorted(best_moves.keys()):
+            file.write(RECORD.pack(position_hash, best_moves[position_hash], depth))
+
+    return len(best_moves)
@@ -1,5 +1,4 @@
 import random
-import tensorflow as tf
 
 from engine.player_pool import PlayerPool
 from engine.player import ParametrizedPlayer
@@ -52,6 +51,8 @@ class EvolutionWithMutationPlayerPool(PlayerPool):
         return setters
 
     def _create_setter(self, from_player, to_player, stddev):
+        import tensorflow as tf
+
         ops = [
             tf.assign(var_to, var_from + tf.random_normal(var_from.get_shape(), stddev=stddev))
             for var_from, var_to in zip(from_player.get_variable_list(), to_player.get_variable_list())
@@ -135,8 +136,10 @@ class EvolutionWithMutationPlayerPool(PlayerPool):
             for p in to_generate:
                 if p not in self._winners:
                     self._session.run(self._setters[self._winners.pop()][p])
+                    p.variables_changed()
                 elif self._winners.count(p) == 1:
                     self._session.run(self._setters[p][p])
+                    p.variables_changed()
                     self._winners = [winner for winner in self._winners if winner is not p]
                 else:
                     next_to_generate.append(p)
@@ -144,3 +147,6 @@ class EvolutionWithMutationPlayerPool(PlayerPool):
 
     def prepare_new_game(self):
         self._in_game = 0
+
+    def get_players(self):
+        return list(self._players)
@@ -1,5 +1,3 @@
-import tensorflow as tf
-
 from engine.player_pool import PlayerPool
 from engine.player import ParametrizedPlayer
 
@@ -9,6 +7,8 @@ class OnePlusOnePlayerPool(PlayerPool):
                  sigma_proportion=1.2,
                  sigma_scaling_interval=10,
                  win_proportion=0.2):
+        import tensorflow as tf
+
         super(OnePlusOnePlayerPool, self).__init__()
         assert issubclass(player_type, ParametrizedPlayer)
 
@@ -66,6 +66,10 @@ class OnePlusOnePlayerPool(PlayerPool):
 
         setter = self._from_first_player_setter if self._best_player is self._first_player else self._from_second_player_setter
         self._session.run(setter, {self._sigma_placeholder: self.sigma})
+        if self._best_player is self._first_player:
+            self._second_player.variables_changed()
+        else:
+            self._first_player.variables_changed()
 
         self._best_player.set_name("{}: Best player".format(self.name))
         if self._best_player is self._first_player:
@@ -78,6 +82,9 @@ class OnePlusOnePlayerPool(PlayerPool):
     def prepare_new_game(self):
         self.active_players = 0
 
+    def get_players(self):
+        return [self._first_player, self._second_player]
+
     def _scale_sigma(self):
         self._sigma_scaling_t += 1
         if self._sigma_scaling_t == self._sigma_scaling_interval:
@@ -92,6 +99,8 @@ class OnePlusOnePlayerPool(PlayerPool):
             self._new_player_wins = 0
 
     def _create_setter(self, source, dest):
+        import tensorflow as tf
+
         return tf.group([
             tf.assign(dst, src + tf.random_normal(src.get_shape(), stddev=self._sigma_placeholder))
             for src, dst in zip(source.get_variable_list(), dest.get_variable_list())
@@ -0,0 +1,135 @@
+""" Concurrent mode, in which games of test runs are played at the same time as coroutines of an asyncio event loop,
+each on its own game instance
+
+Players with get_next_move_async method (e.g. ExternalPlayer) wait for their moves without blocking other games,
+so external engines of a pool answer moves of many games at once. Other players move synchronously.
+"""
+import asyncio
+
+from engine.enigne import Engine
+
+
+async def _next_move(player, view):
+    # the view is set right before the move is asked for, as the player may take part in other games meanwhile
+    player.set_current_view(view)
+    get_next_move_async = getattr(player, "get_next_move_async", None)
+    if get_next_move_async is None:
+        return player.get_next_move()
+    return await get_next_move_async()
+
+
+async def play_game_async(game, players, on_round_complete=None):
+    """ Like engine.enigne.play_game, awaiting moves of players that have get_next_move_async
+
+    returns: number of plies of the game
+    """
+    game.prepare_new_game(players)
+
+    plies = 0
+    while not game.is_game_over():
+        for player in players:
+            player.set_current_view(game.get_player_view(player))
+
+        moves = {}
+        for player in game.get_current_players():
+            moves[player] = await _next_move(player, game.get_player_view(player))
+        game.set_players_moves(moves)
+        plies += 1
+
+        if on_round_complete:
+            on_round_complete(game, players)
+
+    return plies
+
+
+class ConcurrentEngine(Engine):
+    """ Engine that plays up to len(games) games of a test run at the same time
+
+    Results are registered in order of games, as by Engine. The same players take part in many games at once,
+    so they should not keep state of a game between its moves (e.g. retained search trees). Train runs are played
+    game by game, so that pools train on every game before players of the next one are selected.
+    """
+
+    def __init__(self, games):
+        """
+        args:
+            games - instances of the game, one for each game played at the same time - the first one is the game
+                    of the engine, which gets run statistics of all of them
+        """
+        super(ConcurrentEngine, self).__init__(games[0])
+        self.games = games
+
+    def _run(self, iterations, is_train, on_run_complete, on_game_complete, on_round_complete):
+        if is_train or len(self.games) == 1:
+            return super(ConcurrentEngine, self)._run(iterations, is_train, on_run_complete, on_game_complete,
+                                                      on_round_complete)
+
+        results = asyncio.run(self._run_concurrently(iterations, on_game_complete, on_round_complete))
+        for game in self.games[1:]:
+            statistics = game.get_run_statistics()
+            if statistics:
+                self.game.add_run_statistics(statistics)
+
+        if on_run_complete:
+            on_run_complete(*results)
+        return results
+
+    async def _run_concurrently(self, iterations, on_game_complete, on_round_complete):
+        results_by_players = {player: [] for player in self.test_players}
+        results_by_pools = {pool: [] for pool in self.test_player_pools}
+        cache = self.test_result_cache
+        if cache is not None:
+            cache.start_run()
+        early_stopping = self.test_early_stopping
+        if early_stopping is not None:
+            early_stopping.start_run()
+
+        idle_games = asyncio.Queue()
+        for game in self.games:
+            idle_games.put_nowait(game)
+
+        # games waiting for an idle game instance get it in order, so that the earliest ones are played first
+        prepared = []
+        for _ in range(iterations):
+            players, pools_by_player = self._prepare_game(self.test_players, self.test_player_pools)
+            cached = cache.get(players) if cache is not None else None
+            task = None if cached is not None else \
+                asyncio.ensure_future(self._play_game_async(players, idle_games, on_round_complete))
+            prepared.append((players, pools_by_player, cached, task))
+
+        try:
+            for i, (players, pools_by_player, results, task) in enumerate(prepared):
+                game = None
+                if task is not None:
+                    game = await task
+                    results = {player: game.get_game_result(player) for player in players}
+                    if cache is not None:
+                        cache.put(players, results)
+
+                self._finish_game(i, False, players, pools_by_player, results, results_by_players,
+                                  results_by_pools, on_game_complete, played_locally=task is not None, game=game)
+                if game is not None:
+                    idle_games.put_nowait(game)
+
+                if early_stopping is not None and early_stopping.should_stop(results_by_players, results_by_pools):
+                    break
+        finally:
+            tasks = [task for _, _, _, task in prepared if task is not None]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        return results_by_players, results_by_pools
+
+    async def _play_game_async(self, players, idle_games, on_round_complete):
+        """ returns: game instance the game was played on, given back to idle ones when its results are registered
+        """
+        game = await idle_games.get()
+        try:
+            plies = await play_game_async(game, players, on_round_complete)
+        except BaseException:
+            idle_games.put_nowait(game)
+            raise
+
+        self._plies_metric.inc(plies)
+        return game
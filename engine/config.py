@@ -1,4 +1,5 @@
 import argparse
+import functools
 import yaml
 import importlib
 import importlib.util
@@ -6,10 +7,12 @@ import engine.player
 import engine.player_pool
 import engine.game
 import engine.events
+import engine.early_stopping
+import engine.epoch_budget
 
 
-def get_configuration():
-    args = _parse_args()
+def get_configuration(argv=None):
+    args = _parse_args(argv)
     config_file = _load_config(args.config_path)
     configuration = Configuration(args, config_file)
 
@@ -19,20 +22,53 @@ def get_configuration():
     return configuration
 
 
-def _parse_args():
+def _parse_args(argv=None):
     parser = argparse.ArgumentParser(description="AITournament - engine for training and testing AI players in games.")
     parser.add_argument("--config", dest="config_path", default="config.yaml", help="Configuration file")
     parser.add_argument("--epochs", dest="epochs", default=1, type=int, help="Number of train + test runs")
     parser.add_argument("--test-runs", dest="test_runs", default=1, type=int, help="Number of test runs per epoch")
     parser.add_argument("--train-runs", dest="train_runs", default=0, type=int, help="Number of train runs per epoch")
-
-    return parser.parse_args()
+    parser.add_argument("--tf-intra-op-threads", dest="tf_intra_op_threads", default=0, type=int,
+                        help="Number of threads used by single tensorflow operation, 0 lets tensorflow decide")
+    parser.add_argument("--tf-inter-op-threads", dest="tf_inter_op_threads", default=0, type=int,
+                        help="Number of tensorflow operations run in parallel, 0 lets tensorflow decide")
+    parser.add_argument("--coordinator", dest="coordinator_address", default=None,
+                        help="HOST:PORT to listen on for workers, which will play the games")
+    parser.add_argument("--worker", dest="worker_address", default=None,
+                        help="HOST:PORT of the coordinator to play games for")
+    parser.add_argument("--authkey", dest="authkey", default="aitournament",
+                        help="Key authenticating workers to the coordinator")
+    parser.add_argument("--train-window", dest="train_window", default=1, type=int,
+                        help="Max number of train games handed out to workers before earlier results are trained on")
+    parser.add_argument("--concurrent-games", dest="concurrent_games", default=1, type=int,
+                        help="Number of test games played at the same time, each on its own game instance - "
+                             "players with async moves (e.g. external engines) wait for them concurrently")
+    parser.add_argument("--metrics-port", dest="metrics_port", default=None, type=int,
+                        help="Local port to serve metrics on, in Prometheus text format")
+    parser.add_argument("--metrics-file", dest="metrics_file", default=None,
+                        help="File to periodically write metrics to, in Prometheus text format")
+    parser.add_argument("--metrics-interval", dest="metrics_interval", default=5., type=float,
+                        help="Interval of writing metrics file, in seconds")
+    parser.add_argument("--cache-test-results", dest="cache_test_results", action="store_true",
+                        help="Reuse results of test games of players whose weights did not change since earlier "
+                             "test runs, instead of playing them again")
+    parser.add_argument("--memory-profile", dest="memory_profile", default=0, type=int,
+                        help="Number of modules and lines with the largest memory growth reported after every epoch "
+                             "by on_memory_report event, 0 disables memory profiling")
+    parser.add_argument("--epoch-budget", dest="epoch_budget", default=0., type=float,
+                        help="Wall time of an epoch in seconds - numbers of train and test runs are adapted "
+                             "to fit in it (--train-runs and --test-runs are used until rates of games are measured), "
+                             "0 keeps them fixed")
+    parser.add_argument("--test-budget-share", dest="test_budget_share", default=0.2, type=float,
+                        help="Fraction of the epoch budget given to testing")
+
+    return parser.parse_args(argv)
 
 
 def _load_config(path):
     try:
         with open(path) as file:
-            return yaml.load(file)
+            return yaml.safe_load(file)
 
     except FileNotFoundError:
         exit("File '{}' does not exist".format(path))
@@ -51,15 +87,41 @@ class Configuration:
         self.epochs = args.epochs
         self.test_runs = args.test_runs
         self.train_runs = args.train_runs
+        self.tf_intra_op_threads = args.tf_intra_op_threads
+        self.tf_inter_op_threads = args.tf_inter_op_threads
+        self.coordinator_address = args.coordinator_address
+        self.worker_address = args.worker_address
+        self.authkey = args.authkey.encode()
+        self.train_window = args.train_window
+        self.concurrent_games = args.concurrent_games
+        if self.concurrent_games < 1:
+            exit("Number of concurrent games must be positive")
+        if self.concurrent_games > 1 and (self.coordinator_address or self.worker_address):
+            exit("Concurrent games can not be played in coordinator or worker mode")
+        self.metrics_port = args.metrics_port
+        self.metrics_file = args.metrics_file
+        self.metrics_interval = args.metrics_interval
+        self.memory_profile = args.memory_profile
+        self.cache_test_results = args.cache_test_results
+
+        self.epoch_budget = None
+        if args.epoch_budget < 0:
+            exit("Epoch budget must not be negative")
+        if not 0 < args.test_budget_share < 1:
+            exit("Test budget share must be between 0 and 1")
+        if args.epoch_budget > 0:
+            self.epoch_budget = engine.epoch_budget.EpochBudget(args.epoch_budget, args.test_budget_share,
+                                                                self.train_runs, self.test_runs)
 
         self.modules = {}
+        self.module_paths = {}
         if "modules" in config_file:
             self._parse_modules(config_file["modules"])
 
         self.players = self._parse_players(config_file["players"]) if "players" in config_file else {}
         self.pools = self._parse_pools(config_file["pools"]) if "pools" in config_file else {}
 
-        if not self.players or not self.pools:
+        if not self.players and not self.pools:
             exit("Players or player pools must be configured")
 
         if "train" in config_file:
@@ -86,6 +148,9 @@ class Configuration:
         self.on_start = engine.events.default_on_start
         self.on_finished = engine.events.default_on_finished
         self.on_epoch_started = engine.events.default_on_epoch_started
+        self.on_memory_report = engine.events.default_on_memory_report
+        self.on_run_statistics = engine.events.default_on_run_statistics
+        self.on_epoch_runs = engine.events.default_on_epoch_runs
         self.on_test_game_finished = self.on_train_game_finished = None
         self.on_train_run_finished = None
         self.on_test_run_finished = engine.events.default_on_test_run_finished
@@ -94,6 +159,74 @@ class Configuration:
         if "events" in config_file:
             self._parse_events(config_file["events"])
 
+        self.early_stopping = None
+        if "early_stopping" in config_file:
+            self._parse_early_stopping(config_file["early_stopping"])
+
+        self.event_dispatcher = None
+        if "event_dispatch" in config_file:
+            self._parse_event_dispatch(config_file["event_dispatch"])
+
+    def _parse_early_stopping(self, stopping_config):
+        if type(stopping_config) is not dict:
+            exit("Invalid early stopping configuration")
+        if self.coordinator_address:
+            exit("Early stopping is not supported in distributed runs")
+
+        params = {"method": str, "min_games": int, "alpha": float, "beta": float, "elo0": float, "elo1": float,
+                  "confidence": float}
+        for name, value in stopping_config.items():
+            if name not in params:
+                exit("Unrecognized early stopping param: {}".format(name))
+            try:
+                stopping_config[name] = params[name](value)
+            except ValueError:
+                exit("Invalid value of early stopping param {}: {}".format(name, value))
+
+        if stopping_config.get("method", "sprt") not in engine.early_stopping.METHODS:
+            exit("Unrecognized early stopping method: {}".format(stopping_config["method"]))
+        for name in "alpha", "beta", "confidence":
+            if not 0 < stopping_config.get(name, 0.5) < 1:
+                exit("Early stopping param {} must be between 0 and 1".format(name))
+        if stopping_config.get("elo0", 0.) >= stopping_config.get("elo1", 50.):
+            exit("Early stopping param elo0 must be lower than elo1")
+
+        self.early_stopping = engine.early_stopping.EarlyStopping(**stopping_config)
+
+    def _parse_event_dispatch(self, dispatch_config):
+        if type(dispatch_config) is not dict:
+            exit("Invalid event dispatch configuration")
+
+        mode = dispatch_config.get("mode", "sync")
+        if mode == "sync":
+            return
+        if mode != "async":
+            exit("Unrecognized event dispatch mode: {}".format(mode))
+
+        policy = dispatch_config.get("policy", "block")
+        if policy not in engine.events.DISPATCH_POLICIES:
+            exit("Unrecognized event dispatch policy: {}".format(policy))
+
+        self.event_dispatcher = dispatcher = engine.events.AsyncEventDispatcher(
+            dispatch_config.get("queue_size", 1000), policy)
+
+        if self.on_test_step:
+            self.on_test_step = dispatcher.wrap(self.on_test_step, engine.events.snapshot_step)
+        if self.on_train_step:
+            self.on_train_step = dispatcher.wrap(self.on_train_step, engine.events.snapshot_step)
+        if self.on_test_game_finished:
+            self.on_test_game_finished = dispatcher.wrap(
+                self.on_test_game_finished, engine.events.snapshot_game_finished)
+        if self.on_train_game_finished:
+            self.on_train_game_finished = dispatcher.wrap(
+                self.on_train_game_finished, engine.events.snapshot_game_finished)
+
+        # remaining events are called synchronously, after all events raised before them were handled
+        for event in "on_test_run_finished", "on_train_run_finished", "on_epoch_started", "on_memory_report", \
+                "on_run_statistics", "on_epoch_runs", "on_finished":
+            if getattr(self, event):
+                setattr(self, event, dispatcher.wrap_after_flush(getattr(self, event)))
+
     def _parse_events(self, events_config):
         for event, config in zip(events_config.keys(), events_config.values()):
             parsed = self._parse_event(event, config)
@@ -103,6 +236,12 @@ class Configuration:
                 self.on_epoch_started = parsed
             elif event == "on_finished":
                 self.on_finished = parsed
+            elif event == "on_memory_report":
+                self.on_memory_report = parsed
+            elif event == "on_run_statistics":
+                self.on_run_statistics = parsed
+            elif event == "on_epoch_runs":
+                self.on_epoch_runs = parsed
 
             elif event == "on_test_step":
                 self.on_test_step = parsed
@@ -125,7 +264,13 @@ class Configuration:
         if "module" not in event_config or "func" not in event_config:
             exit("Module or function is not defined for {}".format(name))
 
-        return self._symbol_getter(event_config["module"], event_config["func"])
+        handler = self._symbol_getter(event_config["module"], event_config["func"])
+        if "params" in event_config:
+            if type(event_config["params"]) is not dict:
+                exit("Params of {} must be a dictionary".format(name))
+            handler = functools.partial(handler, **event_config["params"])
+
+        return handler
 
     def _parse_modules(self, modules_config):
         if modules_config is None:
@@ -134,10 +279,11 @@ class Configuration:
             exit("Invalid modules configuration")
 
         for name, path in zip(modules_config.keys(), modules_config.values()):
-            if name in self.modules:
+            if name in self.module_paths:
                 exit("Module {} redefined".format(name))
 
-            self._import_module(name, path)
+            # imported on first use, so that modules not needed by the run are never loaded
+            self.module_paths[name] = path
 
     def _parse_object_lists(self, config):
         players = []
@@ -180,7 +326,7 @@ class Configuration:
 
     def _symbol_getter(self, module, name):
         if module not in self.modules:
-            self._import_module(module, None)
+            self._import_module(module, self.module_paths.get(module))
 
         mod = self.modules[module]
 
@@ -204,15 +350,31 @@ class Configuration:
     def _obj_getter(self, obj):
         if obj == 'session':
             if self.tf_session_wrapper is None:
-                self.tf_session_wrapper = TFSessionWrapper()
+                self.tf_session_wrapper = TFSessionWrapper(self.tf_intra_op_threads, self.tf_inter_op_threads)
             return self.tf_session_wrapper
 
         return obj
 
 
 class TFSessionWrapper:
-    def __init__(self):
+    """ Holds engine tensorflow session, which (together with tensorflow itself)
+    is created only when first object requiring it is created
+    """
+
+    def __init__(self, intra_op_threads=0, inter_op_threads=0):
         self.session = None
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+
+    def get_session(self):
+        if self.session is None:
+            import tensorflow
+            config = tensorflow.ConfigProto(intra_op_parallelism_threads=self.intra_op_threads,
+                                            inter_op_parallelism_threads=self.inter_op_threads)
+            config.gpu_options.allow_growth = True
+            self.session = tensorflow.Session(config=config)
+
+        return self.session
 
 
 class ObjectConfig:
@@ -221,10 +383,12 @@ class ObjectConfig:
         if "module" not in config or "class" not in config:
             exit("Module or class is not defined for {}".format(name))
 
-        self.class_ = class_getter(config["module"], config["class"])
-        if not issubclass(self.class_, base_class):
-            exit("Class {}.{} of {} does not extends correct base class"
-                 .format(config["module"], config["class"], name))
+        # class is resolved on first creation, so that its module is loaded only if the object is used
+        self.module_name = config["module"]
+        self.class_name = config["class"]
+        self._class_getter = class_getter
+        self._base_class = base_class
+        self._class = None
 
         self.params = {}
         if "params" in config:
@@ -237,11 +401,22 @@ class ObjectConfig:
 
                 self.params[name] = obj_getter(param)
 
+    def get_class(self):
+        if self._class is None:
+            class_ = self._class_getter(self.module_name, self.class_name)
+            if not isinstance(class_, type) or not issubclass(class_, self._base_class):
+                exit("Class {}.{} of {} does not extends correct base class"
+                     .format(self.module_name, self.class_name, self.name))
+            self._class = class_
+
+        return self._class
+
     def create(self):
-        params = {key: value if type(value) is not TFSessionWrapper else value.session
+        class_ = self.get_class()
+        params = {key: value if type(value) is not TFSessionWrapper else value.get_session()
                   for key, value in zip(self.params.keys(), self.params.values())}
-        obj = self.class_(**params)
-        if issubclass(self.class_, engine.player.Player) or issubclass(self.class_, engine.player_pool.PlayerPool):
+        obj = class_(**params)
+        if issubclass(class_, engine.player.Player) or issubclass(class_, engine.player_pool.PlayerPool):
             obj.set_name(self.name)
 
         return obj
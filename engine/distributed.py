@@ -0,0 +1,293 @@
+""" Coordinator/worker mode, in which games are played by worker processes (possibly on other hosts)
+
+Coordinator prepares games (selects players from pools, registers results, trains pools) like the Engine does,
+but sends each game as a task - identities of players, their weights versions and a seed - to a worker.
+Workers create the same objects from the same configuration, load weights of parametrized players
+when their versions change, play the game and send back results, numbers of plies and run statistics of the game.
+Step and game finished events of games played by workers are raised in the workers.
+"""
+import collections
+import queue
+import random
+import threading
+from multiprocessing.connection import Client, Listener, wait
+
+from engine.enigne import Engine, play_game
+from engine.player import ParametrizedPlayer
+
+DEFAULT_AUTHKEY = b"aitournament"
+POLL_INTERVAL = 0.1
+
+
+def parse_address(address):
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+def object_identities(train_players, train_pools, test_players, test_pools):
+    """ Returns players by identities that are the same in coordinator and workers created from the same configuration
+    """
+    identities = {}
+    for phase, players, pools in ("train", train_players, train_pools), ("test", test_players, test_pools):
+        for i, player in enumerate(players):
+            identities[(phase, "player", i, None)] = player
+        for i, pool in enumerate(pools):
+            for j, player in enumerate(pool.get_players()):
+                identities[(phase, "pool", i, j)] = player
+
+    return identities
+
+
+def _weights_version(player):
+    return player.weights_version if isinstance(player, ParametrizedPlayer) else None
+
+
+class Coordinator:
+    """ Hands out game tasks to connected workers and gathers their results
+
+    Tasks of workers that disconnect are re-queued and given to other workers.
+    """
+
+    def __init__(self, address, authkey=DEFAULT_AUTHKEY):
+        self._listener = Listener(address, authkey=authkey)
+        self._closed = False
+        self._new_connections = queue.Queue()
+        self._accepting_thread = threading.Thread(target=self._accept_connections, daemon=True)
+        self._accepting_thread.start()
+
+        self._idle = []
+        self._in_flight = {}
+        self._worker_versions = {}
+        self._pending = collections.deque()
+        self._finished = collections.deque()
+        self._snapshots = {}
+
+    @property
+    def address(self):
+        return self._listener.address
+
+    def _accept_connections(self):
+        while True:
+            try:
+                connection = self._listener.accept()
+            except (OSError, EOFError):
+                if self._closed:
+                    return
+                continue  # failed handshake
+            self._new_connections.put(connection)
+
+    def submit(self, task_id, players_by_identity):
+        """ Queues a game to be played
+
+        args:
+            task_id - identifier under which results will be returned
+            players_by_identity - list of (identity, player) in order of players of the game
+        """
+        weights = {}
+        for identity, player in players_by_identity:
+            version = _weights_version(player)
+            if version is None:
+                continue
+            # weights are taken now, as they may change before the task is handed out
+            snapshot = self._snapshots.get(identity)
+            if snapshot is None or snapshot[0] != version:
+                snapshot = self._snapshots[identity] = (version, player.get_weights())
+            weights[identity] = snapshot
+
+        seed = random.getrandbits(32)
+        self._pending.append((task_id, seed, [identity for identity, _ in players_by_identity], weights))
+
+    def next_result(self):
+        """ Blocks until any submitted game is finished
+
+        returns: task id, list of results in order of players given on submission, number of plies of the game
+                 and its run statistics (as returned by Game.get_run_statistics)
+        """
+        while not self._finished:
+            self._add_new_workers(block=not self._idle and not self._in_flight)
+            self._dispatch()
+
+            if self._in_flight:
+                for connection in wait(list(self._in_flight.keys()), POLL_INTERVAL):
+                    self._receive(connection)
+
+        return self._finished.popleft()
+
+    def _add_new_workers(self, block):
+        try:
+            while True:
+                connection = self._new_connections.get(block=block, timeout=POLL_INTERVAL if block else None)
+                self._worker_versions[connection] = {}
+                self._idle.append(connection)
+                block = False
+        except queue.Empty:
+            pass
+
+    def _dispatch(self):
+        while self._pending and self._idle:
+            connection = self._idle.pop()
+            task = self._pending.popleft()
+            task_id, seed, identities, weights = task
+            known_versions = self._worker_versions[connection]
+            try:
+                for identity, (version, values) in weights.items():
+                    if known_versions.get(identity) != version:
+                        connection.send(("weights", identity, version, values))
+                        known_versions[identity] = version
+                connection.send(("game", task_id, seed, identities))
+            except (OSError, EOFError):
+                self._drop_worker(connection, task)
+                continue
+
+            self._in_flight[connection] = task
+
+    def _receive(self, connection):
+        task = self._in_flight.pop(connection)
+        try:
+            message = connection.recv()
+        except (OSError, EOFError):
+            self._drop_worker(connection, task)
+            return
+
+        if message[0] == "error":
+            raise RuntimeError("Worker failed to play game {}: {}".format(message[1], message[2]))
+
+        _, task_id, results, plies, statistics = message
+        self._finished.append((task_id, results, plies, statistics))
+        self._idle.append(connection)
+
+    def _drop_worker(self, connection, task):
+        self._pending.appendleft(task)
+        del self._worker_versions[connection]
+        connection.close()
+
+    def close(self):
+        for connection in self._idle + list(self._in_flight.keys()):
+            try:
+                connection.send(("stop", ))
+                connection.close()
+            except (OSError, EOFError):
+                pass
+        self._closed = True
+        self._listener.close()
+
+
+class DistributedEngine(Engine):
+    """ Engine that lets workers connected to the coordinator play the games
+
+    In test runs all games of the run are handed out at once. In train runs at most train_window games
+    are handed out before results of the earliest one are registered and trained on, so train_window > 1
+    makes pools select players before all previous results are known.
+    """
+
+    def __init__(self, game, coordinator, identities, train_window=1):
+        super(DistributedEngine, self).__init__(game)
+
+        self.coordinator = coordinator
+        self.train_window = train_window
+        self._identity_by_player = {player: identity for identity, player in identities.items()}
+
+    def _run(self, iterations, is_train, on_run_complete, on_game_complete, on_round_complete):
+        players_list = self.train_players if is_train else self.test_players
+        pools_list = self.train_player_pools if is_train else self.test_player_pools
+        window = self.train_window if is_train else iterations
+
+        results_by_players = {player: [] for player in players_list}
+        results_by_pools = {pool: [] for pool in pools_list}
+
+        cache = None if is_train else self.test_result_cache
+        if cache is not None:
+            cache.start_run()
+
+        prepared = {}
+        finished = {}
+        next_to_prepare = 0
+        for i in range(iterations):
+            while next_to_prepare < iterations and next_to_prepare - i < window:
+                players, pools_by_player = self._prepare_game(players_list, pools_list)
+                prepared[next_to_prepare] = players, pools_by_player
+
+                cached = cache.get(players) if cache is not None else None
+                if cached is not None:
+                    finished[next_to_prepare] = [cached[player] for player in players]
+                else:
+                    self.coordinator.submit(
+                        next_to_prepare, [(self._identity_by_player[player], player) for player in players])
+                next_to_prepare += 1
+
+            while i not in finished:
+                task_id, results, plies, statistics = self.coordinator.next_result()
+                finished[task_id] = results
+                self._plies_metric.inc(plies)
+                if statistics:
+                    self.game.add_run_statistics(statistics)
+                if cache is not None:
+                    cache.put(prepared[task_id][0], dict(zip(prepared[task_id][0], results)))
+
+            players, pools_by_player = prepared.pop(i)
+            results = dict(zip(players, finished.pop(i)))
+            self._finish_game(i, is_train, players, pools_by_player, results,
+                              results_by_players, results_by_pools, on_game_complete, played_locally=False)
+
+        if on_run_complete:
+            on_run_complete(results_by_players, results_by_pools)
+
+        return results_by_players, results_by_pools
+
+
+def run_worker(game, identities, address, authkey=DEFAULT_AUTHKEY, on_train_step=None, on_test_step=None,
+               on_train_game_finished=None, on_test_game_finished=None):
+    """ Plays games given by the coordinator until it stops or disconnects
+
+    args:
+        game - game instance
+        identities - players by identities, as returned by object_identities
+        on_train_step, on_test_step - called after every move of games of the phase, as by Engine
+        on_train_game_finished, on_test_game_finished - called after games of the phase, with the game's index
+                                                        in its run, results by players of the game only and no pools
+    """
+    connection = Client(address, authkey=authkey)
+    try:
+        while True:
+            try:
+                message = connection.recv()
+            except (OSError, EOFError):
+                return
+
+            if message[0] == "stop":
+                return
+
+            if message[0] == "weights":
+                _, identity, version, values = message
+                identities[identity].set_weights(values, version)
+                continue
+
+            _, task_id, seed, task_identities = message
+            is_train = task_identities[0][0] == "train"
+            try:
+                results, plies, statistics = _play_game(
+                    game, [identities[i] for i in task_identities], seed, task_id,
+                    on_train_step if is_train else on_test_step,
+                    on_train_game_finished if is_train else on_test_game_finished)
+                connection.send(("result", task_id, results, plies, statistics))
+            except Exception as e:
+                connection.send(("error", task_id, "{}: {}".format(type(e).__name__, e)))
+    finally:
+        connection.close()
+
+
+def _play_game(game, players, seed, game_in_run, on_step, on_game_finished):
+    """ returns: results in order of players, number of plies and run statistics of the game
+    """
+    random.seed(seed)
+
+    for player in players:
+        player.prepare_new_game()
+
+    plies = play_game(game, players, on_step)
+    results = [game.get_game_result(player) for player in players]
+    if on_game_finished:
+        on_game_finished(game_in_run, game, {player: [result] for player, result in zip(players, results)},
+                         {player: None for player in players})
+
+    return results, plies, game.get_run_statistics()
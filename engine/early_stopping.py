@@ -0,0 +1,79 @@
+""" Sequential tests deciding when results of a test run are settled, so that the run can be stopped early
+
+Each game is scored for every tested player and pool: 1 for a win, 0.5 for a draw and 0 for a loss, judged by
+the sign of the first element of game results (like won/drawn/lost of Draughts.get_game_result), a pool scoring
+the mean of its players in the game. The run stops when results of all of them are settled.
+"""
+import math
+import statistics
+
+METHODS = ("sprt", "ci")
+
+
+def game_score(result):
+    outcome = result[0] if isinstance(result, (tuple, list)) else result
+    return 1. if outcome > 0 else 0. if outcome < 0 else .5
+
+
+def expected_score(elo):
+    return 1. / (1. + 10. ** (-elo / 400.))
+
+
+class EarlyStopping:
+    """ Stops test runs with one of methods:
+        sprt - sequential probability ratio test of hypotheses that player's Elo difference to its opponents
+               is elo0 (H0) or elo1 (H1), with error probabilities alpha and beta; it is settled when either
+               hypothesis is accepted
+        ci - confidence interval of player's score, it is settled when the interval excludes 0.5 (an even score)
+    """
+
+    def __init__(self, method="sprt", min_games=10, alpha=0.05, beta=0.05, elo0=0., elo1=50., confidence=0.95):
+        if method not in METHODS:
+            raise ValueError("Unknown early stopping method: {}".format(method))
+
+        self.method = method
+        self.min_games = min_games
+        self.lower_bound = math.log(beta / (1. - alpha))
+        self.upper_bound = math.log((1. - beta) / alpha)
+        self.score0 = expected_score(elo0)
+        self.score1 = expected_score(elo1)
+        self.z = statistics.NormalDist().inv_cdf((1. + confidence) / 2.)
+
+        # of the last run
+        self.games = 0
+        self.stopped = False
+
+    def start_run(self):
+        self.games = 0
+        self.stopped = False
+
+    def should_stop(self, results_by_players, results_by_pools):
+        """ Called after every game of a run
+
+        returns: True if results of all tested players and pools are settled
+        """
+        self.games += 1
+        if self.games < self.min_games:
+            return False
+
+        scores = [[game_score(result) for result in results] for results in results_by_players.values()]
+        scores += [[statistics.fmean(game_score(result) for result in game_results) for game_results in results]
+                   for results in results_by_pools.values()]
+
+        self.stopped = all(self._is_settled(player_scores) for player_scores in scores if player_scores)
+        return self.stopped
+
+    def _is_settled(self, scores):
+        n = len(scores)
+        mean = statistics.fmean(scores)
+        # with a win and a loss added, so that a few equal results do not settle the run with zero variance
+        regularized = scores + [0., 1.]
+        variance = statistics.pvariance(regularized)
+
+        if self.method == "ci":
+            half_width = self.z * math.sqrt(variance / n)
+            return mean - half_width > .5 or mean + half_width < .5
+
+        # normal approximation of the log-likelihood ratio
+        llr = .5 * n * (self.score1 - self.score0) * (2. * mean - self.score0 - self.score1) / variance
+        return llr <= self.lower_bound or llr >= self.upper_bound
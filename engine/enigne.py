@@ -1,5 +1,77 @@
 import random
 
+import engine.metrics
+
+
+def play_game(game, players, on_round_complete=None):
+    """ Plays a game between players prepared for it, from its beginning to its end
+
+    returns: number of plies of the game
+    """
+    game.prepare_new_game(players)
+
+    plies = 0
+    while not game.is_game_over():
+        for player in players:
+            player.set_current_view(game.get_player_view(player))
+
+        game.set_players_moves({player: player.get_next_move() for player in game.get_current_players()})
+        plies += 1
+
+        if on_round_complete:
+            on_round_complete(game, players)
+
+    return plies
+
+
+def _matchup_key(players):
+    return tuple((id(player), getattr(player, "weights_version", None)) for player in players)
+
+
+class MatchupResultCache:
+    """ Results of test games by matchups - players of a game, with weights versions of parametrized ones
+
+    Games of matchups played in earlier test runs are not played again, their results are reused - only games
+    beyond the number of cached ones are played. Players are assumed to play the same way as long as their
+    weights version does not change.
+    """
+
+    def __init__(self):
+        self._results = {}
+        self._games_in_run = {}
+        self.reused = 0
+        # games of the current run with reused results
+        self.reused_in_run = 0
+        self._reused_metric = engine.metrics.counter("reused_test_games_total",
+                                                     "Test games with results reused from earlier test runs")
+
+    def start_run(self):
+        # matchups not seen in the last run (e.g. of players with older weights) are forgotten
+        self._results = {key: results for key, results in self._results.items() if key in self._games_in_run}
+        self._games_in_run = {}
+        self.reused_in_run = 0
+
+    def get(self, players):
+        """ returns: cached results by players for the next game of the matchup in the run,
+        None if it has to be played
+        """
+        key = _matchup_key(players)
+        game = self._games_in_run.get(key, 0)
+        self._games_in_run[key] = game + 1
+
+        cached = self._results.get(key, [])
+        if game < len(cached):
+            self.reused += 1
+            self.reused_in_run += 1
+            self._reused_metric.inc()
+            return dict(zip(players, cached[game]))
+        return None
+
+    def put(self, players, results):
+        """ Stores results (by players) of a played game
+        """
+        self._results.setdefault(_matchup_key(players), []).append([results[player] for player in players])
+
 
 class Engine:
     def __init__(self, game):
@@ -9,6 +81,13 @@ class Engine:
         self.train_player_pools = []
         self.test_players = []
         self.test_player_pools = []
+        # MatchupResultCache, for test runs
+        self.test_result_cache = None
+        # EarlyStopping of test runs
+        self.test_early_stopping = None
+
+        self._games_metric = engine.metrics.counter("games_total", "Finished games")
+        self._plies_metric = engine.metrics.counter("plies_total", "Played plies")
 
         game_info = self.game.get_game_info()
 
@@ -33,10 +112,10 @@ class Engine:
         self.test_player_pools = player_pools
 
     def train(self, iterations, on_run_complete=None, on_game_complete=None, on_round_complete=None):
-        self._run(iterations, True, on_run_complete, on_game_complete, on_round_complete)
+        return self._run(iterations, True, on_run_complete, on_game_complete, on_round_complete)
 
     def test(self, iterations, on_run_complete=None, on_game_complete=None, on_round_complete=None):
-        self._run(iterations, False, on_run_complete, on_game_complete, on_round_complete)
+        return self._run(iterations, False, on_run_complete, on_game_complete, on_round_complete)
 
     def _run(self, iterations, is_train, on_run_complete, on_game_complete, on_round_complete):
         players_list = self.train_players if is_train else self.test_players
@@ -44,66 +123,101 @@ class Engine:
 
         results_by_players = {player: [] for player in players_list}
         results_by_pools = {pool: [] for pool in pools_list}
-        for i in range(iterations):
-
-            for pool in pools_list:
-                pool.prepare_new_game()
+        cache = None if is_train else self.test_result_cache
+        if cache is not None:
+            cache.start_run()
+        early_stopping = None if is_train else self.test_early_stopping
+        if early_stopping is not None:
+            early_stopping.start_run()
 
-            players = self._prepare_player_list(players_list, pools_list)
+        for i in range(iterations):
+            players, pools_by_player = self._prepare_game(players_list, pools_list)
 
-            for player in players:
-                player.prepare_new_game()
+            results = cache.get(players) if cache is not None else None
+            played = results is None
+            if played:
+                self._play_game(players, on_round_complete)
 
-            self.game.prepare_new_game(players)
+                results = {player: self.game.get_game_result(player) for player in players}
+                if cache is not None:
+                    cache.put(players, results)
 
-            while not self.game.is_game_over():
-                for player in players:
-                    player.set_current_view(self.game.get_player_view(player))
+            self._finish_game(i, is_train, players, pools_by_player, results,
+                              results_by_players, results_by_pools, on_game_complete, played_locally=played)
 
-                self.game.set_players_moves(
-                    {player: player.get_next_move() for player in self.game.get_current_players()})
+            if early_stopping is not None and early_stopping.should_stop(results_by_players, results_by_pools):
+                break
 
-                if on_round_complete:
-                    on_round_complete(self.game, players)
+        if on_run_complete:
+            on_run_complete(results_by_players, results_by_pools)
 
-            # register results
-            result_by_player = {}
-            results_by_pool = {}
-            for player in players:
-                pool = self._pools_by_player[player]
-                if pool is None:
-                    result_by_player[player] = self.game.get_game_result(player)
+        return results_by_players, results_by_pools
+
+    def _prepare_game(self, players_list, pools_list):
+        """ returns: players of the next game and pools (or None) by players
+        """
+        for pool in pools_list:
+            pool.prepare_new_game()
+
+        players = self._prepare_player_list(players_list, pools_list)
+
+        for player in players:
+            player.prepare_new_game()
+
+        return players, self._pools_by_player
+
+    def _play_game(self, players, on_round_complete):
+        self._plies_metric.inc(play_game(self.game, players, on_round_complete))
+
+    def _finish_game(self, game_in_run, is_train, players, pools_by_player, results,
+                     results_by_players, results_by_pools, on_game_complete, played_locally=True, game=None):
+        """ Registers results of a finished game and lets pools train on them
+
+        args:
+            results - results of the game by players
+            played_locally - if the game was played in this process (not by a worker or reused from cache),
+                             so players and on_game_complete can be shown its final state - otherwise
+                             on_game_complete is given None as the game
+            game - game instance the game was played on, self.game by default
+        """
+        game = self.game if game is None else game
+        result_by_player = {}
+        results_by_pool = {}
+        for player in players:
+            pool = pools_by_player[player]
+            if pool is None:
+                result_by_player[player] = results[player]
+            else:
+                if pool not in result_by_player:
+                    results_by_pool[pool] = [results[player]]
                 else:
-                    if pool not in result_by_player:
-                        results_by_pool[pool] = [self.game.get_game_result(player)]
-                    else:
-                        results_by_pool[pool].append(self.game.get_game_result(player))
-
-            for player, result in zip(result_by_player.keys(), result_by_player.values()):
-                results_by_players[player].append(result)
-            for pool, results in zip(results_by_pool.keys(), results_by_pool.values()):
-                results_by_pools[pool].append(results)
-
-            # finish round
-            if on_game_complete:
-                on_game_complete(i, self.game, results_by_players, self._pools_by_player)
-
-            results_by_pools_by_players = {}
-            for player in players:
-                pool = self._pools_by_player[player]
-                player.set_current_view(self.game.get_player_view(player))
-                if pool is not None:
-                    if pool in results_by_pools_by_players:
-                        results_by_pools_by_players[pool][player] = self.game.get_game_result(player)
-                    else:
-                        results_by_pools_by_players[pool] = {player: self.game.get_game_result(player)}
-
-            if is_train:
-                for pool, results in zip(results_by_pools_by_players.keys(), results_by_pools_by_players.values()):
-                    pool.train_on_game_over(results_by_pools_by_players[pool])
+                    results_by_pool[pool].append(results[player])
+
+        for player, result in zip(result_by_player.keys(), result_by_player.values()):
+            results_by_players[player].append(result)
+        for pool, pool_results in zip(results_by_pool.keys(), results_by_pool.values()):
+            results_by_pools[pool].append(pool_results)
+
+        self._games_metric.inc()
+
+        # finish round
+        if on_game_complete:
+            on_game_complete(game_in_run, game if played_locally else None, results_by_players, pools_by_player)
+
+        results_by_pools_by_players = {}
+        for player in players:
+            pool = pools_by_player[player]
+            if played_locally:
+                player.set_current_view(game.get_player_view(player))
+            if pool is not None:
+                if pool in results_by_pools_by_players:
+                    results_by_pools_by_players[pool][player] = results[player]
+                else:
+                    results_by_pools_by_players[pool] = {player: results[player]}
 
-        if on_run_complete:
-            on_run_complete(results_by_players, results_by_pools)
+        if is_train:
+            for pool, pool_results in zip(results_by_pools_by_players.keys(), results_by_pools_by_players.values()):
+                pool.train_on_game_over(results_by_pools_by_players[pool])
 
     def _validate_player_list(self, players, player_pools):
         if not len(players) + len(player_pools):
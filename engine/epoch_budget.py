@@ -0,0 +1,94 @@
+""" Wall-clock budget of epochs - numbers of train and test runs of each epoch are chosen so that the epoch
+takes about the budgeted time, from rates of games measured in previous runs
+"""
+
+
+class EpochRuns:
+    """ Numbers of runs (games) of an epoch and wall time they took, in seconds
+    """
+
+    def __init__(self, epoch, train_runs, train_seconds, test_runs, test_seconds):
+        self.epoch = epoch
+        self.train_runs = train_runs
+        self.train_seconds = train_seconds
+        self.test_runs = test_runs
+        self.test_seconds = test_seconds
+
+    def __str__(self):
+        return "Runs of epoch {}: train {} in {:.1f} s, test {} in {:.1f} s".format(
+            self.epoch, self.train_runs, self.train_seconds, self.test_runs, self.test_seconds)
+
+
+class EpochBudget:
+    """ Splits the budget of an epoch between training and testing, and estimates how many runs fit in each part
+    from rates of games per second of previous runs of the phase (exponential moving average)
+    """
+
+    def __init__(self, seconds, test_share=0.2, train_runs=1, test_runs=1, min_runs=1, smoothing=0.5):
+        """
+        args:
+            seconds - wall time of an epoch
+            test_share - fraction of the budget given to testing, the rest is given to training
+                         (all of it to testing when there are no train runs)
+            train_runs, test_runs - numbers of runs of a phase before its rate is measured
+            min_runs - min number of runs of a phase
+            smoothing - weight of the last measured rate in the estimated rate
+        """
+        self.seconds = seconds
+        self.test_share = test_share if train_runs > 0 else 1.
+        self.min_runs = min_runs
+        self.smoothing = smoothing
+
+        self._initial_runs = {"train": train_runs, "test": test_runs}
+        self._rates = {"train": None, "test": None}
+        self._measured = {"train": (0, 0.), "test": (0, 0.)}
+        # EpochRuns of finished epochs
+        self.history = []
+
+    def runs(self, phase):
+        """ returns: number of runs of the phase (train or test) in the next epoch
+        """
+        if self._initial_runs[phase] == 0:
+            return 0
+
+        rate = self._rates[phase]
+        if rate is None:
+            return self._initial_runs[phase]
+
+        share = self.test_share if phase == "test" else 1. - self.test_share
+        return max(self.min_runs, int(self.seconds * share * rate))
+
+    def record(self, phase, games, seconds, played=None):
+        """ Registers games of a run of the phase and its wall time
+
+        args:
+            played - number of the games that were actually played (not reused from earlier runs), all of them
+                     by default - only they are counted in the rate of the phase
+        """
+        self._measured[phase] = games, seconds
+        played = games if played is None else played
+        if played == 0 or seconds <= 0:
+            return
+
+        rate = played / seconds
+        previous = self._rates[phase]
+        self._rates[phase] = rate if previous is None else self.smoothing * rate + (1. - self.smoothing) * previous
+
+    def finish_epoch(self, epoch):
+        """ returns: EpochRuns of the epoch, from runs recorded in it
+        """
+        train_runs, train_seconds = self._measured["train"]
+        test_runs, test_seconds = self._measured["test"]
+        self._measured = {"train": (0, 0.), "test": (0, 0.)}
+
+        epoch_runs = EpochRuns(epoch, train_runs, train_seconds, test_runs, test_seconds)
+        self.history.append(epoch_runs)
+        return epoch_runs
+
+
+def games_in_run(results_by_players, results_by_pools):
+    """ returns: number of games of a run, from its results (every player and pool takes part in every game)
+    """
+    for results in list(results_by_players.values()) + list(results_by_pools.values()):
+        return len(results)
+    return 0
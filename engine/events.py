@@ -1,7 +1,117 @@
+import copy
+import queue
+import threading
+import traceback
+
+DISPATCH_POLICIES = ("block", "drop_newest", "drop_oldest")
+
+
+class AsyncEventDispatcher:
+    """ Calls event handlers in a background thread, in order in which events were raised
+
+    Events wait in a bounded queue. When it is full, policy decides what happens:
+        block - raising event waits until there is space in the queue
+        drop_newest - raised event is dropped
+        drop_oldest - the oldest queued event is dropped
+    """
+
+    def __init__(self, queue_size=1000, policy="block"):
+        if policy not in DISPATCH_POLICIES:
+            raise ValueError("Unknown dispatch policy: {}".format(policy))
+
+        self.policy = policy
+        self.dropped = 0
+        self._error = None
+        self._queue = queue.Queue(queue_size)
+        self._thread = threading.Thread(target=self._consume, daemon=True)
+        self._thread.start()
+
+    def _consume(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                handler, args = item
+                handler(*args)
+            except Exception as e:
+                traceback.print_exc()
+                if self._error is None:
+                    self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _put(self, item):
+        if self.policy == "block":
+            self._queue.put(item)
+        elif self.policy == "drop_newest":
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                self.dropped += 1
+        else:
+            while True:
+                try:
+                    self._queue.put_nowait(item)
+                    return
+                except queue.Full:
+                    try:
+                        self._queue.get_nowait()
+                        self._queue.task_done()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+
+    def wrap(self, handler, snapshot):
+        """ Returns function queuing calls of handler
+
+        args:
+            snapshot - function returning copy of handler's arguments that will not be changed by the engine
+                       before the handler is called
+        """
+        def dispatch(*args):
+            self._put((handler, snapshot(*args)))
+
+        return dispatch
+
+    def wrap_after_flush(self, handler):
+        """ Returns function that calls handler synchronously, after all queued events were handled
+        """
+        def call(*args):
+            self.flush()
+            return handler(*args)
+
+        return call
+
+    def flush(self):
+        self._queue.join()
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        if self.dropped:
+            print("Events dropped by asynchronous dispatch: {}".format(self.dropped))
+
+
+def snapshot_step(game, players):
+    return copy.copy(game), list(players)
+
+
+def snapshot_game_finished(game_in_run, game, results_by_players, pools_by_players):
+    return (game_in_run, copy.copy(game),
+            {player: list(results) for player, results in results_by_players.items()}, dict(pools_by_players))
+
+
 def default_on_start(config, game, train_players, train_pools, test_players, test_pools):
     print("Run info:\n")
     print("Game: {}".format(game))
     print("Epochs: {}".format(config.epochs))
+    if config.epoch_budget is not None:
+        print("Epoch budget: {} s, {:.0%} for testing (runs per epoch adapted to it)".format(
+            config.epoch_budget.seconds, config.epoch_budget.test_share))
 
     print("\nTraining runs per epoch: {}".format(config.train_runs))
     if config.train_runs > 0:
@@ -34,6 +144,20 @@ def default_on_epoch_started(n):
     print("\nEpoch {}".format(n))
 
 
+def default_on_run_statistics(phase, statistics):
+    if statistics:
+        print("Game statistics of {} run: {}".format(phase, ", ".join(
+            "{} {}".format(name, value) for name, value in statistics.items())))
+
+
+def default_on_epoch_runs(epoch_runs):
+    print(epoch_runs)
+
+
+def default_on_memory_report(report):
+    print(report)
+
+
 def default_on_test_run_finished(results_by_players, results_by_pools):
     print("Test results:")
 
@@ -45,6 +45,18 @@ class Game:
         """
         raise NotImplementedError
 
+    def get_run_statistics(self):
+        """ Returns statistics (e.g. dict) of games played on this instance since the last call,
+        None if the game does not keep any
+        """
+        return None
+
+    def add_run_statistics(self, statistics):
+        """ Adds statistics of games played on other instances (e.g. by workers), as returned by their
+        get_run_statistics, to the ones returned by the next get_run_statistics call
+        """
+        pass
+
     def __str__(self):
         return "{}.{}".format(type(self).__module__, type(self).__name__)
 
@@ -97,6 +109,31 @@ class FiniteTurnGameLogic:
         """
         raise NotImplementedError
 
+    def list_moves_batch(self, game_views):
+        """ Lists moves of many views at once, games may implement it faster than separate list_moves calls
+
+        returns: list of lists of moves, as returned by list_moves for each view (in the same order)
+        """
+        return [self.list_moves(game_view) for game_view in game_views]
+
+    def apply_moves(self, game_views, moves):
+        """ Applies many moves at once, games may implement it faster than separate apply_move calls
+
+        args:
+            game_views: views, the same view may be given many times
+            moves: move selected by current player of each view
+
+        returns: list of new views, for each view and move
+        """
+        return [self.apply_move(game_view, move) for game_view, move in zip(game_views, moves)]
+
+    def hash_view(self, game_view):
+        """
+        returns: integer hash of the position, equal for views in which current player
+        has the same situation (so also the same moves, listed in the same order)
+        """
+        raise NotImplementedError
+
     def evaluate_view(self, view, viewpoint_player):
         """ Evaluates view (returns comparable object) from point of view of given player
         (with expectation that the higher is the evaluation the better is the situation)
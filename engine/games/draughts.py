@@ -1,12 +1,29 @@
+import hashlib
 import os
 import random
 
 from engine.game import Game, FiniteTurnGameLogic, ConstPlayersNGameInfo
-from engine.algorithms.minmax_player import MinMaxPlayer
+from engine.algorithms.mcts_player import MCTSPlayer
+from engine.algorithms.minmax_player import MinMaxPlayer, RETAINED_NODES
+from engine.algorithms.opening_book import build_opening_book
 
 BOARD_SIZE = 10
 PLAYER_EMPTY_MOVES = 15
 SINGLE_PLAYER_3_1_EMPTY_MOVES = 15
+# added to points of the winner of a finished game in evaluations, above any material balance
+WIN_POINTS = 1000
+
+# smaller batches are handled one by one, as NumPy overhead outweighs the gain
+MIN_BATCH_SIZE = 16
+
+# dark fields, the only ones used by the game, numbered row by row
+SQUARES_NUMBER = BOARD_SIZE * BOARD_SIZE // 2
+SQUARE_FIELDS = [(2 * (square % (BOARD_SIZE // 2)) + (square // (BOARD_SIZE // 2)) % 2, square // (BOARD_SIZE // 2))
+                 for square in range(SQUARES_NUMBER)]
+
+
+def field_to_square(col, row):
+    return row * (BOARD_SIZE // 2) + col // 2
 
 
 class Field:
@@ -17,41 +34,82 @@ class Field:
 
 
 class DraughtsView:
-    def __init__(self, base_view=None, changes=None, change_pov=False, next_move=False):
+    def __init__(self, base_view=None, changes=None, change_pov=False, next_move=False, share_fields=False):
+        """
+        args:
+            share_fields - if Field objects of the base view may be used by this view, instead of their copies,
+                           so fields of neither view may be modified later
+        """
+        self._moves = None
+        # (batched moves listing, index of the board) the moves of which are converted when needed
+        self._listing = None
+        self._repetitions = 0
         if base_view is None:
             self.fields = [
                 [Field(is_dark=(i + j) % 2 == 0) for j in range(BOARD_SIZE)]
                 for i in range(BOARD_SIZE)]
+            # numbers of pieces by players, updated with every change of fields
+            self.men = {}
+            self.kings = {}
 
             self.pov = None
             self.other = None
             self.previous_states = {}
-            self.is_terminal = False
-            self.winner = None
+            # plies since the last capture or move of a man
+            self.quiet_plies = 0
+            self._is_terminal = False
+            self._winner = None
             self.black = None
             self.white = None
 
         else:
-            self.fields = [
-                [Field(field.is_dark, field.player, field.is_king) for field in column]
-                for column in base_view.fields]
-            self.is_terminal = base_view.is_terminal
-            self.winner = base_view.winner
+            if share_fields:
+                self.fields = [column[:] for column in base_view.fields]
+            else:
+                self.fields = [
+                    [Field(field.is_dark, field.player, field.is_king) for field in column]
+                    for column in base_view.fields]
+            self.men = base_view.men.copy()
+            self.kings = base_view.kings.copy()
+            if changes is None and not next_move:
+                if change_pov:
+                    self._is_terminal = base_view.is_terminal
+                    self._winner = base_view.winner
+                else:
+                    # the same position, whose status may still be pending
+                    self._is_terminal = base_view._is_terminal
+                    self._winner = base_view._winner
+                    self._repetitions = base_view._repetitions
+                    self._moves = base_view._moves
+                    self._listing = base_view._listing
+            else:
+                # end of game conditions of the new position are checked when needed, see is_terminal
+                self._is_terminal = None
+                self._winner = None
             self.previous_states = base_view.previous_states.copy()
+            self.quiet_plies = base_view.quiet_plies
             self.black = base_view.black
             self.white = base_view.white
 
             if changes is not None:
+                # changes of a move start with the field the piece moved from, followed by captured pieces
+                (col, row), _ = changes[0]
+                if len(changes) > 2 or not self.fields[col][row].is_king:
+                    self.quiet_plies = 0
+                else:
+                    self.quiet_plies += 1
                 for (col, row), field in changes:
+                    self._count_piece(self.fields[col][row], -1)
+                    self._count_piece(field, 1)
                     self.fields[col][row] = field
 
             if change_pov:
                 self.pov = base_view.other
                 self.other = base_view.pov
-                if self.winner == self.pov:
-                    self.winner = self.other
-                if self.winner == self.other:
-                    self.winner = self.pov
+                if self._winner == self.pov:
+                    self._winner = self.other
+                if self._winner == self.other:
+                    self._winner = self.pov
 
                 self.fields.reverse()
                 for col in self.fields:
@@ -61,73 +119,111 @@ class DraughtsView:
                 self.other = base_view.other
 
             if next_move:
-                pov_has_moves = False
-                pov_single_king_checker = 0
-                other_single_king_checker = 0
-
-                for col in range(BOARD_SIZE):
-                    for row in range(BOARD_SIZE):
-                        field = self.fields[col][row]
-                        if field.player == self.pov:
-                            if field.is_king:
-                                pov_single_king_checker += 1
-                            else:
-                                pov_single_king_checker += 2
-                            if not pov_has_moves:
-                                pov_has_moves = self._can_piece_move(col, row)
-
-                        elif field.player == self.other:
-                            if field.is_king:
-                                other_single_king_checker += 1
-                            else:
-                                other_single_king_checker += 2
-
-                if not pov_has_moves:
-                    self.is_terminal = True
-                    self.winner = self.other
-                elif pov_single_king_checker == 1 and other_single_king_checker == 1:
-                    self.is_terminal = True
-                    self.winner = None
-                else:
-                    state = self._encode_state()
-                    if state in self.previous_states:
-                        self.previous_states[state] += 1
-                    else:
-                        self.previous_states[state] = 1
-                    if self.previous_states[state] >= 3:
-                        self.is_terminal = True
-                        self.winner = None
+                state = self._encode_state()
+                self.previous_states[state] = self.previous_states.get(state, 0) + 1
+                self._repetitions = self.previous_states[state]
+
+    @property
+    def moves(self):
+        """ Legal moves of the side to move, listed once and shared with copies of the view
+        of the same side (such as the views of players) - the list must not be modified
+        """
+        if self._moves is None:
+            if self._listing is not None:
+                self._moves = _listed_moves(*self._listing)
+                self._listing = None
+            else:
+                self._moves = LOGIC_INSTANCE.generate_moves(self)
+        return self._moves
+
+    @property
+    def is_terminal(self):
+        if self._is_terminal is None:
+            self._check_end_of_game()
+        return self._is_terminal
+
+    @is_terminal.setter
+    def is_terminal(self, value):
+        self._is_terminal = value
+
+    @property
+    def winner(self):
+        if self._is_terminal is None:
+            self._check_end_of_game()
+        return self._winner
+
+    @winner.setter
+    def winner(self, value):
+        self._winner = value
+
+    def _check_end_of_game(self):
+        self._is_terminal = True
+        if not self._has_moves():
+            self._winner = self.other
+        elif self.has_single_king(self.pov) and self.has_single_king(self.other):
+            self._winner = None
+        elif self._repetitions >= 3:
+            self._winner = None
+        else:
+            self._is_terminal = False
+            self._winner = None
 
-    def _encode_state(self):
-        state = []
-        for col in range(BOARD_SIZE) if self.pov == self.white else reversed(range(BOARD_SIZE)):
-            for row in range(BOARD_SIZE) if self.pov == self.white else reversed(range(BOARD_SIZE)):
-                field = self.fields[col][row]
-                if field.player is not None:
-                    state.append((1 if field.is_king else 2) + (0 if field.player == self.pov else 2))
-                else:
-                    state.append(0)
-        return self.pov, bytes(state)
+    def _has_moves(self):
+        """ returns: if the side to move has any move - without listing moves, unless they are already listed
+        """
+        if self._moves is not None or self._listing is not None:
+            return bool(self.moves)
+
+        fields = self.fields
+        for col in range(BOARD_SIZE):
+            for row in range(BOARD_SIZE):
+                field = fields[col][row]
+                if field.player == self.pov and self._can_piece_move(col, row, field):
+                    return True
+        return False
 
-    def _can_piece_move(self, col, row):
-        field = self.fields[col][row]
+    def _can_piece_move(self, col, row, field):
+        # a piece that can capture can also step, unless the captured piece is next to it
         for dir_col in -1, 1:
             for dir_row in -1, 1:
                 c = col + dir_col
                 r = row + dir_row
                 if 0 <= c < BOARD_SIZE and 0 <= r < BOARD_SIZE:
-                    if self.fields[c][r].player is None:
+                    neighbour = self.fields[c][r].player
+                    if neighbour is None:
                         if dir_row > 0 or field.is_king:
                             return True
-                    elif self.fields[c][r].player != field.player:
+                    elif neighbour != field.player:
                         c += dir_col
                         r += dir_row
-                        if 0 <= c < BOARD_SIZE and 0 <= r < BOARD_SIZE:
-                            if self.fields[c][r].player is None:
-                                return True
-
+                        if 0 <= c < BOARD_SIZE and 0 <= r < BOARD_SIZE and self.fields[c][r].player is None:
+                            return True
         return False
 
+    def _count_piece(self, field, number):
+        if field.player is not None:
+            counts = self.kings if field.is_king else self.men
+            counts[field.player] = counts.get(field.player, 0) + number
+
+    def count_pieces(self, player):
+        """ returns: (men, kings) of the player
+        """
+        return self.men.get(player, 0), self.kings.get(player, 0)
+
+    def has_single_king(self, player):
+        return self.men.get(player, 0) == 0 and self.kings.get(player, 0) == 1
+
+    def _encode_state(self):
+        state = []
+        for col in range(BOARD_SIZE) if self.pov == self.white else reversed(range(BOARD_SIZE)):
+            for row in range(BOARD_SIZE) if self.pov == self.white else reversed(range(BOARD_SIZE)):
+                field = self.fields[col][row]
+                if field.player is not None:
+                    state.append((1 if field.is_king else 2) + (0 if field.player == self.pov else 2))
+                else:
+                    state.append(0)
+        return self.pov, bytes(state)
+
     def begin(self, white_player, black_player):
         for col in self.fields:
             for field_id in range(BOARD_SIZE):
@@ -137,9 +233,12 @@ class DraughtsView:
                         field.player = white_player
                     elif field_id > BOARD_SIZE // 2:
                         field.player = black_player
+                    self._count_piece(field, 1)
 
         self.pov = self.white = white_player
         self.other = self.black = black_player
+        self._moves = None
+        self._listing = None
 
     def __getitem__(self, key):
         return self.fields[key[0]][key[1]]
@@ -201,6 +300,11 @@ class DraughtsLogic(FiniteTurnGameLogic):
         return game_view.pov
 
     def list_moves(self, game_view):
+        return game_view.moves
+
+    def generate_moves(self, game_view):
+        """ Lists moves of the view, which caches them - use list_moves instead
+        """
         moves = []
         moves_captures = 0
 
@@ -280,6 +384,12 @@ class DraughtsLogic(FiniteTurnGameLogic):
     def is_view_terminal(self, game_view):
         return game_view.is_terminal
 
+    def hash_view(self, game_view):
+        position = bytes(
+            0 if field.player is None else (1 if field.player == game_view.pov else 3) + (1 if field.is_king else 0)
+            for column in game_view.fields for field in column)
+        return int.from_bytes(hashlib.blake2b(position, digest_size=8).digest(), "little")
+
     def apply_move(self, game_view, move):  # without validating length
         assert game_view[move[0]].player == game_view.pov
 
@@ -341,37 +451,157 @@ class DraughtsLogic(FiniteTurnGameLogic):
 
         return DraughtsView(game_view, changes, True, True)
 
+    def list_moves_batch(self, game_views):
+        if len(game_views) < MIN_BATCH_SIZE:
+            return super(DraughtsLogic, self).list_moves_batch(game_views)
+
+        from engine.games.numpy import draughts as batched
+
+        listed = [view for view in game_views if view._moves is None and view._listing is None]
+        if len(listed) >= MIN_BATCH_SIZE:
+            listing = batched.list_moves(_boards_of_views(listed))
+            for j, view in enumerate(listed):
+                view._listing = listing, j
+
+        return [view.moves for view in game_views]
+
+    def apply_moves(self, game_views, moves):
+        """ Applies moves to boards of all views together, new views are built from the results
+        and their moves are listed and end of game conditions checked in bulk as well.
+        New views may share unchanged Field objects with the given views.
+        """
+        if len(game_views) < MIN_BATCH_SIZE:
+            return super(DraughtsLogic, self).apply_moves(game_views, moves)
+
+        import numpy as np
+        from engine.games.numpy import draughts as batched
+
+        boards = _boards_of_views(game_views)
+        paths = [[field_to_square(*field) for field in move] for move in moves]
+
+        # captured pieces are the enemy ones between consecutive squares of a move
+        segments = np.array([(i, path[j], path[j + 1]) for i, path in enumerate(paths) for j in range(len(path) - 1)])
+        move_ids, starts, ends = segments[:, 0], segments[:, 1], segments[:, 2]
+        cols, rows = batched.SQUARE_COLS, batched.SQUARE_ROWS
+        directions = (cols[ends] > cols[starts]) * 2 + (rows[ends] > rows[starts])
+        between = batched.RAYS[starts, directions]
+        between_mask = np.arange(BOARD_SIZE) < np.abs(rows[ends] - rows[starts])[:, None] - 1
+        between = np.where(between_mask, between, 0)
+        codes = boards[move_ids[:, None], between]
+        segment, dist = np.nonzero(between_mask & ((codes == batched.ENEMY_MAN) | (codes == batched.ENEMY_KING)))
+        captured = np.zeros(boards.shape, bool)
+        captured[move_ids[segment], between[segment, dist]] = True
+
+        from_ = np.array([path[0] for path in paths])
+        to = np.array([path[-1] for path in paths])
+        new_boards, pieces = batched.apply_moves(boards, from_, to, captured)
+        assert np.all((pieces == batched.OWN_MAN) | (pieces == batched.OWN_KING))
+
+        # kept by the new views, whose moves are converted from it when needed
+        listing = batched.list_moves(new_boards)
+        moves_counts = listing.counts
+        kings_only = (np.count_nonzero(new_boards == batched.OWN_KING, axis=1) == 1) & \
+                     (np.count_nonzero(new_boards == batched.ENEMY_KING, axis=1) == 1) & \
+                     (np.count_nonzero((new_boards == batched.OWN_MAN) | (new_boards == batched.ENEMY_MAN), axis=1) == 0)
+        kings = (pieces == batched.OWN_KING) | (to >= batched.LAST_ROW_SQUARES)
+
+        # states as encoded by DraughtsView, for positions seen by white and by black
+        states = np.zeros((len(paths), BOARD_SIZE * BOARD_SIZE), np.uint8)
+        states[:, batched.VIEW_STATE_INDICES] = batched.VIEW_STATE_CODES[new_boards]
+        white_states = [state.tobytes() for state in states]
+        black_states = [state.tobytes() for state in states[:, ::-1]]
+
+        new_views = []
+        for i, (view, path) in enumerate(zip(game_views, paths)):
+            changes = [(SQUARE_FIELDS[path[0]], Field(True))]
+            changes.extend((SQUARE_FIELDS[square], Field(True)) for square in np.nonzero(captured[i])[0])
+            changes.append((SQUARE_FIELDS[path[-1]], Field(True, view.pov, bool(kings[i]))))
+            new_view = DraughtsView(view, changes, True, share_fields=True)
+            new_view._listing = listing, i
+
+            state = new_view.pov, white_states[i] if new_view.pov == new_view.white else black_states[i]
+            new_view.previous_states[state] = new_view.previous_states.get(state, 0) + 1
+
+            new_view.is_terminal = bool(moves_counts[i] == 0 or kings_only[i] or new_view.previous_states[state] >= 3)
+            new_view.winner = new_view.other if moves_counts[i] == 0 else None
+            new_views.append(new_view)
+
+        return new_views
+
     def evaluate_view(self, view, viewpoint_player):
         points_current = 0
         points_other = 0
-        for col in view.fields:
-            for field in col:
-                if field.player == viewpoint_player:
-                    points_current += 3.5 if field.is_king else 1
-                elif field.player is not None:
-                    points_other += 3.5 if field.is_king else 1
+        for player in view.men.keys() | view.kings.keys():
+            men, kings = view.count_pieces(player)
+            points = men + 3.5 * kings if kings else men
+            if player == viewpoint_player:
+                points_current += points
+            else:
+                points_other += points
 
         if view.winner is None:
             return points_current - points_other
         elif view.winner == viewpoint_player:
-            return points_current + 1000
+            return points_current + WIN_POINTS
         else:
-            return -(points_other + 1000)
+            return -(points_other + WIN_POINTS)
+
+
+def _listed_moves(listing, i):
+    """ returns: moves of i-th board of batched listing (engine.games.numpy.draughts.Moves), as listed by DraughtsLogic
+    """
+    start, end = listing.offsets[i], listing.offsets[i + 1]
+    return [[SQUARE_FIELDS[square] for square in path[:length]]
+            for path, length in zip(listing.path[start:end].tolist(), listing.length[start:end].tolist())]
+
+
+def _boards_of_views(views):
+    import numpy as np
+    from engine.games.numpy.draughts import board_from_view
+
+    # views are often repeated, when all moves of a position are applied
+    boards = {}
+    for view in views:
+        if id(view) not in boards:
+            boards[id(view)] = board_from_view(view)
+    return np.stack([boards[id(view)] for view in views])
 
 
 LOGIC_INSTANCE = DraughtsLogic()
 
 
 class Draughts(Game):
-    def __init__(self):
+    def __init__(self, tablebase=None, quiet_plies_limit=None, resign_threshold=None, resign_plies=10,
+                 max_plies=None):
+        """
+        args:
+            tablebase - DraughtsTablebase or path to it, games that reach positions solved by it are adjudicated
+            quiet_plies_limit - games are drawn after this many plies without captures and moves of men
+            resign_threshold - games are won by the side whose material advantage (men count 1, kings 3.5)
+                               is at least the threshold for resign_plies plies in a row
+            max_plies - games are drawn after this many plies
+        """
+        from engine.games.draughts_tablebase import open_tablebase
+
         super(Draughts, self).__init__()
         self._view = None
+        self._tablebase = open_tablebase(tablebase)
+        self.quiet_plies_limit = quiet_plies_limit
+        self.resign_threshold = resign_threshold
+        self.resign_plies = resign_plies
+        self.max_plies = max_plies
+
+        self._plies = 0
+        self._advantage_plies = 0
+        self._statistics = {}
 
     def _prepare_new_game(self):
         self._view = DraughtsView()
         white = random.choice(self._players)
         black = self._players[0] if self._players[0] != white else self._players[1]
         self._view.begin(white, black)
+        self._plies = 0
+        self._advantage_plies = 0
 
     def get_game_info(self):
         return ConstPlayersNGameInfo(2)
@@ -385,6 +615,63 @@ class Draughts(Game):
     def set_players_moves(self, moves):
         self._view = LOGIC_INSTANCE.apply_move(self._view, moves[self._view.pov])
 
+        if self._tablebase is not None and not self._view.is_terminal:
+            probed = self._tablebase.probe(self._view)
+            if probed is not None:
+                result, _ = probed
+                self._adjudicate("tablebase",
+                                 None if result == 0 else self._view.pov if result > 0 else self._view.other)
+
+        self._plies += 1
+        if not self._view.is_terminal:
+            self._apply_adjudication_rules()
+
+        if self._view.is_terminal:
+            self._count("games")
+            self._count("plies", self._plies)
+
+    def _apply_adjudication_rules(self):
+        view = self._view
+        if self.resign_threshold is not None:
+            white_men, white_kings = view.count_pieces(view.white)
+            black_men, black_kings = view.count_pieces(view.black)
+            advantage = white_men + 3.5 * white_kings - black_men - 3.5 * black_kings
+
+            # plies in a row with the advantage of white (positive) or black (negative)
+            if advantage >= self.resign_threshold:
+                self._advantage_plies = max(self._advantage_plies, 0) + 1
+            elif advantage <= -self.resign_threshold:
+                self._advantage_plies = min(self._advantage_plies, 0) - 1
+            else:
+                self._advantage_plies = 0
+
+            if abs(self._advantage_plies) >= self.resign_plies:
+                self._adjudicate("material", view.white if self._advantage_plies > 0 else view.black)
+                return
+
+        if self.quiet_plies_limit is not None and view.quiet_plies >= self.quiet_plies_limit:
+            self._adjudicate("quiet plies", None)
+        elif self.max_plies is not None and self._plies >= self.max_plies:
+            self._adjudicate("max plies", None)
+
+    def _adjudicate(self, reason, winner):
+        self._view.is_terminal = True
+        self._view.winner = winner
+        self._count("adjudicated by " + reason)
+
+    def _count(self, statistic, number=1):
+        self._statistics[statistic] = self._statistics.get(statistic, 0) + number
+
+    def get_run_statistics(self):
+        """ Returns numbers of finished games, their plies and adjudicated games by reasons, since the last call
+        """
+        statistics, self._statistics = self._statistics, {}
+        return statistics
+
+    def add_run_statistics(self, statistics):
+        for statistic, number in statistics.items():
+            self._count(statistic, number)
+
     def is_game_over(self):
         return self._view.is_terminal
 
@@ -395,16 +682,7 @@ class Draughts(Game):
         if self._view.winner is None:
             return 0, 0, 0
 
-        kings = 0
-        men = 0
-
-        for col in range(BOARD_SIZE):
-            for row in range(BOARD_SIZE):
-                if self._view[(col, row)].player == self._view.winner:
-                    if self._view[(col, row)].is_king:
-                        kings += 1
-                    else:
-                        men += 1
+        men, kings = self._view.count_pieces(self._view.winner)
 
         if self._view.winner == player:
             return 1, kings, men
@@ -413,8 +691,74 @@ class Draughts(Game):
 
 
 class MinMaxDraughtsPlayer(MinMaxPlayer):
-    def __init__(self, depth):
-        super(MinMaxDraughtsPlayer, self).__init__(LOGIC_INSTANCE, depth)
+    def __init__(self, depth, opening_book=None, tablebase=None, retain_tree=False,
+                 max_retained_nodes=RETAINED_NODES):
+        from engine.games.draughts_tablebase import open_tablebase
+
+        super(MinMaxDraughtsPlayer, self).__init__(LOGIC_INSTANCE, depth, opening_book, open_tablebase(tablebase),
+                                                   retain_tree, max_retained_nodes)
+
+
+def terminal_value(view, viewpoint_player):
+    """ returns: 1 if given player won the finished game, -1 if lost and 0 for draws
+    """
+    if view.winner is None:
+        return 0
+    return 1 if view.winner == viewpoint_player else -1
+
+
+class DraughtsRolloutEvaluator:
+    """ Evaluates views by random rollouts of all of them together, played by the batched simulator
+    (without repetitions of positions from before the rollouts), taking the sign of material balance
+    of rollouts that did not finish in max_plies plies
+    """
+
+    def __init__(self, max_plies=20):
+        self.max_plies = max_plies
+
+    def evaluate_views(self, views, viewpoint_player):
+        import numpy as np
+        from engine.games.numpy.draughts import DraughtsBatch, OWN_MAN, OWN_KING, ENEMY_MAN, ENEMY_KING
+
+        batch = DraughtsBatch(len(views))
+        batch.set_positions(_boards_of_views(views), [view.pov == view.white for view in views])
+        for _ in range(self.max_plies):
+            if batch.is_terminal.all():
+                break
+            batch.random_step()
+
+        boards = batch.boards
+        material = np.count_nonzero(boards == OWN_MAN, axis=1) - np.count_nonzero(boards == ENEMY_MAN, axis=1) + \
+            3.5 * (np.count_nonzero(boards == OWN_KING, axis=1) - np.count_nonzero(boards == ENEMY_KING, axis=1))
+        # for white
+        values = np.where(batch.is_terminal, batch.winner, np.sign(material) * np.where(batch.white_to_move, 1, -1))
+
+        return [value if viewpoint_player == view.white else -value for view, value in zip(views, values.tolist())]
+
+
+class MCTSDraughtsPlayer(MCTSPlayer):
+    def __init__(self, playouts=200, time_budget=None, batch_size=8, exploration=1.4, rollout_plies=20):
+        super(MCTSDraughtsPlayer, self).__init__(LOGIC_INSTANCE, DraughtsRolloutEvaluator(rollout_plies), playouts,
+                                                 time_budget, batch_size, exploration, terminal_value=terminal_value)
+
+
+def build_draughts_opening_book(path, plies, depth):
+    """ Builds opening book for positions in less than given number of plies from the beginning,
+    with best moves selected by MinMax search of given depth
+
+    returns: number of positions in the book
+    """
+    white = MinMaxDraughtsPlayer(depth)
+    black = MinMaxDraughtsPlayer(depth)
+    view = DraughtsView()
+    view.begin(white, black)
+
+    def select_move(position):
+        searching_player = position.pov
+        searching_player.set_current_view(position)
+        return searching_player.get_best_moves()[0]
+
+    return build_opening_book(LOGIC_INSTANCE, view, plies, select_move, path, depth)
 
 
 def on_test_run_finished(results_by_players, results_by_pools):
@@ -0,0 +1,182 @@
+""" Compact binary encoding of draughts positions and moves, for passing them between processes and storing them
+
+Position is encoded in POSITION_SIZE bytes:
+    version, side to move (1 for white), slot of the white player, slot of the black player, status, repetitions
+    of the position, quiet plies (2 bytes) and 50 squares of the board oriented for white (see SQUARE_FIELDS
+    in engine.games.draughts), 4 bits each - EMPTY, WHITE_MAN, WHITE_KING, BLACK_MAN or BLACK_KING
+optionally followed by the repetition history - number of previous positions (2 bytes) and for each of them side
+to move, number of occurrences and its squares, as above.
+
+Players are not encoded - they are given by slots, indices in a sequence of players given to both encode_position
+and decode_position (e.g. players of the game), NO_SLOT standing for None. Status is PENDING if the end of game
+conditions were not checked yet, ONGOING, DRAW, WHITE_WON or BLACK_WON.
+
+Move is encoded as the number of its fields followed by squares of the fields, numbered for the side to move.
+"""
+import struct
+
+from engine.games.draughts import BOARD_SIZE, SQUARES_NUMBER, SQUARE_FIELDS, DraughtsMove, DraughtsView, \
+    Field, field_to_square
+
+VERSION = 1
+POSITION = struct.Struct("<6BH{}s".format(SQUARES_NUMBER // 2))
+POSITION_SIZE = POSITION.size
+HISTORY_SIZE = struct.Struct("<H")
+HISTORY_ENTRY = struct.Struct("<2B{}s".format(SQUARES_NUMBER // 2))
+MOVES_HEADER = struct.Struct("<BH")  # version, number of moves
+
+EMPTY, WHITE_MAN, WHITE_KING, BLACK_MAN, BLACK_KING = range(5)
+PENDING, ONGOING, DRAW, WHITE_WON, BLACK_WON = range(5)
+NO_SLOT = 255
+
+# fields of squares in views of the black side
+_ROTATED_FIELDS = [(BOARD_SIZE - 1 - col, BOARD_SIZE - 1 - row) for col, row in SQUARE_FIELDS]
+# indices of squares in encoded states of DraughtsView.previous_states
+_STATE_INDICES = [col * BOARD_SIZE + row for col, row in SQUARE_FIELDS]
+_UNPACKED = [(byte & 15, byte >> 4) for byte in range(256)]
+# empty board, whose fields are shared by decoded views
+_EMPTY_VIEW = DraughtsView()
+
+
+def _pack(codes):
+    return bytes(low | high << 4 for low, high in zip(codes[0::2], codes[1::2]))
+
+
+def _unpack(data):
+    codes = []
+    for byte in data:
+        codes.extend(_UNPACKED[byte])
+    return codes
+
+
+def _slot(player, players):
+    return NO_SLOT if player is None else players.index(player) if players is not None else player
+
+
+def _player(slot, players):
+    return None if slot == NO_SLOT else players[slot] if players is not None else slot
+
+
+def encode_position(view, players=None, history=False):
+    """ args:
+        view - DraughtsView
+        players - sequence of players of the view, encoded as their indices - if not given, players of the view
+                  must be slot numbers themselves (as in views decoded without players)
+        history - if previous positions (for repetitions) should be encoded
+
+    returns: bytes of the position
+    """
+    white = view.white
+    fields = view.fields
+    codes = []
+    for col, row in SQUARE_FIELDS if view.pov == white else _ROTATED_FIELDS:
+        field = fields[col][row]
+        if field.player is None:
+            codes.append(EMPTY)
+        elif field.player == white:
+            codes.append(WHITE_KING if field.is_king else WHITE_MAN)
+        else:
+            codes.append(BLACK_KING if field.is_king else BLACK_MAN)
+
+    if view._is_terminal is None:
+        status = PENDING
+    elif not view._is_terminal:
+        status = ONGOING
+    else:
+        status = DRAW if view._winner is None else WHITE_WON if view._winner == white else BLACK_WON
+
+    data = POSITION.pack(VERSION, view.pov == white, _slot(white, players), _slot(view.black, players), status,
+                         view._repetitions, view.quiet_plies, _pack(codes))
+    if not history:
+        return data
+
+    entries = [HISTORY_SIZE.pack(len(view.previous_states))]
+    for (pov, state), count in view.previous_states.items():
+        entries.append(HISTORY_ENTRY.pack(pov == white, count, _pack([state[i] for i in _STATE_INDICES])))
+    return data + b"".join(entries)
+
+
+def decode_position(data, players=None):
+    """ args:
+        data - bytes of a position, as returned by encode_position
+        players - sequence of players the position was encoded with, if not given slot numbers are used as players
+
+    returns: DraughtsView of the position, with previous positions if they were encoded - its fields are shared
+             with other views (as with share_fields), so they must not be modified
+    raises: ValueError if the data is not a position of a supported version
+    """
+    if len(data) < POSITION_SIZE or data[0] != VERSION:
+        raise ValueError("Not a draughts position of version {}".format(VERSION))
+
+    _, white_to_move, white_slot, black_slot, status, repetitions, quiet_plies, board = POSITION.unpack_from(data)
+    view = DraughtsView(_EMPTY_VIEW, share_fields=True)
+    white = view.white = _player(white_slot, players)
+    black = view.black = _player(black_slot, players)
+    view.pov, view.other = (white, black) if white_to_move else (black, white)
+    view.quiet_plies = quiet_plies
+    view._repetitions = repetitions
+
+    fields = view.fields
+    for (col, row), code in zip(SQUARE_FIELDS if white_to_move else _ROTATED_FIELDS, _unpack(board)):
+        if code != EMPTY:
+            field = fields[col][row] = Field(True, white if code <= WHITE_KING else black,
+                                             code == WHITE_KING or code == BLACK_KING)
+            view._count_piece(field, 1)
+
+    if status == PENDING:
+        view.is_terminal = None
+    else:
+        view.is_terminal = status != ONGOING
+        view.winner = white if status == WHITE_WON else black if status == BLACK_WON else None
+
+    if len(data) > POSITION_SIZE:
+        offset = POSITION_SIZE
+        entries, = HISTORY_SIZE.unpack_from(data, offset)
+        offset += HISTORY_SIZE.size
+        for _ in range(entries):
+            entry_white_to_move, count, entry_board = HISTORY_ENTRY.unpack_from(data, offset)
+            offset += HISTORY_ENTRY.size
+
+            state = bytearray(BOARD_SIZE * BOARD_SIZE)
+            for i, code in zip(_STATE_INDICES, _unpack(entry_board)):
+                state[i] = code
+            view.previous_states[(white if entry_white_to_move else black, bytes(state))] = count
+
+    return view
+
+
+def encode_move(move):
+    """ args:
+        move - move as listed by DraughtsLogic (list of fields) or DraughtsMove
+
+    returns: bytes of the move
+    """
+    if isinstance(move, DraughtsMove):
+        move = [move.from_] + move.list
+    return bytes([len(move)] + [field_to_square(col, row) for col, row in move])
+
+
+def decode_move(data, offset=0):
+    """ returns: move (list of fields, as listed by DraughtsLogic) encoded at given offset of the data
+    """
+    return [SQUARE_FIELDS[square] for square in data[offset + 1:offset + 1 + data[offset]]]
+
+
+def encode_moves(moves):
+    return MOVES_HEADER.pack(VERSION, len(moves)) + b"".join(encode_move(move) for move in moves)
+
+
+def decode_moves(data):
+    """ returns: list of moves encoded by encode_moves
+    raises: ValueError if the data is not a list of moves of a supported version
+    """
+    if len(data) < MOVES_HEADER.size or data[0] != VERSION:
+        raise ValueError("Not a list of draughts moves of version {}".format(VERSION))
+
+    _, count = MOVES_HEADER.unpack_from(data)
+    moves = []
+    offset = MOVES_HEADER.size
+    for _ in range(count):
+        moves.append(decode_move(data, offset))
+        offset += 1 + data[offset]
+    return moves
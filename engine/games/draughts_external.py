@@ -0,0 +1,122 @@
+""" Draughts players backed by external engines, talking PDN notation
+
+Fields are numbered 1 to 50 row by row from the black side of the board, as in PDN. The engine is given
+a position per line in PDN FEN notation - side to move, then white and black pieces, kings prefixed with K,
+e.g. "W:W31,32,K45:B1,2" - and answers with a line with its move, e.g. "32-28" or "28x19x10" (captures
+with all fields the piece stops at, or only the first and the last one when that is unambiguous).
+See sample/draughts_engine.py for an engine.
+"""
+import random
+
+from engine.algorithms.external_player import ExternalPlayer
+from engine.games.draughts import BOARD_SIZE, SQUARES_NUMBER, DraughtsView
+
+
+def pdn_square(view, field):
+    """ returns: PDN number of a field (col, row) of the view
+    """
+    col, row = field
+    if view.pov != view.white:
+        col, row = BOARD_SIZE - 1 - col, BOARD_SIZE - 1 - row
+    return (BOARD_SIZE - 1 - row) * (BOARD_SIZE // 2) + col // 2 + 1
+
+
+def pdn_field(view, square):
+    """ returns: (col, row) of the view of a field with given PDN number
+    """
+    row = BOARD_SIZE - 1 - (square - 1) // (BOARD_SIZE // 2)
+    col = 2 * ((square - 1) % (BOARD_SIZE // 2)) + row % 2
+    if view.pov != view.white:
+        col, row = BOARD_SIZE - 1 - col, BOARD_SIZE - 1 - row
+    return col, row
+
+
+def position_to_fen(view):
+    pieces = {view.white: [], view.black: []}
+    for square in range(1, SQUARES_NUMBER + 1):
+        field = view[pdn_field(view, square)]
+        if field.player is not None:
+            pieces[field.player].append(("K" if field.is_king else "") + str(square))
+
+    return "{}:W{}:B{}".format("W" if view.pov == view.white else "B",
+                               ",".join(pieces[view.white]), ",".join(pieces[view.black]))
+
+
+def view_from_fen(fen, white_player, black_player):
+    """ returns: DraughtsView of a position in PDN FEN notation (without history of previous positions)
+    raises: ValueError if the notation is not valid
+    """
+    view = DraughtsView()
+    view.white, view.black = white_player, black_player
+    try:
+        side, white, black = fen.strip().split(":")
+        if side not in ("W", "B") or white[:1] != "W" or black[:1] != "B":
+            raise ValueError
+        view.pov, view.other = (white_player, black_player) if side == "W" else (black_player, white_player)
+
+        for player, pieces in (white_player, white[1:]), (black_player, black[1:]):
+            for piece in filter(None, pieces.split(",")):
+                square = int(piece[1:] if piece.startswith("K") else piece)
+                if not 1 <= square <= SQUARES_NUMBER:
+                    raise ValueError
+                field = view[pdn_field(view, square)]
+                if field.player is not None:
+                    raise ValueError
+                field.player = player
+                field.is_king = piece.startswith("K")
+                view._count_piece(field, 1)
+    except ValueError:
+        raise ValueError("Invalid FEN: {}".format(fen))
+
+    # checked when needed
+    view.is_terminal = None
+    return view
+
+
+def _is_capture(view, move):
+    (col, row), (to_col, to_row) = move[:2]
+    dir_col = 1 if to_col > col else -1
+    dir_row = 1 if to_row > row else -1
+    return any(view[(col + dir_col * dist, row + dir_row * dist)].player == view.other
+               for dist in range(1, abs(to_col - col)))
+
+
+def move_to_pdn(view, move):
+    separator = "x" if _is_capture(view, move) else "-"
+    return separator.join(str(pdn_square(view, field)) for field in move)
+
+
+def move_from_pdn(view, text):
+    """ returns: legal move of the view given in PDN notation
+    raises: ValueError if there is no such legal move or it is ambiguous
+    """
+    try:
+        squares = [int(square) for square in text.strip().replace("x", "-").split("-")]
+    except ValueError:
+        raise ValueError("Invalid move: {}".format(text))
+
+    matching = []
+    for move in view.moves:
+        move_squares = [pdn_square(view, field) for field in move]
+        if move_squares == squares:
+            return move
+        if len(squares) == 2 and (move_squares[0], move_squares[-1]) == tuple(squares):
+            matching.append(move)
+
+    if len(matching) != 1:
+        raise ValueError("Illegal or ambiguous move: {}".format(text))
+    return matching[0]
+
+
+class ExternalDraughtsPlayer(ExternalPlayer):
+    """ Plays moves of an external engine, or random moves when the engine fails (unless fallback is False)
+    """
+
+    def encode_view(self, view):
+        return position_to_fen(view)
+
+    def decode_move(self, view, answer):
+        return move_from_pdn(view, answer)
+
+    def fallback_move(self, view):
+        return random.choice(view.moves)
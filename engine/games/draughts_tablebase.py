@@ -0,0 +1,363 @@
+""" Endgame tablebase for draughts positions with few pieces, generated with retrograde analysis
+
+Positions are seen from the side to move, with board oriented as fields of its DraughtsView,
+as lists of codes of 50 squares (see SQUARE_FIELDS in engine.games.draughts).
+Positions with the same numbers of own men, own kings, enemy men and enemy kings (signature)
+are indexed by ranks of sorted squares of each kind of pieces in the combinatorial number system.
+
+For every indexed position one byte is stored:
+    0 - no position (pieces on the same square, men on promotion rows)
+    1 - draw
+    2 + 2 * distance - side to move wins in given number of plies
+    3 + 2 * distance - side to move loses in given number of plies
+Repetitions are not taken into account - positions that none of the sides can force to end are draws.
+"""
+import collections
+import itertools
+import mmap
+import struct
+from array import array
+from math import comb
+
+from engine.games.draughts import BOARD_SIZE, SQUARES_NUMBER, SQUARE_FIELDS, WIN_POINTS, field_to_square
+
+EMPTY, OWN_MAN, OWN_KING, ENEMY_MAN, ENEMY_KING = range(5)
+
+DRAW = 1
+MAX_DISTANCE = 126
+
+MAGIC = b"AITB"
+VERSION = 1
+HEADER = struct.Struct("<4sHHI")  # magic, version, max pieces, signatures count
+SIGNATURE = struct.Struct("<4BQ")  # own men, own kings, enemy men, enemy kings, table size
+
+LAST_ROW_SQUARES = SQUARES_NUMBER - BOARD_SIZE // 2
+
+_open_tablebases = {}
+
+
+def _create_rays():
+    rays = []
+    for col, row in SQUARE_FIELDS:
+        square_rays = []
+        for dir_col in -1, 1:
+            for dir_row in -1, 1:
+                ray = []
+                c, r = col + dir_col, row + dir_row
+                while 0 <= c < BOARD_SIZE and 0 <= r < BOARD_SIZE:
+                    ray.append(field_to_square(c, r))
+                    c += dir_col
+                    r += dir_row
+                square_rays.append((dir_row, ray))
+        rays.append(square_rays)
+    return rays
+
+
+RAYS = _create_rays()
+
+
+def _captures(board, start, square, is_king, captured, path, sequences):
+    extended = False
+    for _, ray in RAYS[square]:
+        victim = None
+        for dist, target in enumerate(ray):
+            if not is_king and (dist > 1 or dist == 1 and victim is None):
+                break
+            code = board[target] if target != start else EMPTY
+            if code == OWN_MAN or code == OWN_KING:
+                break
+            if code != EMPTY:
+                if victim is not None or target in captured:
+                    break
+                victim = target
+                continue
+            if victim is not None:
+                extended = True
+                _captures(board, start, target, is_king, captured + [victim], path + [target], sequences)
+
+    if not extended and captured:
+        sequences.append((path, captured))
+
+
+def list_moves(board):
+    """ Lists moves the same way as DraughtsLogic - only the longest captures if there are any
+
+    returns: list of (path - list of squares starting with moved piece's one, list of captured squares)
+    """
+    captures = []
+    for square in range(SQUARES_NUMBER):
+        if board[square] == OWN_MAN or board[square] == OWN_KING:
+            _captures(board, square, square, board[square] == OWN_KING, [], [square], captures)
+
+    if captures:
+        longest = max(len(captured) for _, captured in captures)
+        return [move for move in captures if len(move[1]) == longest]
+
+    moves = []
+    for square in range(SQUARES_NUMBER):
+        is_king = board[square] == OWN_KING
+        if board[square] != OWN_MAN and not is_king:
+            continue
+        for dir_row, ray in RAYS[square]:
+            if not is_king and dir_row < 0:
+                continue
+            for target in ray:
+                if board[target] != EMPTY:
+                    break
+                moves.append(([square, target], []))
+                if not is_king:
+                    break
+
+    return moves
+
+
+def apply_move(board, move):
+    """ returns: board after the move, seen from the other side
+    """
+    path, captured = move
+    moved = board[path[0]]
+    if moved == OWN_MAN and path[-1] >= LAST_ROW_SQUARES:
+        moved = OWN_KING
+
+    new_board = [EMPTY] * SQUARES_NUMBER
+    for square in range(SQUARES_NUMBER):
+        code = board[square]
+        if code != EMPTY and square != path[0] and square not in captured:
+            new_board[SQUARES_NUMBER - 1 - square] = code + 2 if code <= OWN_KING else code - 2
+    new_board[SQUARES_NUMBER - 1 - path[-1]] = moved + 2
+
+    return new_board
+
+
+def _rank(squares):
+    return sum(comb(square, i + 1) for i, square in enumerate(squares))
+
+
+def signature_size(signature):
+    size = 1
+    for count in signature:
+        size *= comb(SQUARES_NUMBER, count)
+    return size
+
+
+def board_signature_and_index(board):
+    groups = ([], [], [], [])
+    for square in range(SQUARES_NUMBER):
+        if board[square] != EMPTY:
+            groups[board[square] - 1].append(square)
+
+    index = 0
+    for squares in groups:
+        index = index * comb(SQUARES_NUMBER, len(squares)) + _rank(squares)
+
+    return tuple(len(squares) for squares in groups), index
+
+
+def _boards(signature):
+    own_men, own_kings, enemy_men, enemy_kings = signature
+    for placement in itertools.product(
+            itertools.combinations(range(LAST_ROW_SQUARES), own_men),
+            itertools.combinations(range(SQUARES_NUMBER), own_kings),
+            itertools.combinations(range(BOARD_SIZE // 2, SQUARES_NUMBER), enemy_men),
+            itertools.combinations(range(SQUARES_NUMBER), enemy_kings)):
+        board = [EMPTY] * SQUARES_NUMBER
+        pieces = 0
+        for code, squares in enumerate(placement, 1):
+            for square in squares:
+                board[square] = code
+            pieces += len(squares)
+
+        if board.count(EMPTY) == SQUARES_NUMBER - pieces:
+            yield board
+
+
+def _signatures(max_pieces):
+    return [(own_men, own_kings, enemy_men, enemy_kings)
+            for own_men, own_kings, enemy_men, enemy_kings in itertools.product(range(max_pieces + 1), repeat=4)
+            if own_men + own_kings > 0 and enemy_men + enemy_kings > 0
+            and own_men + own_kings + enemy_men + enemy_kings <= max_pieces]
+
+
+def generate(max_pieces):
+    """ Solves all positions with at most max_pieces pieces
+
+    returns: tables (bytearrays of position values) by signatures
+    """
+    signatures = _signatures(max_pieces)
+    offsets = {}
+    total = 0
+    for signature in signatures:
+        offsets[signature] = total
+        total += signature_size(signature)
+
+    values = bytearray(total)
+    resolved = bytearray(total)
+    remaining = array("i", bytes(4 * total))
+    children_start = array("q", bytes(8 * total))
+    children = array("q")
+    queue = collections.deque()
+    immediate_wins = []
+
+    # forward pass - moves of all positions, child -1 meaning that all enemy pieces were captured
+    for signature in signatures:
+        offset = offsets[signature]
+        for board in _boards(signature):
+            position_id = offset + board_signature_and_index(board)[1]
+            values[position_id] = DRAW
+
+            moves = list_moves(board)
+            if not moves:
+                values[position_id] = 3
+            elif signature == (0, 1, 0, 1):
+                resolved[position_id] = 1  # single king against single king ends the game with a draw
+                continue
+
+            children_start[position_id] = len(children)
+            remaining[position_id] = len(moves)
+            for move in moves:
+                child_signature, child_index = board_signature_and_index(apply_move(board, move))
+                if child_signature[0] + child_signature[1] == 0:
+                    values[position_id] = 4
+                    children.append(-1)
+                else:
+                    children.append(offsets[child_signature] + child_index)
+
+            if values[position_id] != DRAW:
+                resolved[position_id] = 1
+                (queue if values[position_id] == 3 else immediate_wins).append(position_id)
+
+    # predecessors of positions, stored contiguously for each position
+    predecessors_start = array("q", bytes(8 * (total + 1)))
+    for child in children:
+        if child >= 0:
+            predecessors_start[child + 1] += 1
+    for i in range(total):
+        predecessors_start[i + 1] += predecessors_start[i]
+    filled = array("q", predecessors_start)
+    predecessors = array("q", bytes(8 * len(children)))
+    for parent in range(total):
+        for i in range(children_start[parent], children_start[parent] + remaining[parent]):
+            child = children[i]
+            if child >= 0:
+                predecessors[filled[child]] = parent
+                filled[child] += 1
+
+    # retrograde pass - positions are resolved in order of distance
+    queue.extend(immediate_wins)
+    while queue:
+        position_id = queue.popleft()
+        value = values[position_id]
+        distance = min((value - 2) // 2 + 1, MAX_DISTANCE)
+        is_win = value % 2 == 0
+
+        for i in range(predecessors_start[position_id], predecessors_start[position_id + 1]):
+            parent = predecessors[i]
+            if resolved[parent]:
+                continue
+            if is_win:
+                # parent loses only if all its moves lead to enemy's wins
+                remaining[parent] -= 1
+                if remaining[parent] > 0:
+                    continue
+                values[parent] = 3 + 2 * distance
+            else:
+                values[parent] = 2 + 2 * distance
+            resolved[parent] = 1
+            queue.append(parent)
+
+    return {signature: values[offsets[signature]:offsets[signature] + signature_size(signature)]
+            for signature in signatures}
+
+
+def write(tables, max_pieces, path):
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, max_pieces, len(tables)))
+        for signature, table in tables.items():
+            file.write(SIGNATURE.pack(*signature, len(table)))
+            file.write(table)
+
+
+class DraughtsTablebase:
+    # solved wins are valued from WIN_VALUE - MAX_DISTANCE to WIN_VALUE, below wins of finished games
+    # and above any material balance
+    WIN_VALUE = WIN_POINTS - 1
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.max_pieces, signatures = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError("{} is not a draughts tablebase".format(path))
+        if version != VERSION:
+            raise ValueError("Unsupported tablebase version: {}".format(version))
+
+        self._offsets = {}
+        offset = HEADER.size
+        for _ in range(signatures):
+            *signature, size = SIGNATURE.unpack_from(self._map, offset)
+            offset += SIGNATURE.size
+            self._offsets[tuple(signature)] = offset
+            offset += size
+
+    def _board(self, view):
+        board = [EMPTY] * SQUARES_NUMBER
+        pieces = 0
+        for square, (col, row) in enumerate(SQUARE_FIELDS):
+            field = view.fields[col][row]
+            if field.player is None:
+                continue
+            pieces += 1
+            if pieces > self.max_pieces:
+                return None
+            board[square] = (OWN_MAN if field.player == view.pov else ENEMY_MAN) + (1 if field.is_king else 0)
+        return board
+
+    def probe(self, view):
+        """ returns: None if the position is not in the tablebase, otherwise (result, distance)
+        where result is 1 if side to move (view.pov) wins, 0 if it is a draw and -1 if it loses,
+        and distance is the number of plies to the end of the game with the best play (0 for draws)
+        """
+        board = self._board(view)
+        if board is None:
+            return None
+
+        signature, index = board_signature_and_index(board)
+        if signature not in self._offsets:
+            return None
+
+        value = self._map[self._offsets[signature] + index]
+        if value == 0:
+            return None
+        if value == DRAW:
+            return 0, 0
+        return (1 if value % 2 == 0 else -1), (value - 2) // 2
+
+    def evaluate_view(self, view, viewpoint_player):
+        """ returns: evaluation on the scale of DraughtsLogic.evaluate_view (faster wins are better, finished games
+        are won faster than any solved position), or None if the position is not in the tablebase
+        """
+        if view.is_terminal:
+            return None
+        probed = self.probe(view)
+        if probed is None:
+            return None
+
+        result, distance = probed
+        if result == 0:
+            return 0
+        if (result == 1) == (view.pov == viewpoint_player):
+            return self.WIN_VALUE - distance
+        return -(self.WIN_VALUE - distance)
+
+
+def open_tablebase(tablebase):
+    """ Returns DraughtsTablebase for a path, shared by all users of the path;
+    DraughtsTablebase and None are returned as they are
+    """
+    if tablebase is None or isinstance(tablebase, DraughtsTablebase):
+        return tablebase
+
+    if tablebase not in _open_tablebases:
+        _open_tablebases[tablebase] = DraughtsTablebase(tablebase)
+    return _open_tablebases[tablebase]
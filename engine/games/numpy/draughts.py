@@ -0,0 +1,374 @@
+""" Batched draughts simulator - many games kept in NumPy arrays and stepped together
+
+Boards are arrays of 50 dark squares (numbered as in engine.games.draughts, see SQUARE_FIELDS), each seen
+from the side to move, with the same codes as in engine.games.draughts_tablebase:
+0 - empty, 1 - own man, 2 - own king, 3 - enemy man, 4 - enemy king.
+Moves are listed and games end (no moves, single king against single king, third repetition of a position)
+the same way as in DraughtsLogic.
+"""
+import numpy as np
+
+from engine.games.draughts import BOARD_SIZE, SQUARES_NUMBER, SQUARE_FIELDS, field_to_square
+from engine.games.draughts_tablebase import EMPTY, OWN_MAN, OWN_KING, ENEMY_MAN, ENEMY_KING, LAST_ROW_SQUARES
+
+OFF_BOARD = 5
+HISTORY_SIZE = 64
+
+# squares along each of 4 directions from each square, padded with SQUARES_NUMBER (off board),
+# so that every ray ends with at least one off board square
+DIRECTIONS = [(dir_col, dir_row) for dir_col in (-1, 1) for dir_row in (-1, 1)]
+FORWARD = np.array([dir_row > 0 for _, dir_row in DIRECTIONS])
+FLIP_CODES = np.array([EMPTY, ENEMY_MAN, ENEMY_KING, OWN_MAN, OWN_KING, OFF_BOARD], np.int8)
+SQUARE_COLS = np.array([col for col, _ in SQUARE_FIELDS])
+SQUARE_ROWS = np.array([row for _, row in SQUARE_FIELDS])
+
+# positions as encoded by DraughtsView for repetitions - all fields column by column,
+# with codes 1 for own king, 2 for own man, 3 for enemy king and 4 for enemy man
+VIEW_STATE_INDICES = SQUARE_COLS * BOARD_SIZE + SQUARE_ROWS
+VIEW_STATE_CODES = np.array([0, 2, 1, 4, 3], np.uint8)
+
+
+def _create_rays():
+    rays = np.full((SQUARES_NUMBER, len(DIRECTIONS), BOARD_SIZE), SQUARES_NUMBER, np.int64)
+    for square, (col, row) in enumerate(SQUARE_FIELDS):
+        for direction, (dir_col, dir_row) in enumerate(DIRECTIONS):
+            c, r = col + dir_col, row + dir_row
+            dist = 0
+            while 0 <= c < BOARD_SIZE and 0 <= r < BOARD_SIZE:
+                rays[square, direction, dist] = field_to_square(c, r)
+                c += dir_col
+                r += dir_row
+                dist += 1
+    return rays
+
+
+RAYS = _create_rays()
+
+_zobrist_generator = np.random.default_rng(0)
+ZOBRIST = _zobrist_generator.integers(0, 2 ** 64, (SQUARES_NUMBER, OFF_BOARD), np.uint64, endpoint=False)
+ZOBRIST[:, EMPTY] = 0
+ZOBRIST_BLACK_TO_MOVE = _zobrist_generator.integers(0, 2 ** 64, dtype=np.uint64, endpoint=False)
+
+
+class Moves:
+    """ Moves of all games of a batch, sorted by game - moves of a game in the same order as listed by DraughtsLogic
+
+    Fields:
+        game - index of the game of each move
+        path - squares visited by the moved piece, starting with its square, padded with -1
+        length - number of squares in path
+        captured - boolean mask of captured squares of each move
+        offsets - moves of game i are offsets[i]:offsets[i + 1]
+        counts - number of moves of each game
+    """
+
+    def __init__(self, game, path, length, captured, games_number):
+        self.game = game
+        self.path = path
+        self.length = length
+        self.captured = captured
+        self.counts = np.bincount(game, minlength=games_number)
+        self.offsets = np.concatenate([[0], np.cumsum(self.counts)])
+
+    @property
+    def from_(self):
+        return self.path[:, 0]
+
+    @property
+    def to(self):
+        return self.path[np.arange(len(self.path)), self.length - 1]
+
+    def get_draughts_move(self, game, index):
+        """ returns: move of a game in DraughtsLogic format - list of (col, row) fields, as seen from the side to move
+        """
+        move = self.offsets[game] + index
+        return [SQUARE_FIELDS[square] for square in self.path[move, :self.length[move]]]
+
+
+def _list_simple_moves(boards, codes):
+    men_game, men_square = np.nonzero(boards == OWN_MAN)
+    targets = RAYS[men_square][:, FORWARD, 0]
+    man, direction = np.nonzero(codes[men_game[:, None], targets] == EMPTY)
+    men_path = np.stack([men_square[man], targets[man, direction]], axis=1)
+
+    kings_game, kings_square = np.nonzero(boards == OWN_KING)
+    rays = RAYS[kings_square]
+    empty_run = np.logical_and.accumulate(codes[kings_game[:, None, None], rays] == EMPTY, axis=2)
+    king, direction, dist = np.nonzero(empty_run)
+    kings_path = np.stack([kings_square[king], rays[king, direction, dist]], axis=1)
+
+    return np.concatenate([men_game[man], kings_game[king]]), np.concatenate([men_path, kings_path])
+
+
+def _list_captures(boards, codes):
+    """ Extends capture sequences of all pieces together, one capture per iteration
+
+    returns: games, paths, numbers of captures and captured masks of all finished sequences
+    """
+    # men can start capturing only next to enemy pieces, kings are few so all of them are checked
+    neighbours = codes[:, RAYS[:, :, :2]]
+    enemy_next = (neighbours[..., 0] == ENEMY_MAN) | (neighbours[..., 0] == ENEMY_KING)
+    men_capturing = (boards == OWN_MAN) & np.any(enemy_next & (neighbours[..., 1] == EMPTY), axis=2)
+    game, start = np.nonzero(men_capturing | (boards == OWN_KING))
+    is_king = boards[game, start] == OWN_KING
+    path = start[:, None]
+    captured = np.zeros((len(game), SQUARES_NUMBER + 1), bool)
+    dists = np.arange(BOARD_SIZE)
+
+    finished = []
+    captures = 0
+    while len(game) > 0:
+        positions = np.arange(len(game))
+        occupied = codes[game]
+        occupied[positions, start] = EMPTY  # moved piece does not block itself
+        rays = RAYS[path[:, -1]]
+        ray_codes = occupied[positions[:, None, None], rays]
+        ray_captured = captured[positions[:, None, None], rays]
+
+        # first piece along the ray must be enemy's not captured yet, landing squares are empty ones behind it
+        non_empty = ray_codes != EMPTY
+        first = np.argmax(non_empty, axis=2)
+        first_code = np.take_along_axis(ray_codes, first[..., None], axis=2)[..., 0]
+        first_captured = np.take_along_axis(ray_captured, first[..., None], axis=2)[..., 0]
+        capturable = ((first_code == ENEMY_MAN) | (first_code == ENEMY_KING)) & ~first_captured
+
+        behind = dists > first[..., None]
+        second = np.argmax(behind & non_empty, axis=2)
+        landing = capturable[..., None] & behind & (dists < second[..., None])
+        landing &= is_king[:, None, None] | ((first == 0)[..., None] & (dists == 1))
+
+        parent, direction, dist = np.nonzero(landing)
+        if captures > 0:
+            ended = np.ones(len(game), bool)
+            ended[parent] = False
+            finished.append((game[ended], path[ended], captured[ended, :SQUARES_NUMBER]))
+
+        victims = rays[parent, direction, first[parent, direction]]
+        game = game[parent]
+        start = start[parent]
+        is_king = is_king[parent]
+        captured = captured[parent]
+        captured[np.arange(len(parent)), victims] = True
+        path = np.concatenate([path[parent], rays[parent, direction, dist][:, None]], axis=1)
+        captures += 1
+
+    if not finished:
+        empty = np.zeros(0, np.int64)
+        return empty, np.zeros((0, 1), np.int64), empty, np.zeros((0, SQUARES_NUMBER), bool)
+
+    games = np.concatenate([f[0] for f in finished])
+    paths = np.concatenate([np.pad(f[1], ((0, 0), (0, captures - f[1].shape[1])), constant_values=-1)
+                            for f in finished])
+    numbers = np.concatenate([np.full(len(f[0]), f[1].shape[1] - 1) for f in finished])
+    captured = np.concatenate([f[2] for f in finished])
+    return games, paths, numbers, captured
+
+
+def _generation_order(game, path, length):
+    """ returns: order of moves by game and within a game as in DraughtsLogic.generate_moves - by the field
+    of the piece (column first), then by direction (left before right, backward before forward) and distance
+    of every part of the move, in turn (all moves of a game have the same length)
+    """
+    valid = np.arange(path.shape[1]) < length[:, None]
+    cols = np.where(valid, SQUARE_COLS[path], 0)
+    rows = np.where(valid, SQUARE_ROWS[path], 0)
+    dir_cols = np.diff(cols, axis=1)
+    dir_rows = np.diff(rows, axis=1)
+    parts = np.where(valid[:, 1:], ((dir_cols > 0) * 2 + (dir_rows > 0)) * BOARD_SIZE + np.abs(dir_cols), -1)
+
+    # the last key is the primary one
+    return np.lexsort([parts[:, i] for i in reversed(range(parts.shape[1]))] + [rows[:, 0], cols[:, 0], game])
+
+
+def list_moves(boards):
+    """ Lists moves of all boards like DraughtsLogic - if there are captures, only the longest ones
+
+    args:
+        boards - int8 array of shape (games, 50)
+
+    returns: Moves
+    """
+    games_number = len(boards)
+    codes = np.concatenate([boards, np.full((games_number, 1), OFF_BOARD, np.int8)], axis=1)
+
+    capture_game, capture_path, capture_numbers, capture_captured = _list_captures(boards, codes)
+    longest = np.zeros(games_number, np.int64)
+    np.maximum.at(longest, capture_game, capture_numbers)
+    longest_captures = capture_numbers == longest[capture_game]
+
+    simple_game, simple_path = _list_simple_moves(boards, codes)
+    without_captures = longest[simple_game] == 0
+
+    width = max(capture_path.shape[1], 2)
+    game = np.concatenate([capture_game[longest_captures], simple_game[without_captures]])
+    path = np.concatenate([
+        np.pad(capture_path[longest_captures], ((0, 0), (0, width - capture_path.shape[1])), constant_values=-1),
+        np.pad(simple_path[without_captures], ((0, 0), (0, width - 2)), constant_values=-1)])
+    length = np.concatenate([capture_numbers[longest_captures] + 1, np.full(np.count_nonzero(without_captures), 2)])
+    captured = np.concatenate([
+        capture_captured[longest_captures], np.zeros((np.count_nonzero(without_captures), SQUARES_NUMBER), bool)])
+
+    order = _generation_order(game, path, length)
+    return Moves(game[order], path[order], length[order], captured[order], games_number)
+
+
+def apply_moves(boards, from_, to, captured):
+    """ Applies one move to each board
+
+    args:
+        from_, to - start and end squares of moved pieces
+        captured - boolean mask of captured squares, of shape (boards, 50)
+
+    returns: boards after the moves, seen from the other side, and moved pieces
+    """
+    boards = boards.copy()
+    rows = np.arange(len(boards))
+    pieces = boards[rows, from_]
+    boards[rows, from_] = EMPTY
+    boards[captured] = EMPTY
+    boards[rows, to] = np.where((pieces == OWN_MAN) & (to >= LAST_ROW_SQUARES), OWN_KING, pieces)
+    return FLIP_CODES[boards[:, ::-1]], pieces
+
+
+def board_from_view(view):
+    """ returns: board of a DraughtsView, as seen from its side to move
+    """
+    board = np.zeros(SQUARES_NUMBER, np.int8)
+    for square, (col, row) in enumerate(SQUARE_FIELDS):
+        field = view.fields[col][row]
+        if field.player is not None:
+            board[square] = (OWN_MAN if field.player == view.pov else ENEMY_MAN) + (1 if field.is_king else 0)
+    return board
+
+
+class DraughtsBatch:
+    """ Many draughts games played at once
+
+    Fields:
+        boards - int8 array of shape (games, 50), each board seen from its side to move
+        white_to_move - if white is the side to move
+        plies - number of plies played in each game
+        is_terminal - if a game is finished, finished games are not changed by steps until they are reset
+        winner - 1 if white won, -1 if black won, 0 for draws and not finished games
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.boards = np.zeros((size, SQUARES_NUMBER), np.int8)
+        self.white_to_move = np.ones(size, bool)
+        self.plies = np.zeros(size, np.int64)
+        self.is_terminal = np.zeros(size, bool)
+        self.winner = np.zeros(size, np.int8)
+
+        # hashes of positions since the last capture or move of a man - earlier positions cannot repeat
+        self._history = np.zeros((size, HISTORY_SIZE), np.uint64)
+        self._history_length = np.zeros(size, np.int64)
+        self._moves = None
+
+        self.reset()
+
+    def reset(self, games=None):
+        """ Starts new games in place of given ones (a boolean mask or indices), all games by default
+        """
+        if games is None:
+            games = np.ones(self.size, bool)
+
+        self.boards[games] = EMPTY
+        self.boards[games, :SQUARES_NUMBER // 2 - BOARD_SIZE // 2] = OWN_MAN
+        self.boards[games, SQUARES_NUMBER // 2 + BOARD_SIZE // 2:] = ENEMY_MAN
+        self.white_to_move[games] = True
+        self.plies[games] = 0
+        self.is_terminal[games] = False
+        self.winner[games] = 0
+        self._history_length[games] = 0
+        self._moves = None
+
+    def set_positions(self, boards, white_to_move):
+        """ Continues all games from given positions (which must not be finished), with no history of repetitions
+        """
+        self.boards[:] = boards
+        self.white_to_move[:] = white_to_move
+        self.plies[:] = 0
+        self.is_terminal[:] = False
+        self.winner[:] = 0
+        self._history_length[:] = 0
+        self._moves = None
+
+    @property
+    def moves(self):
+        if self._moves is None:
+            self._moves = list_moves(self.boards)
+        return self._moves
+
+    def legal_mask(self):
+        """ returns: boolean array of shape (games, 50, 50), true for (from square, to square) of legal moves;
+        different captures with the same start and end are not distinguished
+        """
+        moves = self.moves
+        mask = np.zeros((self.size, SQUARES_NUMBER, SQUARES_NUMBER), bool)
+        active = ~self.is_terminal[moves.game]
+        mask[moves.game[active], moves.from_[active], moves.to[active]] = True
+        return mask
+
+    def step(self, choices):
+        """ Applies moves in all not finished games
+
+        args:
+            choices - for every game index of the move in its list (see Moves), ignored for finished games
+        """
+        moves = self.moves
+        choices = np.asarray(choices)
+        games = np.nonzero(~self.is_terminal)[0]
+        if np.any((choices[games] < 0) | (choices[games] >= moves.counts[games])):
+            raise ValueError("Move index out of range")
+
+        selected = moves.offsets[games] + choices[games]
+        from_ = moves.from_[selected]
+        to = moves.to[selected]
+        captured = moves.captured[selected]
+
+        self.boards[games], pieces = apply_moves(self.boards[games], from_, to, captured)
+
+        self.white_to_move[games] = ~self.white_to_move[games]
+        self.plies[games] += 1
+        self._moves = None
+
+        irreversible = (pieces == OWN_MAN) | captured.any(axis=1)
+        self._history_length[games[irreversible]] = 0
+        self._update_terminal(games)
+
+    def random_step(self, generator=np.random):
+        """ Applies random moves in all not finished games
+        """
+        self.step((generator.random(self.size) * self.moves.counts).astype(np.int64))
+
+    def _update_terminal(self, games):
+        boards = self.boards[games]
+        mover_wins = self.moves.counts[games] == 0
+        self.is_terminal[games[mover_wins]] = True
+        self.winner[games[mover_wins]] = np.where(self.white_to_move[games[mover_wins]], -1, 1)
+
+        kings_only = (np.count_nonzero(boards == OWN_KING, axis=1) == 1) & \
+                     (np.count_nonzero(boards == OWN_MAN, axis=1) == 0) & \
+                     (np.count_nonzero(boards == ENEMY_KING, axis=1) == 1) & \
+                     (np.count_nonzero(boards == ENEMY_MAN, axis=1) == 0)
+        self.is_terminal[games[kings_only & ~mover_wins]] = True
+
+        games = games[~kings_only & ~mover_wins]
+        hashes = self._hashes(games)
+        lengths = self._history_length[games]
+        if lengths.max(initial=0) >= self._history.shape[1]:
+            self._history = np.pad(self._history, ((0, 0), (0, self._history.shape[1])))
+
+        history = self._history[games]
+        repeated = (history == hashes[:, None]) & (np.arange(history.shape[1]) < lengths[:, None])
+        self.is_terminal[games[np.count_nonzero(repeated, axis=1) >= 2]] = True
+        self._history[games, lengths] = hashes
+        self._history_length[games] += 1
+
+    def _hashes(self, games):
+        boards = self.boards[games]
+        # positions are compared as seen by white, so that they do not depend on the side to move
+        boards = np.where(self.white_to_move[games][:, None], boards, boards[:, ::-1])
+        hashes = np.bitwise_xor.reduce(ZOBRIST[np.arange(SQUARES_NUMBER), boards], axis=1)
+        return np.where(self.white_to_move[games], hashes, hashes ^ ZOBRIST_BLACK_TO_MOVE)
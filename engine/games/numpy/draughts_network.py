@@ -0,0 +1,130 @@
+""" Inference of the DraughtsCNNPlayer network in NumPy, from weights stored in reduced precision
+
+Weights are given as returned by DraughtsCNNPlayer.get_weights - kernel and bias of every Conv2D layer,
+followed by kernel and bias of the Dense layer. Kernels are stored in one of precisions:
+    float32 - unchanged
+    float16 - half precision
+    int8 - 8 bit integers with float32 scale of every output channel (symmetric, max abs value mapped to 127)
+Biases are always float32. Computation is done in float32 - kernels are converted on the first evaluation and kept
+until release is called, so a network in use holds its stored kernels and their float32 copy (more than float32
+weights alone). Reduced precision only shrinks saved weights and networks that are not in use, e.g. idle players
+of QuantizedDraughtsCNNPlayerPool.
+"""
+import numpy as np
+
+PRECISIONS = ("float32", "float16", "int8")
+LEAKY_RELU_ALPHA = 0.2  # default of tf.nn.leaky_relu
+
+
+class _Layer:
+    def __init__(self, kernel, bias, precision):
+        kernel = np.asarray(kernel, np.float32)
+        self.bias = np.asarray(bias, np.float32)
+        self.scale = None
+        # float32 kernel used in computation, converted when needed
+        self._float_kernel = None
+
+        if precision == "int8":
+            # kernel's last axis is the output channel
+            max_abs = np.abs(kernel.reshape(-1, kernel.shape[-1])).max(axis=0)
+            self.scale = np.where(max_abs > 0, max_abs / 127., 1.).astype(np.float32)
+            self.kernel = np.round(kernel / self.scale).astype(np.int8)
+        else:
+            self.kernel = kernel.astype(precision)
+
+    def float_kernel(self):
+        if self._float_kernel is None:
+            kernel = self.kernel.astype(np.float32, copy=False)
+            self._float_kernel = kernel if self.scale is None else kernel * self.scale
+        return self._float_kernel
+
+    def release(self):
+        self._float_kernel = None
+
+    @property
+    def nbytes(self):
+        return self.kernel.nbytes + self.bias.nbytes + (0 if self.scale is None else self.scale.nbytes)
+
+    @property
+    def converted_nbytes(self):
+        return 0 if self._float_kernel is None or self._float_kernel is self.kernel else self._float_kernel.nbytes
+
+
+class DraughtsNetwork:
+    """ Network of DraughtsCNNPlayer - convolutions with "same" padding and leaky ReLU, 2x2 max pooling
+    and a dense layer applied to the board and the rotated board, whose outputs are summed
+    """
+
+    def __init__(self, weights, precision="int8"):
+        if precision not in PRECISIONS:
+            raise ValueError("Unknown precision: {}".format(precision))
+
+        self.precision = precision
+        self.convolutions = [_Layer(weights[i], weights[i + 1], precision) for i in range(0, len(weights) - 2, 2)]
+        self.dense = _Layer(weights[-2], weights[-1], precision)
+
+    @property
+    def nbytes(self):
+        """ returns: memory taken by stored weights, without float32 kernels converted for evaluation
+        """
+        return sum(layer.nbytes for layer in self.convolutions) + self.dense.nbytes
+
+    @property
+    def nbytes_in_use(self):
+        """ returns: memory taken by stored weights and float32 kernels currently converted from them
+        """
+        return self.nbytes + sum(layer.converted_nbytes for layer in self.convolutions + [self.dense])
+
+    def release(self):
+        """ Drops float32 kernels converted for evaluation (e.g. of a player that will be idle),
+        they are converted again by the next evaluation
+        """
+        for layer in self.convolutions + [self.dense]:
+            layer.release()
+
+    def evaluate(self, encoded):
+        """ args:
+            encoded - float32 array of boards and rotated boards, one after another, as returned
+                      by encode_position_keys
+
+        returns: float32 array of estimations of positions
+        """
+        out = np.asarray(encoded, np.float32)
+        for layer in self.convolutions:
+            out = _convolve(out, layer)
+
+        # 2x2 max pooling, with odd last row and column dropped like by "valid" padding
+        batch, height, width, channels = out.shape
+        out = out[:, :height // 2 * 2, :width // 2 * 2]
+        out = out.reshape(batch, height // 2, 2, width // 2, 2, channels).max(axis=(2, 4))
+
+        out = out.reshape(batch, -1) @ self.dense.float_kernel() + self.dense.bias
+        return out.reshape(-1, 2).sum(axis=1)
+
+
+def _convolve(x, layer):
+    kernel = layer.float_kernel()
+    kernel_height, kernel_width = kernel.shape[:2]
+
+    # "same" padding, with the extra row and column of even kernels after the input, as in tensorflow
+    top = (kernel_height - 1) // 2
+    left = (kernel_width - 1) // 2
+    x = np.pad(x, ((0, 0), (top, kernel_height - 1 - top), (left, kernel_width - 1 - left), (0, 0)))
+
+    # patches of all fields, with values ordered like kernel's (row of the kernel, column, input channel)
+    height, width = x.shape[1] - kernel_height + 1, x.shape[2] - kernel_width + 1
+    patches = np.concatenate([x[:, i:i + height, j:j + width]
+                              for i in range(kernel_height) for j in range(kernel_width)], axis=3)
+    out = patches @ kernel.reshape(-1, kernel.shape[-1]) + layer.bias
+    return np.where(out > 0, out, LEAKY_RELU_ALPHA * out)
+
+
+def save_weights(path, weights):
+    """ Saves weights (as returned by DraughtsCNNPlayer.get_weights) to a .npz file
+    """
+    np.savez(path, *[np.asarray(value, np.float32) for value in weights])
+
+
+def load_weights(path):
+    with np.load(path) as data:
+        return [data["arr_{}".format(i)] for i in range(len(data.files))]
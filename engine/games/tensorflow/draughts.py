@@ -1,16 +1,144 @@
-import tensorflow as tf
+import glob
+import math
+import random
+from collections import OrderedDict
 
+import numpy as np
+
+import engine.metrics
+from engine.algorithms.mcts_player import MonteCarloTreeSearch
+from engine.algorithms.minmax_player import MinMaxPlayer
+from engine.algorithms.opening_book import open_book
 from engine.algorithms.tensorflow.one_plus_one_pool import OnePlusOnePlayerPool
 from engine.algorithms.tensorflow.evolution_mutation import EvolutionWithMutationPlayerPool
+from engine.games import draughts
 from engine.games.draughts import BOARD_SIZE, LOGIC_INSTANCE
-from engine.player import ParametrizedPlayer
+from engine.player import Player, ParametrizedPlayer
+from engine.player_pool import PlayerPool
+
+POSITION_CACHE_SIZE = 50000
+
+# is_me, is_enemy, is_king for codes of position_key
+_KEY_ENCODING = np.array([[0, 0, 0], [1, 0, 0], [1, 0, 1], [0, 1, 0], [0, 1, 1]], np.float32)
+_DARK_FIELDS = np.array([[[1. if (col + row) % 2 == 0 else 0.] for row in range(BOARD_SIZE)]
+                         for col in range(BOARD_SIZE)], np.float32)
+
+
+class PositionCache:
+    """ Bounded LRU cache of position evaluations, valid for single version of player's weights
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def set_version(self, version):
+        if version != self.version:
+            self._entries.clear()
+            self.version = version
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return value
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def put(self, key, value):
+        self._entries[key] = value
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+
+def encode_view(view, player):
+    """ Encodes fields as 4 boolean values: is_dark, is_me, is_enemy, is_king
+
+    returns: board seen by given player and the board rotated, seen by the other player
+    """
+    base = [[[
+        1. if view[(col, row)].is_dark else 0.,
+        1. if view[(col, row)].player == player else 0.,
+        1. if view[(col, row)].player not in (None, player) else 0.,
+        1. if view[(col, row)].is_king else 0.,
+    ] for row in range(BOARD_SIZE)] for col in range(BOARD_SIZE)]
+    rotated = [[[
+        1. if view[(col, row)].is_dark else 0.,
+        1. if view[(col, row)].player not in (None, player) else 0.,
+        1. if view[(col, row)].player == player else 0.,
+        1. if view[(col, row)].is_king else 0.,
+    ] for row in reversed(range(BOARD_SIZE))] for col in reversed(range(BOARD_SIZE))]
+    return base, rotated
+
+
+def position_key(view, player):
+    """ returns: everything the network sees, except for is_dark which is the same for every position -
+    bytes with code of each field, column by column: 0 empty, 1 player's man, 2 player's king, 3 enemy's man,
+    4 enemy's king
+
+    Views are oriented for the side to move, the board is always oriented as after player's move (as the network
+    learns and selects moves) - views in which the player is to move, e.g. leaves at even depths of a search,
+    are rotated.
+    """
+    columns = view.fields if view.pov != player else [column[::-1] for column in reversed(view.fields)]
+    return bytes(
+        0 if field.player is None else (1 if field.player == player else 3) + (1 if field.is_king else 0)
+        for column in columns for field in column)
+
+
+def encode_position_keys(keys):
+    """ Encodes many positions at once, given by position_key, the same way as encode_view
+
+    returns: float32 array with board and rotated board of each position, one after another
+    """
+    codes = np.frombuffer(b"".join(keys), np.uint8).reshape(-1, BOARD_SIZE, BOARD_SIZE)
+    base = np.concatenate([np.broadcast_to(_DARK_FIELDS, codes.shape + (1, )), _KEY_ENCODING[codes]], axis=3)
+    rotated = base[:, ::-1, ::-1][..., [0, 2, 1, 3]]
+    return np.stack([base, rotated], axis=1).reshape(-1, BOARD_SIZE, BOARD_SIZE, 4)
+
+
+def _select_move(player, view, viewpoint_player):
+    """ returns: move leading to the position with the highest estimation by player's estimate_views
+    """
+    moves = LOGIC_INSTANCE.list_moves(view)
+
+    if len(moves) == 0:
+        return None
+
+    future_boards = LOGIC_INSTANCE.apply_moves([view] * len(moves), moves)
+    estimated = player.estimate_views(future_boards, viewpoint_player)
+
+    return max(zip(moves, estimated), key=lambda move_est: move_est[1])[0]
 
 
 class DraughtsCNNPlayer(ParametrizedPlayer):
-    def __init__(self):
+    def __init__(self, cache_size=POSITION_CACHE_SIZE, opening_book=None, search_depth=1):
+        """
+        args:
+            search_depth - depth of MinMax search with leaves evaluated by the network, all leaves of a move
+                           in one batch - 1 means that only positions after the next move are evaluated
+        """
+        import tensorflow as tf
+
         super(DraughtsCNNPlayer, self).__init__()
 
-        # fields are encoded as 4 boolean values: is_dark, is_me, is_enemy, is_king
+        self.opening_book = open_book(opening_book)
+        self.search = MinMaxPlayer(LOGIC_INSTANCE, search_depth, evaluator=self, viewpoint_player=self,
+                                   terminal_value=draughts.terminal_value)
+
+        self.position_cache = PositionCache(cache_size)
+        self._batches_metric = engine.metrics.counter("inference_batches_total", "Network evaluation batches")
+        self._positions_metric = engine.metrics.counter("inference_positions_total", "Positions evaluated by networks")
+
+        # fields are encoded by encode_view
         self.board_input = tf.placeholder(tf.float32, [None, BOARD_SIZE, BOARD_SIZE, 4])
         self.layers = [
             tf.layers.Conv2D(6, 2, padding="same", activation=tf.nn.leaky_relu),
@@ -34,53 +162,280 @@ class DraughtsCNNPlayer(ParametrizedPlayer):
         self.output = out
 
     def _encode_view(self, view):
-        base = [[[
-            1. if view[(col, row)].is_dark else 0.,
-            1. if view[(col, row)].player == self else 0.,
-            1. if view[(col, row)].player not in (None, self) else 0.,
-            1. if view[(col, row)].is_king else 0.,
-        ] for row in range(BOARD_SIZE)] for col in range(BOARD_SIZE)]
-        rotated = [[[
-            1. if view[(col, row)].is_dark else 0.,
-            1. if view[(col, row)].player not in (None, self) else 0.,
-            1. if view[(col, row)].player == self else 0.,
-            1. if view[(col, row)].is_king else 0.,
-        ] for row in reversed(range(BOARD_SIZE))] for col in reversed(range(BOARD_SIZE))]
-        return base, rotated
+        return encode_view(view, self)
+
+    def _position_key(self, view):
+        return position_key(view, self)
 
     def get_variable_list(self):
         variable_list = [variable for layer in self.layers for variable in layer.trainable_variables]
         return variable_list
 
     def get_next_move(self):
-        moves = LOGIC_INSTANCE.list_moves(self.view)
+        if len(LOGIC_INSTANCE.list_moves(self.view)) == 0:
+            return None
+
+        if self.opening_book is not None:
+            move = self.opening_book.probe(LOGIC_INSTANCE, self.view)
+            if move is not None:
+                return move
+
+        if self.search.depth > 1:
+            self.search.set_current_view(self.view)
+            return self.search.get_next_move()
+
+        return _select_move(self, self.view, self)
+
+    def estimate_views(self, views, viewpoint_player):
+        """ Estimates views with the network in one batch (apart from positions found in the cache)
+
+        returns: list of estimations, from the point of view of given player
+        """
+        self.position_cache.set_version(self.weights_version)
+
+        keys = [position_key(view, viewpoint_player) for view in views]
+        estimated = [self.position_cache.get(key) for key in keys]
+
+        missed = [i for i, value in enumerate(estimated) if value is None]
+        if missed:
+            # [enc, enc_rev, enc, enc_rev...]
+            encoded = encode_position_keys([keys[i] for i in missed])
+            self._batches_metric.inc()
+            self._positions_metric.inc(len(missed))
+            for i, value in zip(missed, self.session.run(self.output, {self.board_input: encoded})):
+                estimated[i] = value
+                self.position_cache.put(keys[i], value)
+
+        return estimated
+
+    def evaluate_views(self, views, viewpoint_player):
+        """ Evaluator interface of MonteCarloTreeSearch and MinMaxPlayer - estimations squashed to [-1, 1]
+        """
+        return [math.tanh(value) for value in self.estimate_views(views, viewpoint_player)]
+
+
+class DraughtsCNNMCTSPlayer(DraughtsCNNPlayer):
+    """ Selects moves with Monte Carlo Tree Search, with leaves evaluated in batches by player's network
+    """
+
+    def __init__(self, playouts=100, time_budget=None, batch_size=16, exploration=1.4,
+                 cache_size=POSITION_CACHE_SIZE, opening_book=None):
+        super(DraughtsCNNMCTSPlayer, self).__init__(cache_size, opening_book)
+
+        self.search = MonteCarloTreeSearch(LOGIC_INSTANCE, self, playouts, time_budget, batch_size, exploration,
+                                           terminal_value=draughts.terminal_value)
+
+    def prepare_new_game(self):
+        self.search.reset()
+
+    def get_next_move(self):
+        if self.opening_book is not None:
+            move = self.opening_book.probe(LOGIC_INSTANCE, self.view)
+            if move is not None:
+                return move
+
+        return self.search.search(self.view, self)
+
+
+class QuantizedDraughtsCNNPlayer(Player):
+    """ Plays like DraughtsCNNPlayer with given weights, which are stored in reduced precision
+    and evaluated in NumPy (see engine.games.numpy.draughts_network), without tensorflow
+    """
 
-        if len(moves) == 0:
+    def __init__(self, weights, precision="int8", cache_size=POSITION_CACHE_SIZE, opening_book=None,
+                 search_depth=1):
+        """
+        args:
+            weights - weights as returned by DraughtsCNNPlayer.get_weights, or path to them saved by
+                      engine.games.numpy.draughts_network.save_weights
+            precision - float32, float16 or int8
+            search_depth - depth of MinMax search with leaves evaluated by the network, as of DraughtsCNNPlayer
+        """
+        from engine.games.numpy.draughts_network import DraughtsNetwork, load_weights
+
+        super(QuantizedDraughtsCNNPlayer, self).__init__()
+
+        if isinstance(weights, str):
+            weights = load_weights(weights)
+        self.network = DraughtsNetwork(weights, precision)
+        self.opening_book = open_book(opening_book)
+        self.search = MinMaxPlayer(LOGIC_INSTANCE, search_depth, evaluator=self, viewpoint_player=self,
+                                   terminal_value=draughts.terminal_value)
+
+        self.position_cache = PositionCache(cache_size)
+        self._batches_metric = engine.metrics.counter("inference_batches_total", "Network evaluation batches")
+        self._positions_metric = engine.metrics.counter("inference_positions_total", "Positions evaluated by networks")
+
+    def get_next_move(self):
+        if len(LOGIC_INSTANCE.list_moves(self.view)) == 0:
             return None
 
-        future_boards = [LOGIC_INSTANCE.apply_move(self.view, move) for move in moves]
-        encoded = [enc for view in future_boards for enc in self._encode_view(view)]  # [enc, enc_rev, enc, enc_rev...]
+        if self.opening_book is not None:
+            move = self.opening_book.probe(LOGIC_INSTANCE, self.view)
+            if move is not None:
+                return move
+
+        if self.search.depth > 1:
+            self.search.set_current_view(self.view)
+            return self.search.get_next_move()
+
+        return _select_move(self, self.view, self)
+
+    def estimate_views(self, views, viewpoint_player):
+        """ Estimates views with the network in one batch (apart from positions found in the cache)
+
+        returns: list of estimations, from the point of view of given player
+        """
+        keys = [position_key(view, viewpoint_player) for view in views]
+        estimated = [self.position_cache.get(key) for key in keys]
+
+        missed = [i for i, value in enumerate(estimated) if value is None]
+        if missed:
+            self._batches_metric.inc()
+            self._positions_metric.inc(len(missed))
+            for i, value in zip(missed, self.network.evaluate(encode_position_keys([keys[i] for i in missed]))):
+                estimated[i] = value
+                self.position_cache.put(keys[i], value)
+
+        return estimated
+
+    def evaluate_views(self, views, viewpoint_player):
+        return [math.tanh(value) for value in self.estimate_views(views, viewpoint_player)]
+
+
+def quantize_player(player, precision="int8"):
+    """ returns: QuantizedDraughtsCNNPlayer with current weights of DraughtsCNNPlayer
+    """
+    return QuantizedDraughtsCNNPlayer(player.get_weights(), precision, player.position_cache.size,
+                                      player.opening_book, player.search.depth)
+
 
-        estimated = self.session.run(self.output, {self.board_input: encoded})
+class QuantizedDraughtsCNNPlayerPool(PlayerPool):
+    """ QuantizedDraughtsCNNPlayer players with saved weights (e.g. snapshots of trained players), which play
+    one game each in turn - only the player of the current game keeps float32 kernels converted for evaluation,
+    idle players hold just their weights in reduced precision
+    """
 
-        return max(zip(moves, estimated), key=lambda move_est: move_est[1])[0]
+    def __init__(self, weights, precision="int8", cache_size=POSITION_CACHE_SIZE, opening_book=None,
+                 search_depth=1):
+        """
+        args:
+            weights - paths of weights saved by engine.games.numpy.draughts_network.save_weights,
+                      or a glob pattern matching them
+            precision, cache_size, opening_book, search_depth - as of QuantizedDraughtsCNNPlayer
+        """
+        super(QuantizedDraughtsCNNPlayerPool, self).__init__()
+
+        paths = sorted(glob.glob(weights)) if isinstance(weights, str) else list(weights)
+        if not paths:
+            raise ValueError("No weights found: {}".format(weights))
+
+        self._players = [QuantizedDraughtsCNNPlayer(path, precision, cache_size, opening_book, search_depth)
+                         for path in paths]
+        self._next = 0
+        self._current = None
+
+    def max_count(self):
+        return 1
+
+    def get_player(self):
+        if self._current is not None:
+            self._current.network.release()
+
+        self._current = self._players[self._next]
+        self._next = (self._next + 1) % len(self._players)
+        return self._current
+
+    def get_players(self):
+        return list(self._players)
+
+
+def position_suite(count, seed=0, max_plies=80):
+    """ returns: views of count positions from random games, seen by the side to move
+    """
+    generator = random.Random(seed)
+    views = []
+    while len(views) < count:
+        view = draughts.DraughtsView()
+        view.begin("white", "black")
+        for _ in range(generator.randrange(max_plies)):
+            if view.is_terminal:
+                break
+            view = LOGIC_INSTANCE.apply_move(view, generator.choice(LOGIC_INSTANCE.list_moves(view)))
+        if not view.is_terminal:
+            views.append(view)
+    return views
+
+
+def move_agreement(reference, candidate, views):
+    """ Compares moves chosen by two players (with estimate_views method, like DraughtsCNNPlayer
+    and QuantizedDraughtsCNNPlayer) in the positions, for the side to move
+
+    returns: fraction of positions in which the players choose the same move
+    """
+    same = sum(_select_move(reference, view, view.pov) == _select_move(candidate, view, view.pov) for view in views)
+    return same / len(views)
+
+
+def _set_players_options(pool, opening_book, search_depth):
+    opening_book = open_book(opening_book)
+    for player in pool.get_players():
+        player.opening_book = opening_book
+        player.search.depth = search_depth
 
 
 class DraughtsEvolutionWithMutationPool(EvolutionWithMutationPlayerPool):
     def __init__(self, session,
                  stddev,
                  pool_size,
-                 tournament_size):
+                 tournament_size,
+                 opening_book=None,
+                 search_depth=1):
         super(DraughtsEvolutionWithMutationPool, self).__init__(session,
                                                                 DraughtsCNNPlayer,
                                                                 stddev, pool_size, tournament_size,
                                                                 True)
+        _set_players_options(self, opening_book, search_depth)
 
 
 class DraughtsCNNOnePlusOnePool(OnePlusOnePlayerPool):
     def __init__(self, session,
                  sigma_proportion=1.2,
                  sigma_scaling_interval=10,
-                 win_proportion=0.2):
+                 win_proportion=0.2,
+                 opening_book=None,
+                 search_depth=1):
         super(DraughtsCNNOnePlusOnePool, self).__init__(session, DraughtsCNNPlayer,
                                                         sigma_proportion, sigma_scaling_interval, win_proportion)
+        _set_players_options(self, opening_book, search_depth)
+
+
+def _print_position_cache_stats(results_by_players, results_by_pools):
+    """ Prints position cache hits of the run and resets them for the next one
+    """
+    caches = [(str(player), [player.position_cache])
+              for player in results_by_players.keys() if isinstance(player, DraughtsCNNPlayer)]
+    caches += [(str(pool), [player.position_cache
+                            for player in pool.get_players() if isinstance(player, DraughtsCNNPlayer)])
+               for pool in results_by_pools.keys()]
+
+    for obj, obj_caches in caches:
+        if not obj_caches:
+            continue
+        hits = sum(cache.hits for cache in obj_caches)
+        lookups = hits + sum(cache.misses for cache in obj_caches)
+        print("{} position cache hits: {}/{} ({:.1%})".format(obj, hits, lookups, hits / lookups if lookups else 0.))
+
+    # counted anew in every run - after all printing, as a player may be listed both alone and in its pool
+    for _, obj_caches in caches:
+        for cache in obj_caches:
+            cache.reset_stats()
+
+
+def on_test_run_finished(results_by_players, results_by_pools):
+    draughts.on_test_run_finished(results_by_players, results_by_pools)
+    _print_position_cache_stats(results_by_players, results_by_pools)
+
+
+def on_train_run_finished(results_by_players, results_by_pools):
+    _print_position_cache_stats(results_by_players, results_by_pools)
@@ -0,0 +1,166 @@
+""" Dataset of draughts positions from played games, for training value networks
+
+Positions are recorded by event handlers (record_step and record_game, see README) and written to shards -
+files with a header followed by fixed-size records:
+    position - board encoded by encode_view as seen by the side to move, 10x10x4 uint8
+    side - side to move, 0 for white and 1 for black
+    result - final result of the game for the side to move: 1 won, 0 draw, -1 lost
+Records of a game, starting with its initial position, are written when it is finished. Shards are memory-mapped by read_batches,
+so the dataset is never loaded as a whole.
+"""
+import glob
+import os
+import struct
+
+import numpy as np
+
+from engine.games.draughts import BOARD_SIZE, DraughtsView
+from engine.games.tensorflow.draughts import encode_view
+
+MAGIC = b"AIDS"
+VERSION = 1
+HEADER = struct.Struct("<4sHHI")  # magic, version, reserved, record size
+RECORD_DTYPE = np.dtype([("position", np.uint8, (BOARD_SIZE, BOARD_SIZE, 4)), ("side", np.int8), ("result", np.int8)])
+SHARD_SIZE = 100000
+SHARD_NAME = "positions-{:05d}.bin"
+
+_open_writers = {}
+
+
+class DatasetWriter:
+    """ Writes records to shards in a directory, starting a new shard after every shard_size records;
+    shards already in the directory are kept
+    """
+
+    def __init__(self, directory, shard_size=SHARD_SIZE):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.shard_size = shard_size
+        self.records = 0
+
+        self._shard = len(_shard_paths(directory))
+        self._file = None
+        self._shard_records = 0
+        # positions of games being played, by game instance (games may be played at the same time)
+        self._games = {}
+
+    def add_position(self, game):
+        """ Remembers position of the side to move in a not finished game - with the first position of a game,
+        also its initial one, as step events come only after moves
+        """
+        positions = self._games.get(game)
+        if positions is None:
+            view = game.get_player_view(game.get_players()[0])
+            initial = DraughtsView()
+            initial.begin(view.white, view.black)
+            positions = self._games[game] = [_position(initial, view.white)]
+
+        if not game.is_game_over():
+            player = game.get_current_players()[0]
+            positions.append(_position(game.get_player_view(player), player))
+
+    def finish_game(self, game):
+        """ Writes remembered positions of the finished game, with its results
+        """
+        positions = self._games.pop(game, [])
+        records = np.zeros(len(positions), RECORD_DTYPE)
+        for i, (position, side, player) in enumerate(positions):
+            records[i] = position, side, np.sign(game.get_game_result(player)[0])
+
+        while len(records) > 0:
+            if self._file is None or self._shard_records >= self.shard_size:
+                self._open_shard()
+            count = min(len(records), self.shard_size - self._shard_records)
+            self._file.write(records[:count].tobytes())
+            self._shard_records += count
+            self.records += count
+            records = records[count:]
+
+        if self._file is not None:
+            self._file.flush()
+
+    def _open_shard(self):
+        self.close()
+        self._file = open(os.path.join(self.directory, SHARD_NAME.format(self._shard)), "wb")
+        self._file.write(HEADER.pack(MAGIC, VERSION, 0, RECORD_DTYPE.itemsize))
+        self._shard += 1
+        self._shard_records = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _position(view, player):
+    position, _ = encode_view(view, player)
+    return np.array(position, np.uint8), 0 if player == view.white else 1, player
+
+
+def open_writer(directory, shard_size=SHARD_SIZE):
+    """ Returns DatasetWriter for a directory, shared by all handlers recording to it
+    """
+    if directory not in _open_writers:
+        _open_writers[directory] = DatasetWriter(directory, shard_size)
+    return _open_writers[directory]
+
+
+def record_step(game, players, directory, shard_size=SHARD_SIZE):
+    """ Handler of on_test_step and on_train_step events, directory and shard_size are given as event params
+    """
+    open_writer(directory, shard_size).add_position(game)
+
+
+def record_game(game_in_run, game, results_by_players, pools_by_players, directory, shard_size=SHARD_SIZE):
+    """ Handler of on_test_game_finished and on_train_game_finished events,
+    directory and shard_size are given as event params - games not played locally (game is None) are skipped
+    """
+    if game is not None:
+        open_writer(directory, shard_size).finish_game(game)
+
+
+def _shard_paths(directory):
+    return sorted(glob.glob(os.path.join(directory, SHARD_NAME.replace("{:05d}", "[0-9]" * 5))))
+
+
+def open_shard(path):
+    """ returns: memory-mapped array of records of the shard
+    """
+    with open(path, "rb") as file:
+        header = file.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError("{} is not a positions shard".format(path))
+
+    magic, version, _, record_size = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError("{} is not a positions shard".format(path))
+    if version != VERSION or record_size != RECORD_DTYPE.itemsize:
+        raise ValueError("Unsupported positions shard version: {}".format(version))
+
+    # a record being written at the moment is skipped
+    count = (os.path.getsize(path) - HEADER.size) // RECORD_DTYPE.itemsize
+    if count == 0:
+        return np.zeros(0, RECORD_DTYPE)
+    return np.memmap(path, RECORD_DTYPE, "r", HEADER.size, (count, ))
+
+
+def read_batches(directory, batch_size, shuffle=True, seed=None):
+    """ Yields mini-batches of all records of shards in the directory, once each
+
+    returns: generator of (positions - float32 array of shape (batch, 10, 10, 4), sides, results)
+    """
+    shards = [open_shard(path) for path in _shard_paths(directory)]
+    offsets = np.cumsum([0] + [len(shard) for shard in shards])
+    total = offsets[-1]
+
+    order = np.random.default_rng(seed).permutation(total) if shuffle else np.arange(total)
+    for start in range(0, total, batch_size):
+        indices = order[start:start + batch_size]
+        shard_indices = np.searchsorted(offsets, indices, side="right") - 1
+
+        records = np.empty(len(indices), RECORD_DTYPE)
+        for shard in np.unique(shard_indices):
+            selected = shard_indices == shard
+            records[selected] = shards[shard][indices[selected] - offsets[shard]]
+
+        yield records["position"].astype(np.float32), records["side"], records["result"]
@@ -0,0 +1,116 @@
+""" Memory profiling of runs - allocations traced by tracemalloc are compared between epoch boundaries,
+so that growth can be attributed to modules and lines
+"""
+import os
+import tracemalloc
+
+# allocations of the profiler itself and of the import system are not reported
+_IGNORED_FILES = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>",
+                  "<unknown>")
+
+
+def resident_memory():
+    """ returns: resident set size of the process in bytes, None if it is not known on the platform
+    """
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class MemoryReport:
+    """ Memory usage at the end of an epoch and its growth since the previous report
+
+    by_module and by_line are lists of (file or file:line, size growth in bytes, allocated blocks growth),
+    largest growth first - only places that grew are listed
+    """
+
+    def __init__(self, epoch, rss, rss_growth, traced, traced_growth, peak, by_module, by_line):
+        self.epoch = epoch
+        self.rss = rss
+        self.rss_growth = rss_growth
+        self.traced = traced
+        self.traced_growth = traced_growth
+        self.peak = peak
+        self.by_module = by_module
+        self.by_line = by_line
+
+    def __str__(self):
+        lines = ["Memory after epoch {}:".format(self.epoch)]
+        if self.rss is not None:
+            lines.append("RSS: {:.1f} MiB ({:+.1f} MiB)".format(self.rss / 2 ** 20, self.rss_growth / 2 ** 20))
+        lines.append("Traced: {:.1f} MiB ({:+.1f} MiB), peak {:.1f} MiB".format(
+            self.traced / 2 ** 20, self.traced_growth / 2 ** 20, self.peak / 2 ** 20))
+
+        for title, stats in ("Growth by module:", self.by_module), ("Growth by line:", self.by_line):
+            lines.append(title)
+            for place, size, count in stats:
+                lines.append("  {:+10.1f} KiB {:+8d} blocks  {}".format(size / 2 ** 10, count, place))
+
+        return "\n".join(lines)
+
+
+class MemoryProfiler:
+    """ Traces allocations with tracemalloc and reports their growth between calls of report
+    """
+
+    def __init__(self, top=10):
+        """
+        args:
+            top - number of modules and lines with the largest growth listed in reports
+        """
+        self.top = top
+        self._snapshot = None
+        self._rss = None
+        self._traced = 0
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.mark()
+
+    def mark(self):
+        """ Makes the current state the base of the next report
+        """
+        self._take_snapshot()
+        self._rss = resident_memory()
+        self._traced = tracemalloc.get_traced_memory()[0]
+
+    def stop(self):
+        tracemalloc.stop()
+        self._snapshot = None
+
+    def _take_snapshot(self):
+        previous = self._snapshot
+        self._snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, path) for path in _IGNORED_FILES])
+        return previous
+
+    def _growth(self, previous, key_type):
+        """ returns: statistics of the top places that grew since the previous snapshot, largest growth first
+        """
+        # compare_to sorts by absolute difference, so places that shrank are left out
+        stats = sorted((stat for stat in self._snapshot.compare_to(previous, key_type) if stat.size_diff > 0),
+                       key=lambda stat: stat.size_diff, reverse=True)
+        return stats[:self.top]
+
+    def report(self, epoch):
+        """ returns: MemoryReport of growth since the previous report (or mark)
+        """
+        previous = self._take_snapshot()
+        traced, peak = tracemalloc.get_traced_memory()
+        rss = resident_memory()
+
+        by_module = [(stat.traceback[0].filename, stat.size_diff, stat.count_diff)
+                     for stat in self._growth(previous, "filename")]
+        by_line = [("{}:{}".format(stat.traceback[0].filename, stat.traceback[0].lineno), stat.size_diff,
+                    stat.count_diff)
+                   for stat in self._growth(previous, "lineno")]
+
+        report = MemoryReport(epoch, rss, None if rss is None else rss - self._rss,
+                              traced, traced - self._traced, peak, by_module, by_line)
+        self._rss = rss
+        self._traced = traced
+        tracemalloc.reset_peak()
+        return report
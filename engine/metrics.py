@@ -0,0 +1,180 @@
+""" Registry of throughput metrics, exported in Prometheus text format
+
+Metrics are disabled by default - then counter and gauge return a shared object that ignores updates,
+so objects should get their metrics once (e.g. on creation) and only update them later.
+Metrics must be enabled before objects reporting them are created.
+"""
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "aitournament_"
+
+_registry = None
+
+
+class _NullMetric:
+    def inc(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+
+NULL_METRIC = _NullMetric()
+
+
+class Counter:
+    def __init__(self, name, help_):
+        self.name = name
+        self.help = help_
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Gauge:
+    def __init__(self, name, help_):
+        self.name = name
+        self.help = help_
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, class_, name, help_):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = class_(PREFIX + name, help_)
+            elif type(metric) is not class_:
+                raise ValueError("Metric {} already registered as {}".format(name, type(metric).__name__))
+            return metric
+
+    def counter(self, name, help_):
+        return self._get(Counter, name, help_)
+
+    def gauge(self, name, help_):
+        return self._get(Gauge, name, help_)
+
+    def counters(self):
+        """ returns: list of counters, sorted by name
+        """
+        with self._lock:
+            return sorted((metric for metric in self._metrics.values() if type(metric) is Counter),
+                          key=lambda metric: metric.name)
+
+    def render(self):
+        """ Returns metrics in Prometheus text format (rates of counters are left to the scraper)
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+
+        lines = []
+        for metric in metrics:
+            lines += ["# HELP {} {}".format(metric.name, metric.help),
+                      "# TYPE {} {}".format(metric.name, "counter" if type(metric) is Counter else "gauge"),
+                      "{} {}".format(metric.name, metric.value)]
+
+        return "\n".join(lines) + "\n"
+
+
+def enable():
+    """ Enables metrics, returns the registry
+    """
+    global _registry
+    if _registry is None:
+        _registry = Registry()
+    return _registry
+
+
+def counter(name, help_):
+    return _registry.counter(name, help_) if _registry is not None else NULL_METRIC
+
+
+def gauge(name, help_):
+    return _registry.gauge(name, help_) if _registry is not None else NULL_METRIC
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = self.server.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HTTPExporter:
+    """ Serves metrics over HTTP on given local port, in a background thread
+    """
+
+    def __init__(self, registry, port, host="localhost"):
+        self._server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+        self._server.daemon_threads = True
+        self._server.registry = registry
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class FileExporter:
+    """ Periodically rewrites a file with metrics, in a background thread - as the file is not scraped,
+    rate per second of every counter since the previous write is added, as <counter name>_per_second gauge
+    """
+
+    def __init__(self, registry, path, interval=5.):
+        self._registry = registry
+        self._path = path
+        self._interval = interval
+        self._last_write_time = time.time()
+        self._last_values = {}
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self._interval):
+            self.write()
+
+    def _render_rates(self):
+        now = time.time()
+        elapsed = now - self._last_write_time
+        self._last_write_time = now
+
+        lines = []
+        for metric in self._registry.counters():
+            value = metric.value
+            rate = (value - self._last_values.get(metric.name, 0)) / elapsed if elapsed > 0 else 0.
+            self._last_values[metric.name] = value
+            lines += ["# HELP {}_per_second {} per second since previous write".format(metric.name, metric.help),
+                      "# TYPE {}_per_second gauge".format(metric.name),
+                      "{}_per_second {}".format(metric.name, rate)]
+
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def write(self):
+        temp_path = self._path + ".tmp"
+        with open(temp_path, "w") as file:
+            file.write(self._registry.render() + self._render_rates())
+        os.replace(temp_path, self._path)
+
+    def close(self):
+        self._stopped.set()
+        self._thread.join()
+        self.write()
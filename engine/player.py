@@ -32,9 +32,36 @@ class ParametrizedPlayer(Player):
     def __init__(self):
         super(ParametrizedPlayer, self).__init__()
         self.session = None
+        self.weights_version = 0
 
     def get_variable_list(self):
         raise NotImplementedError
 
+    def get_weights(self):
+        """ returns: current values of player's variables
+        """
+        return self.session.run(self.get_variable_list())
+
+    def set_weights(self, weights, version=None):
+        """ Loads values (as returned by get_weights) into player's variables
+
+        args:
+            weights - values of variables
+            version - weights version to be set, if not given weights version is incremented
+        """
+        for variable, value in zip(self.get_variable_list(), weights):
+            variable.load(value, self.session)
+
+        if version is None:
+            self.variables_changed()
+        else:
+            self.weights_version = version
+
+    def variables_changed(self):
+        """ Must be called by whoever modifies player's variables (e.g. player pools' setters),
+        so that anything computed from previous values can be invalidated
+        """
+        self.weights_version += 1
+
     def get_next_move(self):
         raise NotImplementedError
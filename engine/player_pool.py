@@ -15,6 +15,11 @@ class PlayerPool:
     def prepare_new_game(self):
         pass
 
+    def get_players(self):
+        """ Returns players currently kept by the pool (if it keeps any)
+        """
+        return []
+
     def set_name(self, name):
         self.name = name
 
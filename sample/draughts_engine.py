@@ -0,0 +1,42 @@
+""" Stand-in external draughts engine for ExternalDraughtsPlayer - reads positions in PDN FEN notation
+from stdin, one per line, and writes a move of MinMaxDraughtsPlayer of given depth for each of them to stdout
+
+Usage: python sample/draughts_engine.py [--depth N] [--delay S]
+
+--delay makes the engine wait before answering, e.g. to try out timeouts of the player.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.games.draughts import MinMaxDraughtsPlayer  # noqa: E402
+from engine.games.draughts_external import move_to_pdn, view_from_fen  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in external draughts engine")
+    parser.add_argument("--depth", default=2, type=int, help="Depth of MinMax search")
+    parser.add_argument("--delay", default=0., type=float, help="Seconds to wait before every answer")
+    args = parser.parse_args()
+
+    white = MinMaxDraughtsPlayer(args.depth)
+    black = MinMaxDraughtsPlayer(args.depth)
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+
+        view = view_from_fen(line, white, black)
+        player = view.pov
+        player.set_current_view(view)
+        move = player.get_next_move()
+
+        time.sleep(args.delay)
+        print(move_to_pdn(view, move), flush=True)
+
+
+if __name__ == "__main__":
+    main()
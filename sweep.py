@@ -0,0 +1,247 @@
+""" Hyperparameter sweep over object params of a base configuration
+
+Sweep file is written in yaml and consists of following elements (optional are in square brackets):
+
+ * config - path to the base configuration file
+ * [mode] - grid (default) or random
+ * [trials] - number of trials for random mode
+ * [seed] - seed for random mode
+ * [args] - command line arguments passed to every trial, e.g. epochs: 5
+ * params - swept params, identified by section.object.param (e.g. pools.EvolutionPool.stddev) or game.param,
+   with value being a list of values, or (random mode only) a range given by min, max and optional log: true
+
+Trials run in a bounded pool of processes, each with its own set of CPUs and thread limits.
+"""
+import argparse
+import contextlib
+import copy
+import csv
+import itertools
+import math
+import multiprocessing
+import os
+import random
+import sys
+
+import yaml
+
+THREAD_ENV_VARIABLES = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+                        "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS")
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="AITournament - hyperparameter sweep over a configuration.")
+    parser.add_argument("--sweep", dest="sweep_path", default="sweep.yaml", help="Sweep file")
+    parser.add_argument("--cpus-per-trial", dest="cpus_per_trial", default=1, type=int,
+                        help="Number of CPUs (and threads) given to a single trial")
+    parser.add_argument("--jobs", dest="jobs", default=0, type=int,
+                        help="Max number of concurrent trials, 0 means as many as available CPUs allow")
+    parser.add_argument("--output", dest="output_path", default=None, help="CSV file for the results table")
+    parser.add_argument("--log-dir", dest="log_dir", default=None, help="Directory for outputs of trials")
+
+    return parser.parse_args()
+
+
+def _load_yaml(path):
+    try:
+        with open(path) as file:
+            return yaml.safe_load(file)
+
+    except FileNotFoundError:
+        exit("File '{}' does not exist".format(path))
+    except yaml.YAMLError:
+        exit("File '{}' is not a valid YAML file".format(path))
+
+
+def expand_trials(sweep):
+    """ Returns list of trials, each being a dictionary mapping param paths to values
+    """
+    params = sweep.get("params")
+    if not params or type(params) is not dict:
+        exit("Swept params must be a non-empty dictionary")
+
+    mode = sweep.get("mode", "grid")
+    names = list(params.keys())
+
+    if mode == "grid":
+        for name in names:
+            if type(params[name]) is not list:
+                exit("Grid values of {} must be a list".format(name))
+        return [dict(zip(names, values)) for values in itertools.product(*[params[name] for name in names])]
+
+    if mode == "random":
+        if "trials" not in sweep:
+            exit("Number of trials must be defined for random mode")
+        rng = random.Random(sweep.get("seed"))
+        return [{name: _sample(name, params[name], rng) for name in names} for _ in range(sweep["trials"])]
+
+    exit("Unrecognized sweep mode: {}".format(mode))
+
+
+def _sample(name, values, rng):
+    if type(values) is list:
+        return rng.choice(values)
+    if type(values) is not dict or "min" not in values or "max" not in values:
+        exit("Values of {} must be a list or a range with min and max".format(name))
+
+    if values.get("log", False):
+        value = math.exp(rng.uniform(math.log(values["min"]), math.log(values["max"])))
+    else:
+        value = rng.uniform(values["min"], values["max"])
+
+    return int(round(value)) if type(values["min"]) is int and type(values["max"]) is int else value
+
+
+def apply_params(config_file, trial):
+    config_file = copy.deepcopy(config_file)
+
+    for path, value in trial.items():
+        parts = path.split(".")
+        if len(parts) == 2 and parts[0] == "game":
+            obj, param = config_file.get("game"), parts[1]
+        elif len(parts) == 3:
+            obj, param = (config_file.get(parts[0]) or {}).get(parts[1]), parts[2]
+        else:
+            exit("Invalid param path: {}, expected section.object.param or game.param".format(path))
+        if obj is None:
+            exit("Object of {} is not defined".format(path))
+
+        if obj.get("params") is None:
+            obj["params"] = {}
+        obj["params"][param] = value
+
+    return config_file
+
+
+def _trial_cli_args(sweep_args, cpus):
+    args = ["--tf-intra-op-threads", str(cpus), "--tf-inter-op-threads", "1"]
+    for name, value in (sweep_args or {}).items():
+        args += ["--" + name.replace("_", "-"), str(value)]
+    return args
+
+
+def _aggregate(results):
+    """ Averages results element-wise (for tuples, like draughts' results) or as numbers
+    """
+    if not results:
+        return None
+    if all(type(result) is tuple for result in results):
+        return tuple(sum(values) / len(values) for values in zip(*results))
+    return sum(results) / len(results)
+
+
+def _summarize(results_by_players, results_by_pools):
+    summary = {}
+    for player, results in results_by_players.items():
+        summary[player.get_name()] = _aggregate(results)
+    for pool, results in results_by_pools.items():
+        summary[pool.get_name()] = _aggregate([result for game_results in results for result in game_results])
+    return summary
+
+
+def _init_worker(cpu_sets, threads):
+    # runs before any trial (and so before tensorflow is loaded) in the worker process
+    for variable in THREAD_ENV_VARIABLES:
+        os.environ[variable] = str(threads)
+
+    cpus = cpu_sets.get()
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+
+
+def _run_trial(trial_spec):
+    from ai_tournament import run
+    from engine.config import Configuration, _parse_args as parse_config_args
+
+    index, trial, config_file, cli_args, log_dir = trial_spec
+
+    log_path = os.path.join(log_dir, "trial_{}.log".format(index)) if log_dir else os.devnull
+    with open(log_path, "w") as log, contextlib.redirect_stdout(log):
+        try:
+            config = Configuration(parse_config_args(cli_args), config_file)
+            if not config.game:
+                exit("Game must be configured")
+
+            summary = _summarize(*run(config))
+            error = None
+        except SystemExit as e:
+            summary, error = {}, str(e.code)
+        except Exception as e:
+            summary, error = {}, "{}: {}".format(type(e).__name__, e)
+        finally:
+            if "tensorflow" in sys.modules:
+                sys.modules["tensorflow"].reset_default_graph()
+
+    return index, trial, summary, error
+
+
+def _cpu_sets(cpus_per_trial, jobs):
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count()))
+    workers = max(1, len(cpus) // cpus_per_trial)
+    if jobs > 0:
+        workers = min(workers, jobs)
+
+    # disjoint sets, so that concurrent trials do not compete for the same CPUs
+    return [set(cpus[i * cpus_per_trial:(i + 1) * cpus_per_trial]) or None for i in range(workers)]
+
+
+def run_sweep(sweep, cpus_per_trial=1, jobs=0, log_dir=None):
+    """ Runs all trials of the sweep
+
+    returns: list of (trial index, trial params, results summary by object name, error or None)
+    """
+    if "config" not in sweep:
+        exit("Base configuration must be defined")
+    config_file = _load_yaml(sweep["config"])
+    trials = expand_trials(sweep)
+    if not trials:
+        exit("Sweep has no trials")
+    cli_args = _trial_cli_args(sweep.get("args"), cpus_per_trial)
+
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+
+    cpu_sets = _cpu_sets(cpus_per_trial, jobs)[:len(trials)]
+    context = multiprocessing.get_context("spawn")
+    cpu_sets_queue = context.Queue()
+    for cpus in cpu_sets:
+        cpu_sets_queue.put(cpus)
+
+    specs = [(i, trial, apply_params(config_file, trial), cli_args, log_dir) for i, trial in enumerate(trials)]
+    results = []
+    with context.Pool(len(cpu_sets), _init_worker, (cpu_sets_queue, cpus_per_trial)) as pool:
+        for result in pool.imap_unordered(_run_trial, specs):
+            index, trial, summary, error = result
+            print("Trial {}/{} finished{}".format(len(results) + 1, len(specs), ": " + error if error else ""))
+            results.append(result)
+
+    return sorted(results, key=lambda result: result[0])
+
+
+def results_table(results):
+    param_names = sorted({name for _, trial, _, _ in results for name in trial})
+    object_names = sorted({name for _, _, summary, _ in results for name in summary})
+
+    rows = [["trial"] + param_names + object_names + ["error"]]
+    for index, trial, summary, error in results:
+        rows.append([index] + [trial.get(name) for name in param_names] +
+                    [summary.get(name) for name in object_names] + [error or ""])
+    return rows
+
+
+def main():
+    args = _parse_args()
+    sweep = _load_yaml(args.sweep_path)
+
+    rows = results_table(run_sweep(sweep, args.cpus_per_trial, args.jobs, args.log_dir))
+
+    for row in rows:
+        print("\t".join(str(value) for value in row))
+
+    if args.output_path:
+        with open(args.output_path, "w", newline="") as file:
+            csv.writer(file).writerows(rows)
+
+
+if __name__ == "__main__":
+    main()